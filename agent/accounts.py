@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+SEPARATOR = ':'
+
+
+class AccountIndex:
+    """Chart-of-accounts hierarchy over a category axis ('Opex' -> 'Opex:Sales', 'Opex:R&D', ...)
+
+    Every prefix of a ':'-separated account path is a node with an integer code. Each node
+    maps to the category positions below it, stored as a slice when they are contiguous on
+    the axis, so metric filters are integer lookups instead of string scans.
+    """
+
+    def __init__(self, categories):
+        self.categories = pd.Index(categories, dtype=object)
+        paths = [str(c).split(SEPARATOR) for c in self.categories]
+
+        # Node paths in first-seen order (parents before their children), matched case-insensitively
+        members, labels = {}, {}
+        for position, parts in enumerate(paths):
+            for depth in range(1, len(parts) + 1):
+                path = SEPARATOR.join(parts[:depth])
+                labels.setdefault(path.lower(), path)
+                members.setdefault(path.lower(), []).append(position)
+
+        self.nodes = pd.Index(list(labels.values()), dtype=object, name='account')
+        self._lookup = {key: code for code, key in enumerate(members)}
+        self.depths = np.array([node.count(SEPARATOR) + 1 for node in self.nodes], dtype=np.int64)
+        self.parents = np.array([self.code(node.rsplit(SEPARATOR, 1)[0]) if SEPARATOR in node else -1
+                                 for node in self.nodes], dtype=np.int64)
+        self._members = [np.array(positions, dtype=np.int64) for positions in members.values()]
+        self._selectors = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def code(self, node):
+        """Integer code of an account node (case-insensitive, trailing ':' ignored), or -1"""
+        return self._lookup.get(str(node).rstrip(SEPARATOR).lower(), -1)
+
+    def positions(self, node):
+        """Category positions at or below node"""
+        code = self.code(node)
+        return self._members[code] if code >= 0 else np.array([], dtype=np.int64)
+
+    def select(self, node):
+        """Category-axis selector for node: a slice when its accounts are contiguous, else positions"""
+        code = self.code(node)
+        if code not in self._selectors:
+            positions = self._members[code] if code >= 0 else np.array([], dtype=np.int64)
+            if len(positions) == 0:
+                selector = slice(0, 0)
+            elif positions[-1] - positions[0] + 1 == len(positions):
+                selector = slice(int(positions[0]), int(positions[-1]) + 1)
+            else:
+                selector = positions
+            self._selectors[code] = selector
+        return self._selectors[code]
+
+    def mask(self, node):
+        mask = np.zeros(len(self.categories), dtype=bool)
+        mask[self.positions(node)] = True
+        return mask
+
+    def level(self, depth):
+        """Node code for each category at a hierarchy depth (1 = top level); shallower accounts stay as themselves"""
+        return np.array([self.code(SEPARATOR.join(str(c).split(SEPARATOR)[:depth])) for c in self.categories], dtype=np.int64)
+
+    def rollup(self, array, depth, axis=-1):
+        """Sum an array's category axis up to depth; returns (node labels, rolled-up array)"""
+        codes = self.level(depth)
+        nodes, columns = np.unique(codes, return_inverse=True)
+        membership = np.zeros((len(self.categories), len(nodes)), dtype=np.asarray(array).dtype)
+        membership[np.arange(len(self.categories)), columns] = 1
+        rolled = np.moveaxis(np.tensordot(np.moveaxis(array, axis, -1), membership, axes=1), -1, axis)
+        return self.nodes[nodes], rolled
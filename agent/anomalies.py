@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from agent.instrument import count, stage
+
+# Median absolute deviation -> standard deviation, for normally distributed noise
+MAD_SCALE = 1.4826
+COLUMNS = ['month', 'entity', 'account', 'actual', 'expected', 'budget', 'z_history', 'z_budget', 'score']
+
+
+def nanmedian(windows):
+    """Median over the last axis ignoring nans, from one sort (np.nanmedian loops over the rows in Python)"""
+    ordered = np.sort(windows, axis=-1)  # nans sort last
+    known = np.count_nonzero(~np.isnan(ordered), axis=-1)
+    low = np.maximum(known - 1, 0) // 2
+    high = known // 2
+    pick = lambda index: np.take_along_axis(ordered, index[..., None], axis=-1)[..., 0]
+    median = (pick(low) + pick(np.minimum(high, ordered.shape[-1] - 1))) / 2
+    return np.where(known > 0, median, np.nan)
+
+
+def trailing_median(series, rows, window, min_history):
+    """Median and MAD of the `window` months before each selected row, per column
+
+    One strided view holds every trailing window at once (months x series x window); positions
+    with fewer than `min_history` known months before them are nan.
+    """
+    padded = np.concatenate([np.full((window, series.shape[1]), np.nan), series])
+    windows = sliding_window_view(padded, window, axis=0)[rows]
+    known = np.count_nonzero(~np.isnan(windows), axis=-1) >= min_history
+    center = nanmedian(windows)
+    mad = nanmedian(np.abs(windows - center[..., None]))
+    return np.where(known, center, np.nan), np.where(known, mad * MAD_SCALE, np.nan)
+
+
+def pooled_floor(scale, level, floor):
+    """Scales raised to at least half the median scale/level ratio of all series in the same month"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(level > 0, scale / level, np.nan)
+    typical = nanmedian(relative)[:, None] if relative.shape[1] else np.zeros((len(relative), 1))
+    return np.fmax(np.fmax(scale, floor), 0.5 * np.nan_to_num(typical) * level)
+
+
+class AnomalyDetector:
+    """Robust outlier scan of every (entity, account) monthly series of the aligned actuals and budget cubes
+
+    The cubes are viewed as month x series matrices, one column per (entity, account) cell, and
+    each selected month is scored in one pass over all columns:
+
+    - against its own history: the robust z-score of the month's value (with `seasonal`, of its
+      change on the same month a year earlier, once the series has a year behind it) against
+      the median and MAD of the `window` months before it;
+    - against budget: the robust z-score of the month's variance to budget against the
+      series' own variances over the same window, so a steady forecast bias is not an outlier.
+
+    A series' history starts at its first posted line. With thousands of series, some will have
+    had a quiet window by chance and a MAD far below their real noise, so each scale is floored
+    at half the median relative scale of all series (and 1% of the series' typical level, and
+    $1): ordinary noise in an unusually quiet series is not an outlier.
+    """
+
+    def __init__(self, actuals, budget, window=24, min_history=6, seasonal=None):
+        if actuals.shape != budget.shape or not (actuals.months.equals(budget.months)
+                                                 and actuals.entities.equals(budget.entities)
+                                                 and actuals.categories.equals(budget.categories)):
+            raise ValueError("Actuals and budget cubes must share their axes (see align_cubes)")
+        self.cube = actuals
+        self.window = window
+        self.min_history = min_history
+        # Year-on-year differences cancel a stable seasonal pattern once there are two years to compare
+        self.seasonal = len(actuals.months) >= 24 if seasonal is None else seasonal
+
+        months = len(actuals.months)
+        self.actual = actuals.values.reshape(months, -1)
+        self.budget = budget.values.reshape(months, -1)
+        self.counts = actuals.counts.reshape(months, -1)
+        started = np.logical_or.accumulate(self.counts > 0, axis=0)
+        budgeted = np.logical_or.accumulate(budget.counts.reshape(months, -1) > 0, axis=0)
+        self.history = np.where(started, self.actual, np.nan)
+        self.variance = np.where(started & budgeted, self.actual - self.budget, np.nan)
+
+    def columns(self, entity=None, account=None):
+        """Flat series positions (entity-major, like the reshaped cube) for an entity and account node"""
+        cube = self.cube
+        grid = np.arange(len(cube.entities) * len(cube.categories)).reshape(len(cube.entities), len(cube.categories))
+        accounts = slice(None) if not account else cube.accounts.select(account)
+        return grid[cube.entity_cols(entity)][:, accounts].ravel()
+
+    def scores(self, month=None, entity=None, account=None):
+        """(rows, columns, expected, z_history, z_budget) for the selected months (latest when None) and series"""
+        cube = self.cube
+        rows = np.arange(len(cube.months))[cube.month_rows(month) if month else slice(-1, None)]
+        columns = self.columns(entity, account)
+        count('rows_scanned', self.counts[np.ix_(rows, columns)].sum())
+
+        with stage('aggregate'):
+            history = self.history[:, columns]
+            expected, scale = trailing_median(history, rows, self.window, self.min_history)
+            level = np.abs(expected)
+            floor = np.fmax(0.01 * level, 1.0)
+            if self.seasonal:
+                lagged = np.concatenate([np.full((12, len(columns)), np.nan), history[:-12]])
+                center, seasonal_scale = trailing_median(history - lagged, rows, self.window, self.min_history)
+                # Series without a year of history to compare are scored on their level
+                seasonal = ~np.isnan(center) & ~np.isnan(lagged[rows])
+                expected = np.where(seasonal, lagged[rows] + center, expected)
+                scale = np.where(seasonal, seasonal_scale, scale)
+            z_history = (history[rows] - expected) / pooled_floor(scale, level, floor)
+
+            variance = self.variance[:, columns]
+            center, scale = trailing_median(variance, rows, self.window, self.min_history)
+            z_budget = (variance[rows] - center) / pooled_floor(scale, level, floor)
+        return rows, columns, expected, z_history, z_budget
+
+    def scan(self, month=None, entity=None, account=None, n=10, threshold=3.5):
+        """The n (month, entity, account) cells scoring highest, among those at least `threshold` robust sds out"""
+        rows, columns, expected, z_history, z_budget = self.scores(month, entity, account)
+        score = np.fmax(np.abs(z_history), np.abs(z_budget))
+        candidates = np.flatnonzero(np.nan_to_num(score, nan=0.0) >= threshold)
+        n = min(n, len(candidates))
+        if n == 0:
+            return pd.DataFrame(columns=COLUMNS)
+
+        flat = score.ravel()
+        # Top n without sorting every cell
+        top = candidates[np.argpartition(-flat[candidates], n - 1)[:n]]
+        top = top[np.argsort(-flat[top], kind='stable')]
+        row, col = np.unravel_index(top, score.shape)
+        series = columns[col]
+        cube = self.cube
+        return pd.DataFrame({
+            'month': np.asarray(cube.months, dtype=object)[rows[row]],
+            'entity': np.asarray(cube.entities, dtype=object)[series // len(cube.categories)],
+            'account': np.asarray(cube.categories, dtype=object)[series % len(cube.categories)],
+            'actual': self.actual[rows[row], series],
+            'expected': expected[row, col],
+            'budget': self.budget[rows[row], series],
+            'z_history': z_history[row, col],
+            'z_budget': z_budget[row, col],
+            'score': flat[top],
+        }, columns=COLUMNS)
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from agent.cube import period_mask
+from agent.instrument import stage
+
+
+class BatchView:
+    """Read-only stand-in for FinanceTools that computes each aggregate once per batch
+
+    Each metric is computed (or each category slice gathered from the cube) a single time,
+    and every question is answered by slicing that result; anything else is delegated to the tools.
+    """
+
+    def __init__(self, tools):
+        self.tools = tools
+        self._aggregates = {}
+
+    def __getattr__(self, name):
+        return getattr(self.tools, name)
+
+    def aggregate(self, name, compute):
+        if name not in self._aggregates:
+            with stage('aggregate'):
+                self._aggregates[name] = compute()
+        return self._aggregates[name]
+
+    def get_revenue_vs_budget(self, month=None, entity=None):
+        data = self.aggregate(('revenue_vs_budget', entity), lambda: self.tools.get_revenue_vs_budget(entity=entity))
+        if not month or data.empty:
+            return data
+        return data[period_mask(data['month'], month)].reset_index(drop=True)
+
+    def get_gross_margin_trend(self, months=None, entity=None):
+        data = self.aggregate(('margin_trend', entity), lambda: self.tools.get_gross_margin_trend(entity=entity))
+        if months and not data.empty:
+            return data.tail(months)
+        return data
+
+    def matching(self, account):
+        """Month x entity x category values and row counts for the categories under an account node"""
+        cube = self.tools.actuals_cube
+        accounts = cube.accounts.select(account)
+        return cube.categories[accounts], cube.values[:, :, accounts], cube.counts[:, :, accounts]
+
+    def get_opex_breakdown(self, month=None, entity=None):
+        if self.tools.actuals_cube.empty:
+            return pd.DataFrame()
+
+        categories, values, counts = self.aggregate('Opex:', lambda: self.matching('Opex:'))
+        rows, entities = self.tools.actuals_cube.month_rows(month), self.tools.actuals_cube.entity_cols(entity)
+        present = counts[rows][:, entities].sum(axis=(0, 1)) > 0
+        breakdown = pd.Series(values[rows][:, entities].sum(axis=(0, 1))[present], index=categories[present], name='amount_usd').reset_index()
+        breakdown.rename(columns={'account_category': 'category'}, inplace=True)
+        return breakdown.sort_values('amount_usd', ascending=False)
+
+    def get_ebitda(self, month=None, entity=None):
+        if self.tools.actuals_cube.empty:
+            return {"error": "No actuals data available"}
+
+        rows, entities = self.tools.actuals_cube.month_rows(month), self.tools.actuals_cube.entity_cols(entity)
+        totals = {}
+        for name, pattern in (('revenue', 'Revenue'), ('cogs', 'COGS'), ('opex', 'Opex:')):
+            _, values, _ = self.aggregate(pattern, lambda: self.matching(pattern))
+            totals[name] = float(values[rows][:, entities].sum())
+        totals['ebitda'] = totals['revenue'] - totals['cogs'] - totals['opex']
+        return totals
+
+    def calculate_cash_runway(self, window=3):
+        return self.aggregate(('cash_runway', window), lambda: self.tools.calculate_cash_runway(window))
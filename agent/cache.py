@@ -0,0 +1,140 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Data versions a cache remembers, to tell a newer version from one a reader is still pinned to
+MAX_VERSIONS = 64
+
+
+def estimate_size(value):
+    """Rough in-memory size of a cached answer in bytes"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, 'nbytes'):
+        # Arrays and lazy chart specs report their own footprint
+        return int(value.nbytes)
+    if hasattr(value, 'to_json'):
+        # Plotly figures: the serialized spec is a fair proxy for what they hold
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of planner answers, bounded by total size and entry age
+
+    A cache attached to a ResultStore (agent.store) reads through to it on a miss and writes
+    every new entry through to it, so results outlive the process and are shared between them.
+
+    Entries are keyed on (data version, key). The first insert under a version the cache has not
+    seen drops the entries of older versions; inserts from readers still pinned to an older
+    snapshot are kept alongside until evicted, without clearing the newer entries.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=3600, clock=time.monotonic, store=None, namespace=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.store = store
+        self.namespace = namespace
+        self.versions = OrderedDict()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, version, key):
+        """Cached value for key under a data version, or None"""
+        with self._lock:
+            entry = self._entries.get((version, key))
+            if entry is not None and self.clock() - entry[2] > self.ttl:
+                self._drop((version, key))
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((version, key))
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        if self.store is None:
+            return None
+        # Outside the lock: another process may have computed it
+        value = self.store.get(self.namespace, version, key)
+        if value is not None:
+            self._insert(version, key, value)
+        return value
+
+    def put(self, version, key, value):
+        """Store value, dropping entries from older data versions on a new one and evicting LRU entries over budget"""
+        self._insert(version, key, value)
+        if self.store is not None:
+            self.store.put(self.namespace, version, key, value)
+
+    def attach(self, store, namespace):
+        """Read and write through to a ResultStore under namespace (None detaches)"""
+        self.store = store
+        self.namespace = namespace
+
+    def _insert(self, version, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if version not in self.versions:
+                # Newer than every version seen so far
+                for stale in [entry for entry in self._entries if entry[0] != version]:
+                    self._drop(stale)
+                self.versions[version] = None
+                if len(self.versions) > MAX_VERSIONS:
+                    self.versions.popitem(last=False)
+            if size > self.max_bytes:
+                return
+            if (version, key) in self._entries:
+                self._drop((version, key))
+            self._entries[(version, key)] = (value, size, self.clock())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        """Hit/miss counters and current footprint, for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+# One cache per process, shared by every planner (and so every Streamlit session)
+response_cache = ResponseCache()
+
+# Results of the tool methods served by the HTTP service, keyed on (method, arguments)
+aggregate_cache = ResponseCache()
@@ -0,0 +1,66 @@
+import hashlib
+
+import pandas as pd
+
+from agent.cache import ResponseCache
+from agent.instrument import stage
+
+# Serialized figures shared by every session, keyed on (chart type, data hash). The key already
+# identifies the data, so entries never go stale and are stored under a single version.
+chart_cache = ResponseCache(max_bytes=16 * 1024 * 1024, ttl=24 * 3600)
+
+
+def data_hash(data):
+    """Stable hash of a chart's input frame (columns and values)"""
+    digest = hashlib.sha1(','.join(map(str, data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class LazyChart:
+    """Chart type, builder and (small, aggregated) data; the figure is only built when displayed
+
+    Holding a LazyChart costs no more than its data. Its JSON is cached per (chart type, data hash),
+    so the same chart asked for again in any session is never rebuilt.
+    """
+
+    def __init__(self, kind, builder, data, cache=chart_cache):
+        self.kind = kind
+        self.builder = builder
+        self.data = data
+        self.cache = cache
+        self._key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = (self.kind, data_hash(self.data))
+        return self._key
+
+    @property
+    def nbytes(self):
+        return int(self.data.memory_usage(deep=True).sum())
+
+    def _build(self):
+        with stage('chart'):
+            figure = self.builder(self.data)
+            spec = figure.to_json() if figure is not None else None
+        if self.cache is not None and spec is not None:
+            self.cache.put(None, self.key, spec)
+        return figure, spec
+
+    def to_json(self):
+        """Serialized Plotly figure, built at most once per (chart type, data hash)"""
+        spec = self.cache.get(None, self.key) if self.cache is not None else None
+        if spec is None:
+            _, spec = self._build()
+        return spec
+
+    def figure(self):
+        """A fresh Plotly figure (not kept on the spec)"""
+        spec = self.cache.get(None, self.key) if self.cache is not None else None
+        if spec is None:
+            figure, _ = self._build()
+            return figure
+        import plotly.io as pio
+        return pio.from_json(spec)
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from agent.instrument import count, stage
+
+ELIMINATIONS = 'Eliminations'
+CONSOLIDATED = 'Consolidated'
+
+# (metric, account node) pairs reported for every entity
+METRIC_ACCOUNTS = [('revenue', 'Revenue'), ('cogs', 'COGS'), ('opex', 'Opex')]
+
+
+@dataclass(frozen=True)
+class EliminationRule:
+    """Intercompany balances removed on consolidation: accounts at or below `account`, posted by `entities` (all if None)"""
+    account: str
+    entities: tuple = None
+
+
+def apply_eliminations(cube, rules):
+    """(Re)build the Eliminations pseudo-entity of a cube from the rules
+
+    Eliminated balances are posted negated to their own entity column, so the consolidated
+    total (the sum over all entities) nets them out while each legal entity keeps its own books.
+    """
+    if not rules and ELIMINATIONS not in cube.entities:
+        return
+    cube.extend(entities=[ELIMINATIONS])
+    target = cube.entities.get_loc(ELIMINATIONS)
+    cube.values[:, target] = 0
+
+    for rule in rules:
+        names = [e for e in (rule.entities or cube.entities) if e != ELIMINATIONS]
+        entities = cube.entities.get_indexer(names)
+        entities = entities[entities >= 0]
+        accounts = cube.accounts.select(rule.account)
+        # Only values: eliminations add no rows, so row counts (and months with data) are unchanged
+        cube.values[:, target, accounts] -= cube.values[:, entities][:, :, accounts].sum(axis=1)
+
+
+def entity_metrics(cube, month=None, entities=None):
+    """Revenue, COGS, opex, gross margin and EBITDA for every entity and consolidated, in one grouped pass
+
+    The month axis is reduced once to an entity x category matrix; each metric is then a
+    slice of that matrix, so 60 entities cost the same pass as one.
+    """
+    with stage('filter'):
+        rows = cube.month_rows(month)
+    with stage('aggregate'):
+        by_entity = cube.values[rows].sum(axis=0)
+        entity_rows = cube.counts[rows].sum(axis=(0, 2))
+    count('rows_scanned', entity_rows.sum())
+    keep = (entity_rows > 0) | (by_entity != 0).any(axis=1)
+    if entities is not None:
+        keep &= np.isin(np.asarray(cube.entities, dtype=object), list(entities))
+
+    # Entities plus a consolidated row, then every metric as a column of the same matrix
+    by_entity = by_entity[keep]
+    by_entity = np.vstack([by_entity, by_entity.sum(axis=0, keepdims=True)])
+    metrics = {name: by_entity[:, cube.accounts.select(account)].sum(axis=1) for name, account in METRIC_ACCOUNTS}
+    metrics['gross_margin'] = metrics['revenue'] - metrics['cogs']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics['gross_margin_pct'] = np.where(metrics['revenue'] != 0, metrics['gross_margin'] / metrics['revenue'] * 100, np.nan)
+    metrics['ebitda'] = metrics['revenue'] - metrics['cogs'] - metrics['opex']
+
+    if not keep.any():
+        return pd.DataFrame(columns=list(metrics))
+    index = pd.Index(list(cube.entities[keep]) + [CONSOLIDATED], dtype=object, name='entity')
+    return pd.DataFrame(metrics, index=index)
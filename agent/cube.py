@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+from agent.accounts import AccountIndex
+from agent.instrument import count, stage, tracing
+from agent.ledger import decode_months
+
+def period_mask(months, period):
+    """Boolean mask over month labels for a single month, a (start, end) range, or None (all)"""
+    months = np.asarray(months, dtype=object)
+    if period is None:
+        return np.ones(len(months), dtype=bool)
+    if isinstance(period, tuple):
+        start, end = period
+        mask = np.ones(len(months), dtype=bool)
+        if start:
+            mask &= months >= start
+        if end:
+            mask &= months <= end
+        return mask
+    return months == period
+
+
+def key_labels(values):
+    """Distinct labels of a key column and each row's position among them (-1 for missing)
+
+    Integer month columns hold period codes; only their distinct values are turned into labels.
+    """
+    codes, uniques = pd.factorize(values)
+    if pd.api.types.is_integer_dtype(uniques.dtype):
+        return decode_months(uniques), codes
+    return np.asarray(uniques, dtype=object), codes
+
+
+def axis_positions(values, axis):
+    """Position of each row's key on a label axis (-1 when missing or off the axis)"""
+    labels, codes = key_labels(values)
+    return np.append(axis.get_indexer(labels), -1)[codes].astype(np.int64)
+
+
+class LedgerCube:
+    """USD-normalized month x entity x category aggregate of a ledger
+
+    Values are float64 dollars and counts int32 ledger lines. Integer amount columns are read as
+    fixed-point cents: each cell is summed exactly in cents and converted to dollars once.
+    """
+
+    def __init__(self, months, entities, categories, values=None, counts=None):
+        self.months = pd.Index(months, dtype=object, name='month')
+        self.entities = pd.Index(entities, dtype=object, name='entity')
+        self.categories = pd.Index(categories, dtype=object, name='account_category')
+
+        shape = (len(self.months), len(self.entities), len(self.categories))
+        self.values = np.zeros(shape) if values is None else values
+        self.counts = np.zeros(shape, dtype=np.int32) if counts is None else counts
+        self._accounts = None
+
+    @classmethod
+    def from_frame(cls, df, amount_col='amount_usd', months=None, entities=None, categories=None):
+        """Aggregate a USD-converted ledger frame onto the given (or inferred) axes"""
+        if months is None:
+            months = sorted(key_labels(df['month'])[0])
+        if entities is None:
+            entities = sorted(key_labels(df['entity'])[0])
+        if categories is None:
+            categories = sorted(key_labels(df['account_category'])[0])
+
+        cube = cls(months, entities, categories)
+        cube.add(df, amount_col)
+        return cube
+
+    def copy(self):
+        """Independent copy of the cube's arrays (axes and the account index are immutable and shared)"""
+        cube = LedgerCube(self.months, self.entities, self.categories, self.values.copy(), self.counts.copy())
+        cube._accounts = self._accounts
+        return cube
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def empty(self):
+        return not self.counts.any()
+
+    def extend(self, months=(), entities=(), categories=()):
+        """Grow the axes in place to include new labels, keeping each axis sorted"""
+        axes = []
+        for current, labels in ((self.months, months), (self.entities, entities), (self.categories, categories)):
+            new = set(labels) - set(current)
+            axes.append(sorted(set(current) | new) if new else current)
+        if all(axis is current for axis, current in zip(axes, (self.months, self.entities, self.categories))):
+            return
+
+        grown = LedgerCube(*axes)
+        loc = np.ix_(grown.months.get_indexer(self.months),
+                     grown.entities.get_indexer(self.entities),
+                     grown.categories.get_indexer(self.categories))
+        grown.values[loc] = self.values
+        grown.counts[loc] = self.counts
+
+        self.months, self.entities, self.categories = grown.months, grown.entities, grown.categories
+        self.values, self.counts = grown.values, grown.counts
+        self._accounts = None
+
+    def add(self, df, amount_col='amount_usd', grow=False):
+        """Fold ledger rows into the cube in place (rows off the axes are ignored unless grow)
+
+        A `rows` column (compact ledgers) gives the number of ledger lines behind each row.
+        """
+        if df.empty:
+            return
+        if grow:
+            self.extend(*(key_labels(df[col])[0] for col in ('month', 'entity', 'account_category')))
+
+        m = axis_positions(df['month'], self.months)
+        e = axis_positions(df['entity'], self.entities)
+        c = axis_positions(df['account_category'], self.categories)
+        valid = (m >= 0) & (e >= 0) & (c >= 0)
+
+        _, n_e, n_c = self.shape
+        flat = ((m * n_e + e) * n_c + c)[valid]
+        amounts = df[amount_col]
+        cents = pd.api.types.is_integer_dtype(amounts.dtype)
+        # Integer cents are summed as float64, which is exact below 2**53 cents
+        amounts = amounts.to_numpy(dtype=np.float64)[valid]
+        # Blank amounts count as zero, as in a pandas sum
+        amounts[~np.isfinite(amounts)] = 0
+        rows = df['rows'].to_numpy(dtype=np.float64)[valid] if 'rows' in df else None
+
+        size = self.values.size
+        values = np.bincount(flat, weights=amounts, minlength=size).reshape(self.shape)
+        self.values += values / 100 if cents else values
+        self.counts += np.bincount(flat, weights=rows, minlength=size).reshape(self.shape).astype(np.int32)
+
+    def reset(self, months):
+        """Zero the given months in place so they can be re-aggregated"""
+        locs = self.months.get_indexer(list(months))
+        locs = locs[locs >= 0]
+        self.values[locs] = 0
+        self.counts[locs] = 0
+
+    @property
+    def accounts(self):
+        """Chart-of-accounts hierarchy over the category axis, built on first use"""
+        if self._accounts is None:
+            self._accounts = AccountIndex(self.categories)
+        return self._accounts
+
+    def category_mask(self, account):
+        """Boolean mask over the categories at or below an account node ('Opex', 'Opex:', 'Opex:Sales')"""
+        return self.accounts.mask(account)
+
+    def month_loc(self, month):
+        """Position of month on the month axis, or None if the cube has no such month"""
+        try:
+            return self.months.get_loc(month)
+        except KeyError:
+            return None
+
+    def month_rows(self, month=None):
+        """Month-axis selector for a single month, a (start, end) range, or None (all)"""
+        if isinstance(month, tuple):
+            return period_mask(self.months, month)
+        if month:
+            loc = self.month_loc(month)
+            return slice(0, 0) if loc is None else slice(loc, loc + 1)
+        return slice(None)
+
+    def entity_cols(self, entity=None):
+        """Entity-axis selector for one entity, a list of entities, or None (all, i.e. consolidated)"""
+        if entity is None:
+            return slice(None)
+        if isinstance(entity, str):
+            try:
+                loc = self.entities.get_loc(entity)
+            except KeyError:
+                return slice(0, 0)
+            return slice(loc, loc + 1)
+        locs = self.entities.get_indexer(list(entity))
+        return locs[locs >= 0]
+
+    def monthly(self, account, entity=None):
+        """Sum of an account node by month, limited to months that have rows"""
+        with stage('filter'):
+            accounts, entities = self.accounts.select(account), self.entity_cols(entity)
+        with stage('aggregate'):
+            values = self.values[:, entities][:, :, accounts].sum(axis=(1, 2))
+            rows = self.counts[:, entities][:, :, accounts].sum(axis=(1, 2))
+            present = rows > 0
+        count('rows_scanned', rows.sum())
+        return pd.Series(values[present], index=self.months[present], name='amount_usd')
+
+    def by_category(self, account, month=None, entity=None):
+        """Sum of the categories under an account node, optionally for a single month or month range"""
+        with stage('filter'):
+            accounts, entities = self.accounts.select(account), self.entity_cols(entity)
+            rows = self.month_rows(month)
+        with stage('aggregate'):
+            totals = self.values[rows][:, entities][:, :, accounts].sum(axis=(0, 1))
+            counts = self.counts[rows][:, entities][:, :, accounts].sum(axis=(0, 1))
+            present = counts > 0
+        count('rows_scanned', counts.sum())
+        return pd.Series(totals[present], index=self.categories[accounts][present], name='amount_usd')
+
+    def total(self, account, month=None, entity=None):
+        """Sum of an account node over all months, a single month, or a month range"""
+        with stage('filter'):
+            rows, entities, accounts = self.month_rows(month), self.entity_cols(entity), self.accounts.select(account)
+        with stage('aggregate'):
+            total = float(self.values[rows][:, entities][:, :, accounts].sum())
+        if tracing():
+            count('rows_scanned', self.counts[rows][:, entities][:, :, accounts].sum())
+        return total
+
+    def rollup(self, depth=1, month=None, entity=None):
+        """Totals per account node at a hierarchy depth (1 = 'Revenue', 'COGS', 'Opex'; 2 = 'Opex:Sales', ...)"""
+        with stage('filter'):
+            rows, entities = self.month_rows(month), self.entity_cols(entity)
+        with stage('aggregate'):
+            nodes, values = self.accounts.rollup(self.values[rows][:, entities].sum(axis=(0, 1)), depth)
+            _, counts = self.accounts.rollup(self.counts[rows][:, entities].sum(axis=(0, 1)), depth)
+            present = counts > 0
+        count('rows_scanned', counts.sum())
+        return pd.Series(values[present], index=nodes[present], name='amount_usd')
+
+    def to_frame(self):
+        """Long-format view of the populated cells with categorical key columns"""
+        m, e, c = np.nonzero(self.counts)
+        return pd.DataFrame({
+            'month': pd.Categorical.from_codes(m, categories=self.months),
+            'entity': pd.Categorical.from_codes(e, categories=self.entities),
+            'account_category': pd.Categorical.from_codes(c, categories=self.categories),
+            'amount_usd': self.values[m, e, c],
+            'rows': self.counts[m, e, c],
+        })
+
+
+def build_cubes(*frames, amount_col='amount_usd'):
+    """Build one cube per USD-converted ledger frame, all sharing the same axes"""
+    populated = [df for df in frames if not df.empty]
+
+    def axis(col):
+        return sorted(set().union(*(key_labels(df[col])[0] for df in populated)))
+
+    months, entities, categories = axis('month'), axis('entity'), axis('account_category')
+    cubes = []
+    for df in frames:
+        cube = LedgerCube(months, entities, categories)
+        cube.add(df, amount_col)
+        cubes.append(cube)
+    return cubes
+
+
+def align_cubes(*cubes):
+    """Extend every cube in place to the union of their axes"""
+    months = set().union(*(cube.months for cube in cubes))
+    entities = set().union(*(cube.entities for cube in cubes))
+    categories = set().union(*(cube.categories for cube in cubes))
+    for cube in cubes:
+        cube.extend(months, entities, categories)
+    return cubes
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from agent.ledger import encode_months
+
+
+class FXEngine:
+    """Currency x month rate matrix with vectorized, as-of USD conversion
+
+    Months are matched as period codes, so ledgers can be looked up by 'YYYY-MM' label or by code.
+    """
+
+    def __init__(self, fx, base_currency='USD'):
+        self.base_currency = base_currency
+
+        if fx.empty:
+            fx = pd.DataFrame({'month': [], 'currency': [], 'rate_to_usd': []})
+        fx = fx.dropna(subset=['month', 'currency', 'rate_to_usd'])
+        months = encode_months(fx['month'])
+        currencies = fx['currency'].astype(str).to_numpy(dtype=object)
+
+        self.months = np.unique(months)
+        self.currencies = pd.Index(sorted(set(currencies)), dtype=object, name='currency')
+        n_c, n_m = len(self.currencies), len(self.months)
+
+        # Exact rates; later rows win on duplicate (currency, month) pairs
+        self.rates = np.full((n_c, n_m), np.nan)
+        self.rates[self.currencies.get_indexer(currencies), np.searchsorted(self.months, months)] = fx['rate_to_usd'].to_numpy(dtype=np.float64)
+
+        # As-of rates: last known rate at or before each month
+        known = ~np.isnan(self.rates)
+        last = np.maximum.accumulate(np.where(known, np.arange(n_m), -1), axis=1)
+        self.asof = np.where(last >= 0, np.take_along_axis(self.rates, np.maximum(last, 0), axis=1), np.nan)
+
+        # Earliest known rate per currency, used for months before its first rate row
+        first = np.argmax(known, axis=1) if n_m else np.zeros(n_c, dtype=np.int64)
+        self.first = np.where(known.any(axis=1), self.rates[np.arange(n_c), first] if n_m else np.nan, np.nan)
+
+    @property
+    def empty(self):
+        return self.rates.size == 0
+
+    def lookup(self, months, currencies):
+        """Rate to USD for each (month, currency) row and a mask of rows that used a fallback rate
+
+        Rows without an exact rate take the last known rate for their currency, or its
+        earliest rate for months before the first one; unknown currencies fall back to 1.0.
+        """
+        # Resolve the distinct labels once, then gather per row by integer code
+        month_codes, month_labels = pd.factorize(pd.Series(months, copy=False))
+        cur_codes, cur_labels = pd.factorize(pd.Series(currencies, copy=False))
+        month_labels = encode_months(month_labels)
+        cur_labels = np.asarray(cur_labels, dtype=object).astype(str)
+
+        label_pos = np.searchsorted(self.months, month_labels, side='right') - 1
+        label_exact = label_pos >= 0
+        label_exact[label_exact] = self.months[label_pos[label_exact]] == month_labels[label_exact]
+        label_cur = self.currencies.get_indexer(cur_labels)
+        label_base = cur_labels == self.base_currency
+
+        pos = np.append(label_pos, -1)[month_codes]
+        exact_month = np.append(label_exact, False)[month_codes]
+        cur = np.append(label_cur, -1)[cur_codes]
+        base = np.append(label_base, False)[cur_codes]
+
+        rates = np.full(len(cur), np.nan)
+        exact = np.zeros(len(cur), dtype=bool)
+        has_rate = (cur >= 0) & (pos >= 0)
+        rates[has_rate] = self.asof[cur[has_rate], pos[has_rate]]
+        exact[has_rate] = exact_month[has_rate] & ~np.isnan(self.rates[cur[has_rate], pos[has_rate]])
+
+        before_first = (cur >= 0) & np.isnan(rates)
+        rates[before_first] = self.first[cur[before_first]]
+
+        rates[base] = 1.0
+        exact |= base
+        rates[np.isnan(rates)] = 1.0
+        return rates, ~exact
+
+    def convert(self, amounts, months, currencies):
+        """Convert an amount array to USD with indexed gathers instead of a join"""
+        rates, fallback = self.lookup(months, currencies)
+        return np.asarray(amounts, dtype=np.float64) * rates, fallback
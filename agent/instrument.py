@@ -0,0 +1,326 @@
+"""Per-question tracing: stage timings, rows scanned, allocations, Prometheus metrics and slow-question profiles
+
+A trace covers one unit of work (a question, a batch, a PDF export, a data load). Code on the
+hot path marks stages (`with stage('aggregate'):`) and counts (`count('rows_scanned', n)`);
+both are no-ops outside a trace. When a trace ends it is logged as one JSON line on the
+'cfo_copilot' logger and folded into process-wide Prometheus metrics. Start-up milestones
+(`instruments.milestone('first_paint')`) are kept as seconds since start-up.
+
+Environment switches (read once at import):
+    CFO_TRACK_ALLOCATIONS=1      record bytes allocated per trace with tracemalloc (slow)
+    CFO_PROFILE_SLOW_MS=500      sample the stacks of traces and dump those slower than this
+    CFO_PROFILE_DIR=profiles     where slow-trace stacks go (folded format, for flamegraph.pl/speedscope)
+    CFO_METRICS_FILE=path.prom   also write the Prometheus text to this file (node_exporter textfile)
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+logger = logging.getLogger('cfo_copilot')
+
+# Upper bounds (seconds) of the trace latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar('cfo_trace', default=None)
+
+# Start-up milestones are measured from here: the app imports this module before anything heavy
+STARTED = time.perf_counter()
+
+
+class Trace:
+    """Timings and counters of one traced operation"""
+
+    def __init__(self, kind, label=None):
+        self.kind = kind
+        self.label = label
+        self.fields = {}
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.bytes_allocated = None
+        self.profile = None
+
+    def record(self):
+        """Structured log record"""
+        record = {"kind": self.kind, "label": self.label, **self.fields,
+                  "seconds": round(self.seconds, 6),
+                  "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                  **self.counters}
+        if self.bytes_allocated is not None:
+            record["bytes_allocated"] = self.bytes_allocated
+        if self.profile is not None:
+            record["profile"] = self.profile
+        return record
+
+
+class stage:
+    """Time a block as a named stage of the current trace (does nothing outside a trace)"""
+    __slots__ = ('name', 'trace', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.stages[self.name] += time.perf_counter() - self.started
+        return False
+
+
+def count(name, n=1):
+    """Add to a counter of the current trace (rows_scanned, cells_scanned, ...)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] += int(n)
+
+
+def tracing():
+    """Whether the calling code runs inside a trace (to skip work that only feeds counters)"""
+    return _current.get() is not None
+
+
+def fold(frame):
+    """One sampled stack in folded format: root first, frames separated by ';'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """One background thread sampling the stacks of the threads currently being traced"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, thread_id):
+        """Start sampling a thread; returns the Counter its folded stacks accumulate in"""
+        stacks = Counter()
+        with self._lock:
+            self._watched[id(stacks)] = (thread_id, stacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cfo-profiler', daemon=True)
+                self._thread.start()
+        return stacks
+
+    def unwatch(self, stacks):
+        with self._lock:
+            self._watched.pop(id(stacks), None)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = list(self._watched.values())
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in watched:
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != me:
+                    stacks[fold(frame)] += 1
+
+
+class Instruments:
+    """Process-wide trace registry: aggregates finished traces and exports them"""
+
+    def __init__(self, track_allocations=False, slow_ms=None, profile_dir='profiles', metrics_file=None,
+                 metrics_interval=10.0):
+        self.track_allocations = track_allocations
+        self.slow_ms = slow_ms
+        self.profile_dir = profile_dir
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.profiler = SamplingProfiler()
+        self._lock = threading.Lock()
+        self._metrics_written = 0.0
+        self.reset()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        slow_ms = environ.get('CFO_PROFILE_SLOW_MS')
+        return cls(track_allocations=environ.get('CFO_TRACK_ALLOCATIONS') == '1',
+                   slow_ms=float(slow_ms) if slow_ms else None,
+                   profile_dir=environ.get('CFO_PROFILE_DIR', 'profiles'),
+                   metrics_file=environ.get('CFO_METRICS_FILE'))
+
+    def reset(self):
+        with self._lock:
+            self.traces = Counter()
+            self.slow = Counter()
+            self.seconds = defaultdict(float)
+            self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+            self.stage_seconds = defaultdict(float)
+            self.stage_calls = Counter()
+            self.counters = defaultdict(int)
+            self.questions = Counter()
+            self.recent = []
+            self.milestones = {}
+
+    def milestone(self, name):
+        """Record when a start-up milestone (first_paint, data_loaded, first_answer, ...) was first reached
+
+        Returns the seconds since start-up; only the first call for a name counts.
+        """
+        with self._lock:
+            if name in self.milestones:
+                return self.milestones[name]
+            seconds = self.milestones[name] = time.perf_counter() - STARTED
+        logger.info(json.dumps({"kind": "milestone", "milestone": name, "seconds": round(seconds, 6)}))
+        return seconds
+
+    def trace(self, kind, label=None):
+        """Context manager tracing a unit of work; nested traces fold into the outer one as a stage"""
+        return _TraceContext(self, kind, label)
+
+    def finish(self, trace):
+        """Fold a finished trace into the metrics, log it and dump its profile if it was slow"""
+        slow = self.slow_ms is not None and trace.seconds * 1000 >= self.slow_ms
+        if slow and trace.profile is not None:
+            trace.profile = self.dump_profile(trace, trace.profile)
+        else:
+            trace.profile = None
+
+        with self._lock:
+            self.traces[trace.kind] += 1
+            self.slow[trace.kind] += slow
+            self.seconds[trace.kind] += trace.seconds
+            buckets = self.buckets[trace.kind]
+            for i, bound in enumerate(BUCKETS):
+                if trace.seconds <= bound:
+                    buckets[i] += 1
+            for name, seconds in trace.stages.items():
+                self.stage_seconds[(trace.kind, name)] += seconds
+                self.stage_calls[(trace.kind, name)] += 1
+            for name, value in trace.counters.items():
+                self.counters[(trace.kind, name)] += value
+            if trace.bytes_allocated is not None:
+                self.counters[(trace.kind, 'bytes_allocated')] += trace.bytes_allocated
+            if 'metric' in trace.fields:
+                self.questions[trace.fields['metric']] += 1
+            self.recent = (self.recent + [trace.record()])[-100:]
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(trace.record(), default=str))
+        if self.metrics_file and time.monotonic() - self._metrics_written >= self.metrics_interval:
+            self.write_prometheus(self.metrics_file)
+
+    def dump_profile(self, trace, stacks):
+        """Write a slow trace's sampled stacks (folded: 'frame;frame;frame count' lines); returns the path"""
+        if not stacks:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{trace.kind}-{time.strftime('%Y%m%d-%H%M%S')}-{int(trace.seconds * 1000)}ms-{id(trace):x}.folded")
+        with open(path, 'w') as f:
+            for frames, samples in stacks.most_common():
+                f.write(f"{frames} {samples}\n")
+        return path
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP cfo_traces_total Traced operations (questions, batches, exports, loads)",
+                "# TYPE cfo_traces_total counter",
+            ]
+            lines += [f'cfo_traces_total{{kind="{kind}"}} {n}' for kind, n in sorted(self.traces.items())]
+            lines += ["# HELP cfo_slow_traces_total Traces over the slow threshold", "# TYPE cfo_slow_traces_total counter"]
+            lines += [f'cfo_slow_traces_total{{kind="{kind}"}} {n}' for kind, n in sorted(self.slow.items())]
+            lines += ["# HELP cfo_trace_seconds Trace wall time", "# TYPE cfo_trace_seconds histogram"]
+            for kind in sorted(self.traces):
+                for bound, n in zip(BUCKETS, self.buckets[kind]):
+                    lines.append(f'cfo_trace_seconds_bucket{{kind="{kind}",le="{bound}"}} {n}')
+                lines.append(f'cfo_trace_seconds_bucket{{kind="{kind}",le="+Inf"}} {self.traces[kind]}')
+                lines.append(f'cfo_trace_seconds_sum{{kind="{kind}"}} {self.seconds[kind]:.6f}')
+                lines.append(f'cfo_trace_seconds_count{{kind="{kind}"}} {self.traces[kind]}')
+            lines += ["# HELP cfo_stage_seconds_total Time spent per stage", "# TYPE cfo_stage_seconds_total counter"]
+            lines += [f'cfo_stage_seconds_total{{kind="{kind}",stage="{name}"}} {seconds:.6f}'
+                      for (kind, name), seconds in sorted(self.stage_seconds.items())]
+            lines += ["# HELP cfo_stage_traces_total Traces that ran each stage", "# TYPE cfo_stage_traces_total counter"]
+            lines += [f'cfo_stage_traces_total{{kind="{kind}",stage="{name}"}} {n}'
+                      for (kind, name), n in sorted(self.stage_calls.items())]
+            for name in sorted({name for _, name in self.counters}):
+                lines += [f"# HELP cfo_{name}_total Sum of {name} over traces", f"# TYPE cfo_{name}_total counter"]
+                lines += [f'cfo_{name}_total{{kind="{kind}"}} {value}'
+                          for (kind, counter), value in sorted(self.counters.items()) if counter == name]
+            lines += ["# HELP cfo_questions_total Answered questions by metric", "# TYPE cfo_questions_total counter"]
+            lines += [f'cfo_questions_total{{metric="{metric}"}} {n}' for metric, n in sorted(self.questions.items())]
+            lines += ["# HELP cfo_startup_seconds Seconds from start-up to each milestone", "# TYPE cfo_startup_seconds gauge"]
+            lines += [f'cfo_startup_seconds{{milestone="{name}"}} {seconds:.6f}' for name, seconds in self.milestones.items()]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the metrics text atomically (for a textfile collector)"""
+        temp = f"{path}.tmp"
+        with open(temp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(temp, path)
+        self._metrics_written = time.monotonic()
+
+
+class _TraceContext:
+    def __init__(self, instruments, kind, label):
+        self.instruments = instruments
+        self.kind = kind
+        self.label = label
+
+    def __enter__(self):
+        outer = _current.get()
+        if outer is not None:
+            # Inside another trace: time it as a stage of that one
+            self.stage = stage(self.kind).__enter__()
+            return outer
+
+        self.stage = None
+        instruments = self.instruments
+        trace = Trace(self.kind, self.label)
+        if instruments.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        if instruments.slow_ms is not None:
+            trace.profile = instruments.profiler.watch(threading.get_ident())
+        self.trace = trace
+        self.token = _current.set(trace)
+        trace.started = time.perf_counter()
+        return trace
+
+    def __exit__(self, *exc):
+        if self.stage is not None:
+            return self.stage.__exit__(*exc)
+
+        trace = self.trace
+        trace.seconds = time.perf_counter() - trace.started
+        _current.reset(self.token)
+        if self.instruments.track_allocations:
+            # Peak growth over the trace; with concurrent traces this is process-wide
+            trace.bytes_allocated = max(0, tracemalloc.get_traced_memory()[1] - self.allocated)
+        if trace.profile is not None:
+            self.instruments.profiler.unwatch(trace.profile)
+        if exc[0] is not None:
+            trace.fields['error'] = exc[0].__name__
+        self.instruments.finish(trace)
+        return False
+
+
+# One registry per process, shared by every planner, export and service
+instruments = Instruments.from_env()
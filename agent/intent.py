@@ -0,0 +1,292 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Metric keywords in routing priority order (first match wins, as in the original if/elif chain)
+METRIC_KEYWORDS = [
+    ('opex', ['opex', 'operating expense', 'breakdown']),
+    ('ebitda', ['ebitda']),
+    ('runway', ['cash', 'runway', 'burn']),
+    ('margin', ['margin', 'gross']),
+    ('revenue', ['revenue', 'budget']),
+]
+METRIC_PRIORITY = {metric: rank for rank, (metric, _) in enumerate(METRIC_KEYWORDS)}
+KEYWORD_METRIC = {kw: metric for metric, kws in METRIC_KEYWORDS for kw in kws}
+
+MONTH_WORDS = {
+    name: number
+    for number, names in enumerate([
+        ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'),
+        ('may',), ('jun', 'june'), ('jul', 'july'), ('aug', 'august'),
+        ('sep', 'sept', 'september'), ('oct', 'october'), ('nov', 'november'), ('dec', 'december'),
+    ], start=1)
+    for name in names
+}
+QUARTERS = {'q1': 1, 'q2': 2, 'q3': 3, 'q4': 4}
+LAST_WORDS = {'last', 'past', 'trailing'}
+VERSUS_WORDS = {'vs', 'versus', 'against'}
+SCENARIO_WORDS = {'scenario', 'scenarios', 'simulate', 'simulation', 'simulations', 'monte'}
+VARIANCE_WORDS = {'variance', 'variances', 'overrun', 'overruns', 'overspend', 'overspent', 'underrun', 'underspend',
+                  'drove', 'driver', 'drivers'}
+# What-if drivers: word -> (scenario parameter, sign; a stronger dollar is weaker foreign currencies)
+SCENARIO_DRIVERS = {
+    **dict.fromkeys(['revenue', 'revenues', 'sales'], ('revenue_growth', 1)),
+    **dict.fromkeys(['opex', 'costs', 'cost', 'expenses', 'expense', 'spend', 'spending'], ('opex_growth', 1)),
+    **dict.fromkeys(['fx', 'currency', 'currencies', 'euro', 'eur', 'gbp', 'pound', 'yen'], ('fx_shock', 1)),
+    **dict.fromkeys(['dollar', 'usd'], ('fx_shock', -1)),
+    **dict.fromkeys(['hire', 'hires', 'hiring', 'headcount', 'people', 'employees', 'engineers', 'staff'], ('hires', 1)),
+}
+# Parameters given as a percentage; the others (hires) are counts
+PERCENT_DRIVERS = {'revenue_growth', 'opex_growth', 'fx_shock'}
+UP_WORDS = {'grow', 'grows', 'rise', 'rises', 'increase', 'increases', 'up', 'higher', 'more', 'gain', 'gains',
+            'strengthen', 'strengthens', 'stronger', 'appreciate', 'appreciates', 'add', 'adds', 'double', 'doubles'}
+DOWN_WORDS = {'drop', 'drops', 'fall', 'falls', 'decline', 'declines', 'decrease', 'decreases', 'down', 'lower', 'less',
+              'fewer', 'shrink', 'shrinks', 'cut', 'cuts', 'lose', 'loses', 'weaken', 'weakens', 'weaker',
+              'depreciate', 'depreciates', 'lay', 'layoff', 'layoffs', 'fire', 'halve', 'halves'}
+ANOMALY_WORDS = {'anomaly', 'anomalies', 'anomalous', 'unusual', 'outlier', 'outliers', 'abnormal', 'irregular',
+                 'spike', 'spikes'}
+
+# Metrics whose answer only needs the ledger rows of the asked period and entity (see Intent.scope)
+SCOPED_METRICS = {'revenue', 'opex', 'ebitda', 'variance'}
+
+# One precompiled tokenizer: words (optionally with trailing digits, e.g. q1), signed percentages and numbers/ISO months
+TOKEN = re.compile(r"[a-z]+\d*|[-+]?\d+(?:\.\d+)?%|\d+(?:-\d+)?")
+
+
+@dataclass(frozen=True)
+class Intent:
+    """Parsed question: what to compute and over which period/entity"""
+    metric: str
+    month: str = None
+    start: str = None
+    end: str = None
+    entity: str = None
+    last_n: int = None
+    comparison: str = None
+    label: str = None
+    by_entity: bool = False
+    scenario: bool = False
+    variance: bool = False
+    anomaly: bool = False
+    what_if: bool = False
+    assumption: tuple = None
+
+    @property
+    def period(self):
+        """Single month, (start, end) month range, or None for all months"""
+        if self.month:
+            return self.month
+        if self.start or self.end:
+            return (self.start, self.end)
+        return None
+
+    @property
+    def period_label(self):
+        return self.month or self.label
+
+    @property
+    def scope(self):
+        """(period, entity) of the ledger rows the answer needs, or None when it needs every month and entity
+
+        Trends, runway and what-if scenarios, trailing windows, MoM/YoY changes and anomaly scans look
+        beyond the asked period.
+        """
+        if (self.metric not in SCOPED_METRICS or self.last_n or self.comparison in ('mom', 'yoy')
+                or self.anomaly or self.scenario):
+            return None
+        entity = None if self.by_entity else self.entity
+        if self.period is None and entity is None:
+            return None
+        return (self.period, entity)
+
+
+@lru_cache(maxsize=4096)
+def token_metric(token):
+    """Metric of the first keyword inside a word, like the original substring tests (bounded memo: questions are free text)"""
+    return next((metric for kw, metric in KEYWORD_METRIC.items() if ' ' not in kw and kw in token), None)
+
+
+def assumption(tokens):
+    """Scenario parameters of a what-if clause list: ((parameter, value), ...), or None if a clause is not understood
+
+    Clauses are split on "and"; each names a driver, a direction and a percentage (a count for hires):
+    "revenue drops 20%" -> (('revenue_growth', -0.2),), "we hire 5 people" -> (('hires', 5.0),).
+    """
+    params = {}
+    clauses = [[]]
+    for tok in tokens:
+        if tok == 'and':
+            clauses.append([])
+        else:
+            clauses[-1].append(tok)
+    for clause in clauses:
+        driver = next((SCENARIO_DRIVERS[tok] for tok in clause if tok in SCENARIO_DRIVERS), None)
+        if driver is None:
+            continue
+        name, factor = driver
+        direction = next((1 if tok in UP_WORDS else -1 for tok in clause if tok in UP_WORDS or tok in DOWN_WORDS), None)
+        if name in PERCENT_DRIVERS:
+            amount = next((tok for tok in clause if tok.endswith('%')), None)
+            # A signed percentage ("-10%") or a growth rate ("revenue growth of 10%") needs no direction word
+            if amount is not None and (amount[0] in '+-' or 'growth' in clause):
+                direction = direction or 1
+            amount = amount and float(amount[:-1]) / 100
+        else:
+            amount = next((float(tok) for tok in clause if tok.isdigit() and len(tok) <= 3), None)
+            # "hire 5 people" adds heads unless the clause says otherwise ("lay off 5 people")
+            direction = direction or 1
+        if amount is None or direction is None:
+            return None
+        params[name] = params.get(name, 0.0) + direction * factor * amount
+    return tuple(params.items()) or None
+
+
+def _year(text):
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+class IntentParser:
+    """Single-pass question parser: one precompiled tokenizer plus keyword tables keyed on the first token"""
+
+    def __init__(self, entities=(), latest_month=None):
+        self.latest_month = latest_month
+
+        # First token of each entity name -> [(name tokens, entity)], longest names first
+        self.entities = {}
+        for entity in sorted(entities, key=len, reverse=True):
+            tokens = tuple(TOKEN.findall(entity.lower()))
+            if tokens:
+                self.entities.setdefault(tokens[0], []).append((tokens, entity))
+
+    def parse(self, question):
+        """Parse a question into an Intent"""
+        tokens = TOKEN.findall(question.lower())
+        n = len(tokens)
+        metric = None
+        months = []
+        years = []
+        quarter = quarter_year = None
+        ytd = qtd = False
+        ytd_year = None
+        entity = last_n = comparison = None
+        by_entity = scenario = variance = anomaly = what_if = False
+        hypothesis = None
+
+        i = 0
+        while i < n:
+            tok = tokens[i]
+            nxt = tokens[i + 1] if i + 1 < n else ''
+            step = 1
+            candidate = None
+
+            if tok in MONTH_WORDS and nxt.isdigit() and len(nxt) in (2, 4):
+                months.append(f"{_year(nxt)}-{MONTH_WORDS[tok]:02d}")
+                step = 2
+            elif len(tok) == 7 and tok[4] == '-' and tok[:4].isdigit() and '01' <= tok[5:] <= '12':
+                months.append(tok)
+            elif tok in QUARTERS:
+                quarter = QUARTERS[tok]
+                quarter_year = None
+                if nxt.isdigit() and len(nxt) in (2, 4):
+                    quarter_year = _year(nxt)
+                    step = 2
+            elif tok == 'ytd' or (tok == 'year' and tokens[i + 1:i + 3] == ['to', 'date']):
+                ytd = True
+                step = 1 if tok == 'ytd' else 3
+                after = tokens[i + step] if i + step < n else ''
+                if after.isdigit() and len(after) == 4:
+                    ytd_year = int(after)
+                    step += 1
+            elif tok in LAST_WORDS and nxt.isdigit() and i + 2 < n and tokens[i + 2].startswith('month'):
+                last_n = int(nxt)
+                step = 3
+            elif tok.isdigit() and len(tok) <= 2 and nxt.startswith('month'):
+                # Window sizes such as "6 months" or "3-month rolling"
+                last_n = int(tok)
+                step = 2
+            elif len(tok) == 4 and tok.isdigit() and tok[:2] in ('19', '20'):
+                # A bare year ("EBITDA in 2023"); years after a month or quarter are consumed with it
+                years.append(int(tok))
+            elif tok == 'qtd' or (tok == 'quarter' and tokens[i + 1:i + 3] == ['to', 'date']):
+                qtd = True
+                step = 1 if tok == 'qtd' else 3
+            elif (tok in VERSUS_WORDS and nxt == 'budget') or (tok == 'compared' and nxt in ('to', 'with') and tokens[i + 2:i + 3] == ['budget']):
+                comparison = 'budget'
+                candidate = 'revenue'
+            elif tok == 'mom' or (tok == 'month' and tokens[i + 1:i + 3] == ['over', 'month']):
+                comparison = 'mom'
+                step = 1 if tok == 'mom' else 3
+            elif tok == 'yoy' or (tok == 'year' and tokens[i + 1:i + 3] == ['over', 'year']):
+                comparison = 'yoy'
+                step = 1 if tok == 'yoy' else 3
+            elif tok in ('by', 'per', 'each') and nxt.startswith('entit'):
+                by_entity = True
+                step = 2
+            elif tok in SCENARIO_WORDS or (tok == 'what' and nxt == 'if'):
+                scenario = True
+                step = 1 if tok in SCENARIO_WORDS else 2
+                if tok == 'what' and not what_if:
+                    # The hypothesis is everything after "what if"
+                    what_if = True
+                    hypothesis = assumption(tokens[i + 2:])
+            elif tok in VARIANCE_WORDS:
+                variance = True
+            elif tok in ANOMALY_WORDS:
+                anomaly = True
+            elif tok == 'operating' and 'expense' in nxt:
+                candidate = 'opex'
+                step = 2
+            else:
+                candidate = token_metric(tok)
+                for name_tokens, name in self.entities.get(tok, ()):
+                    if tuple(tokens[i:i + len(name_tokens)]) == name_tokens:
+                        entity = name
+                        step = len(name_tokens)
+                        break
+
+            if candidate and (metric is None or METRIC_PRIORITY[candidate] < METRIC_PRIORITY[metric]):
+                metric = candidate
+            i += step
+        month = start = end = label = None
+        latest_year = int(self.latest_month[:4]) if self.latest_month else None
+        # A year elsewhere in the question ("Q2 of 2024") applies to a quarter or YTD without one
+        default_year = years[0] if years else latest_year
+        if ytd:
+            year = int(months[0][:4]) if months else ytd_year or default_year
+            if year:
+                start = f"{year}-01"
+                end = months[0] if months else (self.latest_month if year == latest_year else f"{year}-12")
+                label = f"YTD {year}"
+        elif qtd:
+            end = months[0] if months else self.latest_month
+            if end:
+                quarter_of = (int(end[5:7]) - 1) // 3
+                start = f"{end[:4]}-{3 * quarter_of + 1:02d}"
+                label = f"QTD {end[:4]} Q{quarter_of + 1}"
+        elif quarter:
+            year = quarter_year or default_year
+            if year:
+                start, end = f"{year}-{3 * quarter - 2:02d}", f"{year}-{3 * quarter:02d}"
+                label = f"Q{quarter} {year}"
+        elif len(months) >= 2:
+            start, end = min(months), max(months)
+            label = f"{start} to {end}"
+        elif months:
+            month = months[0]
+        elif years:
+            start, end = f"{min(years)}-01", f"{max(years)}-12"
+            label = str(years[0]) if len(set(years)) == 1 else f"{min(years)} to {max(years)}"
+
+        # Scenario questions without a metric are about cash ("run a Monte Carlo simulation")
+        if scenario and metric is None:
+            metric = 'runway'
+        # Variance questions without a metric are about every account ("what drove the variance?")
+        if variance and metric is None:
+            metric = 'variance'
+        # Anomaly questions without a metric scan every account ("anything unusual this month?")
+        if anomaly and metric is None:
+            metric = 'anomalies'
+
+        return Intent(metric or 'help', month, start, end, entity, last_n, comparison, label, by_entity, scenario, variance,
+                      anomaly, what_if, hypothesis)
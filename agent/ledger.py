@@ -0,0 +1,142 @@
+"""Compact ledger frames: integer month codes, dictionary-encoded keys and fixed-point cents
+
+A loaded ledger is held at (month, entity, account_category, currency) grain: rows sharing those
+keys are summed into one on load, with `rows` counting the source lines behind it. Months are int16
+period codes (months since 1970-01), the other keys are categoricals, and amounts are int64
+cents, so sums are exact. Every metric is a sum over these keys and FX rates are per
+(month, currency), so nothing the tools compute needs the individual lines.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype, union_categoricals
+
+KEYS = ['month', 'entity', 'account_category', 'currency']
+LABELS = ['entity', 'account_category', 'currency']
+COLUMNS = KEYS + ['amount_cents', 'rows']
+
+MONTH_DTYPE = np.int16
+# Code for rows without a month; such rows fall outside every month and are dropped on compaction
+NO_MONTH = MONTH_DTYPE(np.iinfo(MONTH_DTYPE).min)
+
+
+def encode_months(months):
+    """int16 period codes for 'YYYY-MM' labels (integer input is taken as codes already)"""
+    if is_integer_dtype(getattr(months, 'dtype', None)):
+        return np.asarray(months, dtype=MONTH_DTYPE)
+    # Parse each distinct label once
+    codes, labels = pd.factorize(pd.Series(months, copy=False))
+    parsed = pd.PeriodIndex(np.asarray(labels, dtype=object).astype(str), freq='M').asi8.astype(MONTH_DTYPE)
+    return np.append(parsed, NO_MONTH)[codes]
+
+
+def month_code(label):
+    """Period code of one 'YYYY-MM' label"""
+    return MONTH_DTYPE(pd.Period(label, 'M').ordinal)
+
+
+def decode_months(codes):
+    """'YYYY-MM' labels for period codes; meant for distinct values, not a label per row"""
+    codes = np.asarray(codes, dtype=np.int64)
+    years, months = np.divmod(codes, 12)
+    return np.array([f"{1970 + y:04d}-{m + 1:02d}" for y, m in zip(years, months)], dtype=object)
+
+
+def to_cents(amounts):
+    """Fixed-point int64 cents, rounded half to even; blank (NaN) amounts count as zero, as in a pandas sum"""
+    cents = np.rint(np.asarray(amounts, dtype=np.float64) * 100)
+    # Casting NaN to int64 would give INT64_MIN
+    cents[~np.isfinite(cents)] = 0
+    return cents.astype(np.int64)
+
+
+def empty_ledger():
+    return pd.DataFrame({
+        'month': np.array([], dtype=MONTH_DTYPE),
+        **{col: pd.Categorical([]) for col in LABELS},
+        'amount_cents': np.array([], dtype=np.int64),
+        'rows': np.array([], dtype=np.uint8),
+    })
+
+
+def compact_ledger(df):
+    """Ledger rows (CSV schema: string months, float amounts) summed to compact key-grain form
+
+    Frames that are already compact are returned as they are.
+    """
+    if 'amount_cents' in df:
+        return df
+    if df.empty:
+        return empty_ledger()
+
+    keys = pd.DataFrame({
+        'month': encode_months(df['month']),
+        **{col: df[col].astype('category') for col in LABELS},
+        'amount_cents': to_cents(df['amount']),
+        'rows': np.ones(len(df), dtype=np.uint8),
+    })
+    keys = keys[keys['month'] != NO_MONTH]
+    return collapse(keys)
+
+
+def collapse(ledger):
+    """Sum rows that share all four keys, sorted by key (categories are trimmed to the values still used)"""
+    if ledger.empty:
+        return empty_ledger()
+    month = ledger['month'].to_numpy(dtype=np.int64)
+    parts = [month - month.min()] + [ledger[col].cat.codes.to_numpy(dtype=np.int64) + 1 for col in LABELS]
+    # One mixed-radix integer per row; month is the most significant digit
+    key = np.zeros(len(ledger), dtype=np.int64)
+    for part in parts:
+        key = key * (int(part.max()) + 1) + part
+
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    first = order[starts]
+    summed = pd.DataFrame({
+        'month': month[first].astype(MONTH_DTYPE),
+        **{col: ledger[col].iloc[first].cat.remove_unused_categories().reset_index(drop=True) for col in LABELS},
+        # Integer reductions, so the cents stay exact
+        'amount_cents': np.add.reduceat(ledger['amount_cents'].to_numpy(dtype=np.int64)[order], starts),
+        'rows': narrow(np.add.reduceat(ledger['rows'].to_numpy(dtype=np.int64)[order], starts)),
+    })
+    return summed
+
+
+def narrow(counts):
+    """Line counts in the smallest unsigned integer type that holds them (most keys have a handful)"""
+    return counts.astype(np.min_scalar_type(int(counts.max(initial=0))))
+
+
+def concat_ledgers(*ledgers):
+    """One compact ledger from several, with their categories merged rather than decayed to strings
+
+    Rows are not collapsed again: an appended key may repeat, which no sum over the ledger minds.
+    """
+    ledgers = [ledger for ledger in ledgers if not ledger.empty]
+    if not ledgers:
+        return empty_ledger()
+    if len(ledgers) == 1:
+        return ledgers[0]
+    return pd.DataFrame({
+        'month': np.concatenate([ledger['month'].to_numpy() for ledger in ledgers]),
+        **{col: union_categoricals([ledger[col] for ledger in ledgers]) for col in LABELS},
+        'amount_cents': np.concatenate([ledger['amount_cents'].to_numpy() for ledger in ledgers]),
+        'rows': np.concatenate([ledger['rows'].to_numpy() for ledger in ledgers]),
+    })
+
+
+def month_labels(ledger):
+    """Sorted 'YYYY-MM' labels of the months present in a compact ledger"""
+    return list(decode_months(np.unique(ledger['month'].to_numpy())))
+
+
+def readable(ledger):
+    """A compact ledger with month labels and dollar amounts, for display and debugging"""
+    codes, uniques = pd.factorize(ledger['month'], sort=True)
+    return pd.DataFrame({
+        'month': pd.Categorical.from_codes(codes, categories=decode_months(uniques)),
+        **{col: ledger[col] for col in LABELS},
+        'amount': ledger['amount_cents'].to_numpy() / 100,
+        'rows': ledger['rows'],
+    })
@@ -0,0 +1,251 @@
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - cache is skipped without pyarrow
+    feather = None
+
+LEDGER_DTYPES = {
+    'month': 'category',
+    'entity': 'category',
+    'account_category': 'category',
+    'amount': 'float64',
+    'currency': 'category',
+}
+
+DTYPES = {
+    'actuals': LEDGER_DTYPES,
+    'budget': LEDGER_DTYPES,
+    'cash': {'month': 'category', 'entity': 'category', 'cash_usd': 'float64'},
+    'fx': {'month': 'category', 'currency': 'category', 'rate_to_usd': 'float64'},
+}
+
+CACHE_VERSION = 1
+
+
+def content_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, with_hash=True):
+    """Size, mtime and (optionally) content hash identifying a source file"""
+    stat = os.stat(path)
+    fp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': CACHE_VERSION}
+    if with_hash:
+        fp['sha256'] = content_hash(path)
+    return fp
+
+
+def csv_dtypes(path, name):
+    """Typed schema for the columns actually present in a fixture CSV"""
+    header = pd.read_csv(path, nrows=0).columns
+    return {col: dtype for col, dtype in DTYPES.get(name, {}).items() if col in header}
+
+
+def source_version(fixtures_dir, names=('actuals', 'budget', 'cash', 'fx')):
+    """Token that changes whenever any fixture file (or partition file) is added, replaced or modified"""
+    digest = hashlib.sha256()
+    for name in names:
+        path = os.path.join(fixtures_dir, f'{name}.csv')
+        if os.path.exists(path):
+            fp = fingerprint(path, with_hash=False)
+            digest.update(f"{name}:{fp['size']}:{fp['mtime_ns']};".encode())
+        for path, _ in find_partitions(fixtures_dir, name):
+            fp = fingerprint(path, with_hash=False)
+            digest.update(f"{os.path.relpath(path, fixtures_dir)}:{fp['size']}:{fp['mtime_ns']};".encode())
+    return digest.hexdigest()[:16]
+
+
+def partition_keys(relative):
+    """Keys of a partition file from its path: 'entity=EMEA/month=2024-02.csv' -> {'entity': 'EMEA', 'month': '2024-02'}"""
+    parts = relative.split(os.sep)
+    parts[-1] = os.path.splitext(parts[-1])[0]
+    keys = {}
+    for part in parts:
+        key, sep, value = part.partition('=')
+        if sep:
+            keys[key] = value
+    return keys
+
+
+def find_partitions(fixtures_dir, name):
+    """(path, keys) of every CSV under fixtures/<name>/ in path order; empty when the dataset is not partitioned"""
+    root = os.path.join(fixtures_dir, name)
+    found = []
+    if os.path.isdir(root):
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for file in sorted(files):
+                if file.endswith('.csv'):
+                    path = os.path.join(directory, file)
+                    found.append((path, partition_keys(os.path.relpath(path, root))))
+    return found
+
+
+def read_partition(path, name, keys):
+    """Typed rows of one partition file; partition keys the file leaves out become columns"""
+    # The full schema is passed (pandas skips absent columns) to save a header read per small file
+    df = pd.read_csv(path, dtype=DTYPES.get(name))
+    for key, value in keys.items():
+        if key not in df:
+            dtype = DTYPES.get(name, {}).get(key, 'object')
+            df[key] = pd.Series([value] * len(df), dtype=dtype, index=df.index)
+    return df
+
+
+def has_dataset(fixtures_dir, name):
+    """Whether a dataset exists as fixtures/<name>.csv or as a partitioned fixtures/<name>/ directory"""
+    return os.path.exists(os.path.join(fixtures_dir, f'{name}.csv')) or bool(find_partitions(fixtures_dir, name))
+
+
+def read_csv(path, name):
+    """Parse a fixture CSV with the typed schema for its dataset; returns the frame and the bytes parsed
+
+    The byte count is where the parser stopped reading, so rows appended while it ran are not
+    counted as read (see read_appended).
+    """
+    with open(path, 'rb') as f:
+        df = pd.read_csv(f, dtype=csv_dtypes(path, name))
+        return df, f.tell()
+
+
+def iter_csv(fixtures_dir, name, chunksize, parsed=None):
+    """Yield typed chunks of fixtures/<name>.csv without reading the whole file
+
+    Once every chunk has been read, parsed[name] is set to the bytes parsed.
+    """
+    path = os.path.join(fixtures_dir, f'{name}.csv')
+    with open(path, 'rb') as f:
+        with pd.read_csv(f, dtype=csv_dtypes(path, name), chunksize=chunksize) as reader:
+            yield from reader
+        if parsed is not None:
+            parsed[name] = f.tell()
+
+
+def iter_dataset(fixtures_dir, name, chunksize, parsed=None):
+    """Yield typed chunks of a dataset: of fixtures/<name>.csv, or one per partition file when it is partitioned"""
+    partitions = find_partitions(fixtures_dir, name)
+    if not partitions:
+        yield from iter_csv(fixtures_dir, name, chunksize, parsed)
+        return
+    for path, keys in partitions:
+        yield read_partition(path, name, keys)
+
+
+def read_appended(fixtures_dir, name, offset):
+    """Typed rows appended to fixtures/<name>.csv after byte offset, and the offset to resume from
+
+    Only complete lines are read: a last line without its newline may still be being written,
+    so it is left for the next call.
+    """
+    path = os.path.join(fixtures_dir, f'{name}.csv')
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    tail = tail[:tail.rfind(b'\n') + 1]
+    end = offset + len(tail)
+    if not tail.strip():
+        return pd.DataFrame(), end
+    # The header is re-attached so the appended rows parse with the file's own columns
+    data = tail if offset == 0 else header.rstrip(b'\r\n') + b'\n' + tail
+    return pd.read_csv(io.BytesIO(data), dtype=csv_dtypes(path, name)), end
+
+
+class FixtureCache:
+    """Typed Feather copies of the fixture CSVs, rebuilt when the source fingerprint changes"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return f'{base}.feather', f'{base}.meta.json'
+
+    def is_fresh(self, source, name):
+        """Check the cached copy against the source's size, mtime and content hash"""
+        data_path, meta_path = self.paths(name)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return False
+
+        with open(meta_path) as f:
+            cached = json.load(f)
+        current = fingerprint(source, with_hash=False)
+        if current['size'] != cached.get('size') or current['version'] != cached.get('version'):
+            return False
+        if current['mtime_ns'] == cached.get('mtime_ns'):
+            return True
+
+        # Touched but possibly unchanged: only a content hash can tell
+        if content_hash(source) != cached.get('sha256'):
+            return False
+        cached['mtime_ns'] = current['mtime_ns']
+        self._write_meta(meta_path, cached)
+        return True
+
+    def read(self, name):
+        """Memory-map the cached Feather file into a DataFrame"""
+        data_path, _ = self.paths(name)
+        return feather.read_table(data_path, memory_map=True).to_pandas()
+
+    def source_size(self, name):
+        """Byte size of the source CSV the cached copy was built from"""
+        _, meta_path = self.paths(name)
+        with open(meta_path) as f:
+            return json.load(f)['size']
+
+    def write(self, name, df, source_fingerprint):
+        """Store df as uncompressed Feather (so it can be memory-mapped) with the source fingerprint"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, meta_path = self.paths(name)
+        tmp_path = f'{data_path}.{os.getpid()}.tmp'
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, data_path)
+        self._write_meta(meta_path, source_fingerprint)
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+
+def load_dataset(fixtures_dir, name, cache_dir=None, parsed=None):
+    """Load fixtures/<name>.csv, going through the columnar cache when one is configured
+
+    parsed[name] is set to the bytes of the CSV the frame holds, where appended rows start.
+    """
+    source = os.path.join(fixtures_dir, f'{name}.csv')
+    parsed = {} if parsed is None else parsed
+    if cache_dir is None or feather is None:
+        df, parsed[name] = read_csv(source, name)
+        return df
+
+    cache = FixtureCache(cache_dir)
+    try:
+        if cache.is_fresh(source, name):
+            df = cache.read(name)
+            parsed[name] = cache.source_size(name)
+            return df
+    except Exception as e:
+        print(f"Ignoring unreadable cache for {name}: {e}")
+
+    df, parsed[name] = read_csv(source, name)
+    source_fingerprint = fingerprint(source)
+    # A file that grew while it was parsed does not match the frame; cache it on the next load
+    if source_fingerprint['size'] == parsed[name]:
+        try:
+            cache.write(name, df, source_fingerprint)
+        except Exception as e:
+            print(f"Could not write cache for {name}: {e}")
+    return df
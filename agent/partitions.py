@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from agent.ledger import compact_ledger, concat_ledgers, empty_ledger
+from agent.loader import find_partitions, read_partition
+
+LEDGERS = ('actuals', 'budget')
+# Partition keys a question can prune on
+PRUNING_KEYS = ('month', 'entity')
+
+
+def load_partition(path, name, keys, compact=False):
+    """One partition file, compacted when asked and it is a ledger (runs in a pool worker)"""
+    df = read_partition(path, name, keys)
+    return compact_ledger(df) if compact and name in LEDGERS else df
+
+
+def key_matches(value, selection):
+    """Whether a partition key value can hold rows for a month/entity selection (None, one value, a list or a (start, end) range)"""
+    if selection is None or value is None:
+        return True
+    if isinstance(selection, tuple):
+        start, end = selection
+        return (not start or value >= start) and (not end or value <= end)
+    if isinstance(selection, str):
+        return value == selection
+    return value in set(selection)
+
+
+class PartitionIndex:
+    """Partition files of one dataset (fixtures/actuals/entity=EMEA/month=2024-02.csv, ...) and their keys
+
+    The keys come from the directory and file names, so the index is built without opening a
+    file. It prunes partitions that cannot hold rows for a month or entity, and reads the rest
+    in parallel.
+    """
+
+    def __init__(self, fixtures_dir, name):
+        self.name = name
+        found = find_partitions(fixtures_dir, name)
+        self.paths = [path for path, _ in found]
+        self.keys = [keys for _, keys in found]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def values(self, key):
+        """Sorted distinct values of a partition key, or None if some partition is not keyed on it"""
+        values = [keys.get(key) for keys in self.keys]
+        if not values or None in values:
+            return None
+        return sorted(set(values))
+
+    def select(self, month=None, entity=None):
+        """Positions of the partitions that can hold rows for month and entity"""
+        selections = {'month': month, 'entity': entity}
+        return [i for i, keys in enumerate(self.keys)
+                if all(key_matches(keys.get(key), selections[key]) for key in PRUNING_KEYS)]
+
+    def read(self, month=None, entity=None, workers=None, processes=False):
+        """(rows, partitions read) for month and entity: one compact ledger for actuals/budget, else one frame
+
+        Partitions are read on a thread pool (or a process pool with processes=True) of `workers`
+        (default: one per CPU). Rows are not filtered further: a partition without a month key
+        contributes all its months.
+
+        Threads parse the files and the ledger rows are compacted once at the end, which beats
+        compacting many small partitions one by one; worker processes compact their partitions
+        so that less is pickled back.
+        """
+        positions = self.select(month, entity)
+        n = len(positions)
+        args = ([self.paths[i] for i in positions], [self.name] * n, [self.keys[i] for i in positions], [processes] * n)
+        workers = min(workers or os.cpu_count() or 1, max(n, 1))
+        if workers == 1:
+            parts = list(map(load_partition, *args))
+        else:
+            pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with pool(max_workers=workers) as executor:
+                parts = list(executor.map(load_partition, *args))
+
+        if self.name not in LEDGERS:
+            return (pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()), n
+        if processes:
+            return concat_ledgers(*parts), n
+        return (compact_ledger(pd.concat(parts, ignore_index=True)) if parts else empty_ledger()), n
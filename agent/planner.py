@@ -1,83 +1,191 @@
-import re
+import numpy as np
+import pandas as pd
+from agent.batch import BatchView
+from agent.cache import response_cache
+from agent.consolidation import CONSOLIDATED
+from agent.cube import period_mask
+from agent.instrument import instruments, stage
+from agent.intent import PERCENT_DRIVERS, IntentParser
+from agent.timeseries import LAGS
+
+# Metric -> (entity metrics column, display name) for per-entity drill-downs
+ENTITY_METRICS = {
+    'revenue': ('revenue', 'Revenue'),
+    'margin': ('gross_margin_pct', 'Gross Margin %'),
+    'opex': ('opex', 'Opex'),
+    'ebitda': ('ebitda', 'EBITDA'),
+}
+
+# Metric -> (account node, display name) for variance questions; None covers every top-level account
+VARIANCE_ACCOUNTS = {
+    'revenue': ('Revenue', 'Revenue'),
+    'opex': ('Opex:', 'Opex'),
+    'ebitda': (None, 'P&L'),
+    'margin': (None, 'P&L'),
+    'variance': (None, 'P&L'),
+}
+
+# What-if scenario parameter -> how the assumption reads in the answer
+ASSUMPTIONS = {
+    'revenue_growth': "revenue {:+g}% a year",
+    'opex_growth': "opex {:+g}% a year",
+    'fx_shock': "foreign currencies {:+g}% against USD",
+    'hires': "{:+g} net hires a month",
+}
 
 class CFOPlanner:
-    def __init__(self, tools):
+    def __init__(self, tools, cache=response_cache):
         self.tools = tools
+        self.cache = cache
+        self._parser = None
+        self._parser_version = None
+    
+    @property
+    def parser(self):
+        """Intent parser for the current data (entity names and latest month come from the tools)"""
+        version = getattr(self.tools, 'data_version', None)
+        if self._parser is None or self._parser_version != version:
+            dimensions = getattr(self.tools, 'dimensions', None)
+            entities, latest_month = dimensions() if dimensions is not None else ([], None)
+            self._parser = IntentParser(entities=entities, latest_month=latest_month)
+            self._parser_version = version
+        return self._parser
     
     def extract_month(self, question):
-        """Extract month from question like 'February 2024' -> '2024-02'"""
-        month_names = {
-            'january': '01', 'february': '02', 'march': '03', 'april': '04',
-            'may': '05', 'june': '06', 'july': '07', 'august': '08',
-            'september': '09', 'october': '10', 'november': '11', 'december': '12'
-        }
-        
-        # Pattern: "February 2024"
-        match = re.search(r'(\w+)\s+(\d{4})', question.lower())
-        if match:
-            month_name, year = match.groups()
-            if month_name in month_names:
-                return f"{year}-{month_names[month_name]}"
-        
-        return None
+        """Extract month from question like 'February 2024' or 'Feb 24' -> '2024-02'"""
+        return self.parser.parse(question).month
     
     def extract_months_count(self, question):
         """Extract number of months from question like 'last 3 months' -> 3"""
-        match = re.search(r'last\s+(\d+)\s+months?', question.lower())
-        if match:
-            return int(match.group(1))
-        return None
+        return self.parser.parse(question).last_n
+    
+    def parse_intent(self, question):
+        """Parse a question into a typed Intent (metric, period, entity, last-N, comparison)"""
+        return self.parser.parse(question)
     
     def answer_question(self, question):
-        """Answer financial questions"""
-        question_lower = question.lower()
+        """Answer financial questions, reusing cached answers for the same intent and data version"""
+        with instruments.trace('question', question) as trace:
+            with stage('parse'):
+                intent = self.parse_intent(question)
+            trace.fields['metric'] = intent.metric
+            source = self.pin(intent)
+            if self.cache is None:
+                return self.answer_intent(intent, source=source)
+            
+            version = source.data_version
+            response = self.cache.get(version, intent)
+            trace.fields['cache'] = 'miss' if response is None else 'hit'
+            if response is None:
+                response = self.answer_intent(intent, source=source)
+                self.cache.put(version, intent, response)
+            return dict(response)
+    
+    def pin(self, intent=None):
+        """The data snapshot to answer from: one per answer, so a data swap mid-answer cannot mix versions
+
+        Tools that read partitions lazily give a snapshot of just the partitions the intent needs.
+        """
+        snapshot_for = getattr(self.tools, 'snapshot_for', None)
+        if intent is not None and snapshot_for is not None:
+            return snapshot_for(intent)
+        return getattr(self.tools, 'snapshot', self.tools)
+    
+    def answer_questions(self, questions):
+        """Answer a batch of questions, computing each aggregate once for the whole batch
+
+        Intents are parsed up front and grouped by metric; each distinct intent is answered
+        once from a BatchView and shared by every question that asked for it. Charts are
+        LazyChart specs, built only when their figure() is requested.
+        """
+        with instruments.trace('batch', f"{len(questions)} questions") as trace:
+            with stage('parse'):
+                intents = [self.parse_intent(question) for question in questions]
+            by_metric = {}
+            for intent in dict.fromkeys(intents):
+                by_metric.setdefault(intent.metric, []).append(intent)
+            trace.fields['intents'] = sum(len(group) for group in by_metric.values())
+            
+            source = BatchView(self.pin())
+            answers = {}
+            for group in by_metric.values():
+                for intent in group:
+                    answers[intent] = self.answer_intent(intent, source=source)
+            return [dict(answers[intent]) for intent in intents]
+    
+    def answer_intent(self, intent, source=None):
+        """Answer a parsed Intent from the tools (or a BatchView over them); charts are LazyChart specs"""
+        source = source or self.tools
+        metric, month, months, entity = intent.metric, intent.period, intent.last_n, intent.entity
+        label = ' '.join(filter(None, [entity, intent.period_label])) or None
+        
+        # "last N months" on a summed metric is the trailing N-month period
+        if months and month is None and metric in ('revenue', 'opex', 'ebitda', 'variance', 'anomalies'):
+            month = source.timeseries(entity).trailing_period(months)
+            label = ' '.join(filter(None, [entity, f"last {months} months"]))
+        
+        # Unusual amounts against their own history and budget
+        if intent.anomaly:
+            return self.answer_anomalies(intent, source, month, label)
+        
+        # What-if questions are cash runway scenarios (Monte Carlo), whichever metric they name
+        if intent.scenario:
+            return self.answer_scenarios(intent, source)
+        
+        # Per-entity drill-down
+        if intent.by_entity and metric in ENTITY_METRICS:
+            return self.answer_by_entity(intent, source)
+        
+        # Variance to budget and what drove it
+        if intent.variance and metric in VARIANCE_ACCOUNTS:
+            return self.answer_variance(intent, source, month, label)
         
         # OpEx Breakdown
-        if 'opex' in question_lower or 'operating expense' in question_lower or 'breakdown' in question_lower:
-            month = self.extract_month(question)
-            data = self.tools.get_opex_breakdown(month)
+        if metric == 'opex':
+            data = source.get_opex_breakdown(month, entity)
             
             if data.empty:
                 return {"text": "No operating expense data found.", "chart": None}
             
-            chart = self.tools.create_opex_chart(data)
+            chart = source.chart('opex', data)
             
             total_opex = data['amount_usd'].sum()
-            text = f"**Operating Expenses Breakdown{' for ' + month if month else ''}:**\n\n"
+            text = f"**Operating Expenses Breakdown{' for ' + label if label else ''}:**\n\n"
             text += f"Total OpEx: ${total_opex:,.0f}\n\n"
             
             for _, row in data.iterrows():
                 pct = (row['amount_usd'] / total_opex) * 100
                 text += f"{row['category']}: ${row['amount_usd']:,.0f} ({pct:.1f}%)\n"
+            text += self.change_line(source, intent, 'opex', month)
             
             return {"text": text, "chart": chart}
         
         # EBITDA
-        elif 'ebitda' in question_lower:
-            month = self.extract_month(question)
-            ebitda_data = self.tools.get_ebitda(month)
+        elif metric == 'ebitda':
+            ebitda_data = source.get_ebitda(month, entity)
             
             if "error" in ebitda_data:
                 return {"text": ebitda_data["error"], "chart": None}
             
-            text = f"**EBITDA Analysis{' for ' + month if month else ''}:**\n\n"
+            text = f"**EBITDA Analysis{' for ' + label if label else ''}:**\n\n"
             text += f"Revenue: ${ebitda_data['revenue']:,.0f}\n"
             text += f"COGS: ${ebitda_data['cogs']:,.0f}\n"
             text += f"Opex: ${ebitda_data['opex']:,.0f}\n"
             text += f"EBITDA: ${ebitda_data['ebitda']:,.0f}"
+            text += self.change_line(source, intent, 'ebitda', month)
             
             return {"text": text, "chart": None}
 
         # Cash Runway
-        elif 'cash' in question_lower or 'runway' in question_lower or 'burn' in question_lower:
-            runway_data = self.tools.calculate_cash_runway()
+        elif metric == 'runway':
+            runway_data = source.calculate_cash_runway(months or 3)
             
             if "error" in runway_data:
                 return {"text": runway_data["error"], "chart": None}
             
             text = f"**Cash Runway Analysis:**\n\n"
             text += f"Current Cash: ${runway_data['current_cash']:,.0f}\n"
-            text += f"Avg Monthly Burn: ${runway_data['avg_monthly_burn']:,.0f}\n"
+            text += f"Avg Monthly Burn{f' (last {months} months)' if months else ''}: ${runway_data['avg_monthly_burn']:,.0f}\n"
             
             if runway_data['runway_months'] == float('inf'):
                 text += f"Runway: Cash positive (no burn)"
@@ -87,19 +195,21 @@ class CFOPlanner:
             return {"text": text, "chart": None}
 
         # Gross Margin
-        elif 'margin' in question_lower or 'gross' in question_lower:
-            months = self.extract_months_count(question)
-            data = self.tools.get_gross_margin_trend(months)
+        elif metric == 'margin':
+            data = source.get_gross_margin_trend(months, entity)
+            if isinstance(month, tuple) and not data.empty:
+                data = data[period_mask(data['month'], month)]
             
             if data.empty:
                 return {"text": "No margin data found.", "chart": None}
             
-            chart = self.tools.create_margin_chart(data)
+            chart = source.chart('margin', data)
             
             latest_margin = data['gross_margin_pct'].iloc[-1]
             avg_margin = data['gross_margin_pct'].mean()
             
-            text = f"**Gross Margin Analysis:**\n\n"
+            scope = ' '.join(filter(None, [entity, intent.label if isinstance(month, tuple) else None]))
+            text = f"**Gross Margin Analysis{' for ' + scope if scope else ''}:**\n\n"
             text += f"Latest Margin: {latest_margin:.1f}%\n"
             text += f"Average Margin: {avg_margin:.1f}%\n"
             
@@ -110,18 +220,17 @@ class CFOPlanner:
             return {"text": text, "chart": chart}
         
         # Revenue vs Budget
-        elif 'revenue' in question_lower or 'budget' in question_lower:
-            month = self.extract_month(question)
-            data = self.tools.get_revenue_vs_budget(month)
+        elif metric == 'revenue':
+            data = source.get_revenue_vs_budget(month, entity)
             
             if data.empty:
                 return {"text": "No revenue data found for the specified period.", "chart": None}
             
-            chart = self.tools.create_revenue_chart(data)
+            chart = source.chart('revenue', data)
             
-            if month:
+            if intent.month:
                 row = data.iloc[0]
-                text = f"**Revenue vs Budget for {month}:**\n\n"
+                text = f"**Revenue vs Budget for {label}:**\n\n"
                 text += f"Actual: ${row['amount_usd_actual']:,.0f}\n"
                 text += f"Budget: ${row['amount_usd_budget']:,.0f}\n"
                 text += f"Variance: ${row['variance']:,.0f} ({row['variance_pct']:.1f}%)"
@@ -131,10 +240,11 @@ class CFOPlanner:
                 total_variance = total_actual - total_budget
                 variance_pct = (total_variance / total_budget) * 100
                 
-                text = f"**Revenue vs Budget Summary:**\n\n"
+                text = f"**Revenue vs Budget Summary{' for ' + label if label else ''}:**\n\n"
                 text += f"Total Actual: ${total_actual:,.0f}\n"
                 text += f"Total Budget: ${total_budget:,.0f}\n"
                 text += f"Total Variance: ${total_variance:,.0f} ({variance_pct:.1f}%)"
+            text += self.change_line(source, intent, 'revenue', month)
             
             return {"text": text, "chart": chart}
         
@@ -142,4 +252,112 @@ class CFOPlanner:
             return {
                 "text": "I can help you with:\nRevenue vs budget analysis\nGross margin trends\nOperating expenses breakdown\nEBITDA calculation\nCash runway analysis\n\nTry asking:\n'What was February 2024 revenue vs budget?'\n'Show gross margin for last 3 months'\n'Break down Opex by category for February 2024'\n'What is our EBITDA?'\n'What is our cash runway?'",
                 "chart": None
-            }
\ No newline at end of file
+            }
+    
+    def answer_scenarios(self, intent, source):
+        """Runway percentiles over Monte Carlo paths around the trailing-window baseline, under the what-if assumption"""
+        if intent.what_if and not intent.assumption:
+            return {"text": "I couldn't tell which assumption to change in that what-if question. Name a driver, a direction and an amount, "
+                            "e.g. \"What if revenue drops 20%?\", \"What if opex grows 10%?\", \"What if the dollar strengthens 5%?\" "
+                            "or \"What if we hire 3 people a month?\"", "chart": None}
+        
+        params = dict(intent.assumption or ())
+        # Fixed seed, so the same question always gets the same (cacheable) answer
+        result = source.simulate_cash_runway(window=intent.last_n or 3, seed=0, **params)
+        if "error" in result:
+            return {"text": result["error"], "chart": None}
+        
+        horizon = result['months']
+        text = f"**Cash Runway Scenarios ({result['paths']:,} paths, {horizon} months):**\n\n"
+        if params:
+            text += "Assumption: " + ", ".join(ASSUMPTIONS[name].format(value * 100 if name in PERCENT_DRIVERS else value)
+                                               for name, value in params.items()) + "\n"
+        text += f"Current Cash: ${result['current_cash']:,.0f}\n"
+        text += f"Baseline Net Cash Flow: ${result['baseline_monthly_flow']:,.0f}/month\n"
+        for p in (10, 50, 90):
+            runway = result['percentiles'][p]
+            text += f"Runway P{p}: " + (f"beyond {horizon} months\n" if runway == float('inf') else f"{runway:.1f} months\n")
+        text += f"Chance of running out of cash within {horizon} months: {result['prob_out_of_cash'] * 100:.1f}%\n\n"
+        # The headline runway answer uses a simpler burn; say why the two differ
+        text += f"Simple runway (current cash / average monthly EBITDA of ${result['avg_monthly_burn']:,.0f}, counted as burn): {result['simple_runway']:.1f} months. "
+        text += f"The scenarios project net cash flow instead: EBITDA of ${result['baseline_ebitda']:,.0f}/month plus the other cash movements "
+        text += f"seen in the cash history (${result['baseline_monthly_flow'] - result['baseline_ebitda']:,.0f}/month)."
+        
+        return {"text": text, "chart": result['chart']}
+    
+    def answer_variance(self, intent, source, period, label=None, n=5):
+        """Actual vs budget for the metric's accounts, with the entity/account pairs that drove the variance"""
+        account, title = VARIANCE_ACCOUNTS[intent.metric]
+        if account is None:
+            data = source.get_variance(month=period, entity=intent.entity, level=1)
+            if data.empty:
+                return {"text": "No actuals and budget data found for the specified period.", "chart": None}
+            
+            text = f"**Variance to Budget{' for ' + label if label else ''}:**\n\n"
+            for _, row in data.iterrows():
+                text += f"{row['account']}: ${row['actual']:,.0f} vs ${row['budget']:,.0f} budget, variance ${row['variance']:,.0f} ({row['variance_pct']:.1f}%)\n"
+            return {"text": text, "chart": source.chart('variance', data)}
+        
+        data = source.get_variance(account, period, intent.entity, by='entity')
+        if data.empty:
+            return {"text": f"No {title.lower()} actuals and budget found for the specified period.", "chart": None}
+        
+        actual, budget = data['actual'].sum(), data['budget'].sum()
+        variance = actual - budget
+        direction = 'over' if variance > 0 else 'under'
+        text = f"**{title} Variance to Budget{' for ' + label if label else ''}:**\n\n"
+        text += f"Actual: ${actual:,.0f}\n"
+        text += f"Budget: ${budget:,.0f}\n"
+        text += f"Variance: ${variance:,.0f} ({variance / abs(budget) * 100 if budget else float('nan'):.1f}%, {direction} budget)\n"
+        
+        drivers = source.get_variance_drivers(account, period, intent.entity, n=n)
+        if not drivers.empty:
+            text += "\nTop drivers:\n"
+            for rank, row in enumerate(drivers.itertuples(), start=1):
+                text += f"{rank}. {row.entity} {row.account}: ${row.variance:,.0f} ({row.share_pct:.0f}% of the variance)\n"
+        return {"text": text, "chart": source.chart('variance', drivers)}
+    
+    def answer_anomalies(self, intent, source, period, label=None, n=5):
+        """The most unusual entity/account amounts of the period (latest month by default), ranked by robust z-score"""
+        account = VARIANCE_ACCOUNTS.get(intent.metric, (None, 'P&L'))[0]
+        data = source.get_anomalies(period, intent.entity, account, n=n)
+        label = label or (str(source.actuals_cube.months[-1]) if len(source.actuals_cube.months) else None)
+        if data.empty:
+            return {"text": f"No unusual amounts found{' for ' + label if label else ''}: every account is within its usual range of history and budget.", "chart": None}
+        
+        score = lambda z: 'n/a' if np.isnan(z) else f"{z:+.1f}"
+        text = f"**Unusual Amounts{' for ' + label if label else ''}:**\n\n"
+        for rank, row in enumerate(data.itertuples(), start=1):
+            text += f"{rank}. {row.entity} {row.account} ({row.month}): ${row.actual:,.0f} vs ${row.expected:,.0f} expected and ${row.budget:,.0f} budget "
+            text += f"(z {score(row.z_history)} vs history, {score(row.z_budget)} vs budget)\n"
+        return {"text": text, "chart": source.chart('anomalies', data)}
+    
+    def change_line(self, source, intent, metric, period):
+        """Month-over-month or year-over-year line for questions that ask for one"""
+        if intent.comparison not in LAGS:
+            return ""
+        end = period[1] if isinstance(period, tuple) else period
+        stats = source.get_metric_stats(metric, end, entity=intent.entity)
+        name = {'mom': 'MoM', 'yoy': 'YoY'}[intent.comparison]
+        if "error" in stats or np.isnan(stats[intent.comparison]):
+            return f"\n{name} Change: no prior period"
+        return f"\n{name} Change ({stats['month']}): ${stats[intent.comparison]:,.0f} ({stats[intent.comparison + '_pct']:.1f}%)"
+    
+    def answer_by_entity(self, intent, source=None):
+        """Per-entity drill-down of a metric, with the consolidated total"""
+        source = source or self.tools
+        column, title = ENTITY_METRICS[intent.metric]
+        data = source.get_entity_metrics(intent.period)
+        
+        if data.empty:
+            return {"text": "No entity data found.", "chart": None}
+        
+        label = intent.period_label
+        text = f"**{title} by Entity{' for ' + label if label else ''}:**\n\n"
+        for entity, value in data[column].items():
+            amount = f"{value:.1f}%" if column == 'gross_margin_pct' else f"${value:,.0f}"
+            text += f"{entity}: {amount}\n"
+        
+        entities = data.drop(index=CONSOLIDATED)
+        chart = source.chart('entity', pd.DataFrame({'entity': entities.index, 'value': entities[column].to_numpy(), 'metric': title}))
+        return {"text": text, "chart": chart}
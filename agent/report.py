@@ -0,0 +1,197 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from agent.cache import ResponseCache
+from agent.instrument import instruments, stage
+
+IMAGE_WIDTH, IMAGE_HEIGHT = 800, 400
+
+# Rendered chart images, keyed on (chart key, size) under the data version they were drawn from
+image_cache = ResponseCache(max_bytes=64 * 1024 * 1024, ttl=24 * 3600)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_image(spec, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    """Render a serialized Plotly figure to JPEG bytes with Kaleido (runs in a worker process)"""
+    import plotly.io as pio
+    return pio.from_json(spec).to_image(format='jpeg', width=width, height=height)
+
+
+def render_pool():
+    """Process pool shared by every export in this process, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers: forking a process that is running Streamlit's threads is not safe
+            _pool = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def revenue_section(tools):
+    data = tools.get_revenue_vs_budget()
+    if data.empty:
+        return {"title": "Revenue vs Budget", "lines": ["No revenue data available"], "chart": None}
+
+    total_actual = data['amount_usd_actual'].sum()
+    total_budget = data['amount_usd_budget'].sum()
+    variance = total_actual - total_budget
+    variance_pct = (variance / total_budget) * 100
+    lines = [
+        f"Total Actual: ${total_actual:,.0f}",
+        f"Total Budget: ${total_budget:,.0f}",
+        f"Variance: ${variance:,.0f} ({variance_pct:.1f}%)",
+        None,
+    ]
+    return {"title": "Revenue vs Budget", "lines": lines, "chart": tools.chart('revenue', data)}
+
+
+def opex_section(tools):
+    data = tools.get_opex_breakdown()
+    if data.empty:
+        return {"title": "Operating Expenses Breakdown", "lines": ["No OpEx data available"], "chart": None}
+
+    total_opex = data['amount_usd'].sum()
+    lines = [f"Total OpEx: ${total_opex:,.0f}", None]
+    for _, row in data.iterrows():
+        pct = (row['amount_usd'] / total_opex) * 100
+        lines.append(f"{row['category']}: ${row['amount_usd']:,.0f} ({pct:.1f}%)")
+    lines.append(None)
+    return {"title": "Operating Expenses Breakdown", "lines": lines, "chart": tools.chart('opex', data)}
+
+
+def runway_section(tools):
+    runway_data = tools.calculate_cash_runway()
+    if "error" in runway_data:
+        return {"title": "Cash Runway Analysis", "lines": [runway_data["error"]], "chart": None}
+
+    lines = [
+        f"Current Cash: ${runway_data['current_cash']:,.0f}",
+        f"Avg Monthly Burn: ${runway_data['avg_monthly_burn']:,.0f}",
+    ]
+    if runway_data['runway_months'] == float('inf'):
+        lines.append("Runway: Cash positive (no burn)")
+    else:
+        lines.append(f"Runway: {runway_data['runway_months']:.1f} months")
+    return {"title": "Cash Runway Analysis", "lines": lines, "chart": None}
+
+
+# Each section is a function of the tools returning {"title", "lines", "chart"}; a None line is a
+# spacer. Sections only compute numbers and chart specs, and every section's chart is rendered in
+# the same parallel pass, so adding a section does not add a serial Kaleido call.
+DEFAULT_SECTIONS = [revenue_section, opex_section, runway_section]
+
+
+class SummaryReport:
+    """CFO summary PDF built from pluggable sections, with chart images rendered in parallel"""
+
+    def __init__(self, tools, sections=None, executor=None, renderer=render_image, cache=image_cache):
+        self.tools = tools
+        self.sections = DEFAULT_SECTIONS if sections is None else sections
+        self.executor = executor
+        self.renderer = renderer
+        self.cache = cache
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def render_images(self, charts, version):
+        """JPEG bytes for each chart: cached images first, the rest rendered concurrently"""
+        images, futures = {}, {}
+        for chart in charts:
+            key = (chart.key, IMAGE_WIDTH, IMAGE_HEIGHT)
+            cached = self.cache.get(version, key) if self.cache is not None else None
+            if cached is not None:
+                images[chart.key] = cached
+            elif chart.key not in futures:
+                futures[chart.key] = self.submit(version, key, chart)
+
+        for chart_key, future in futures.items():
+            images[chart_key] = future.result()
+        return images
+
+    def submit(self, version, key, chart):
+        """Start rendering one chart, joining a render of the same image that is already running"""
+        with self._lock:
+            future = self._pending.get((version, key))
+            if future is not None:
+                return future
+            executor = self.executor or render_pool()
+            future = executor.submit(self.renderer, chart.to_json(), IMAGE_WIDTH, IMAGE_HEIGHT)
+            self._pending[(version, key)] = future
+        # Outside the lock: the callback runs at once if the render has already finished
+        future.add_done_callback(lambda f: self._finish(version, key, f))
+        return future
+
+    def _finish(self, version, key, future):
+        # Cache first, so a request arriving in between finds the image in one place or the other
+        if self.cache is not None and future.exception() is None:
+            self.cache.put(version, key, future.result())
+        with self._lock:
+            self._pending.pop((version, key), None)
+
+    def build(self):
+        """PDF bytes for the report"""
+        with instruments.trace('export', 'summary_pdf'):
+            # Every section reads the same snapshot, even if the data is swapped during the export
+            snapshot = getattr(self.tools, 'snapshot', self.tools)
+            with stage('sections'):
+                sections = [section(snapshot) for section in self.sections]
+            charts = [s["chart"] for s in sections if s["chart"] is not None]
+            for chart in charts:
+                # Serialize the figures up front, so chart build and PDF render are timed apart
+                chart.to_json()
+            with stage('pdf_render'):
+                images = self.render_images(charts, snapshot.data_version)
+                return self.write_pdf(sections, images)
+
+    def write_pdf(self, sections, images):
+        """Lay out the sections and their chart images as a PDF; the JPEG bytes are embedded straight from memory"""
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", 'B', 20)
+        pdf.cell(0, 15, "CFO Financial Summary Report", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+        pdf.set_font("Helvetica", '', 10)
+        pdf.cell(0, 10, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+        pdf.ln(10)
+
+        for i, section in enumerate(sections):
+            if i:
+                pdf.add_page()
+            pdf.set_font("Helvetica", 'B', 14)
+            pdf.cell(0, 10, section["title"], new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.set_font("Helvetica", '', 11)
+            for line in section["lines"]:
+                if line is None:
+                    pdf.ln(5)
+                else:
+                    pdf.cell(0, 8, line, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            chart = section["chart"]
+            if chart is not None and images.get(chart.key):
+                pdf.image(io.BytesIO(images[chart.key]), x=10, w=190)
+            pdf.ln(10)
+
+        return bytes(pdf.output())
+
+
+# One report per process, so concurrent exports share in-flight renders
+_report = None
+_report_lock = threading.Lock()
+
+
+def export_summary_pdf(tools):
+    """Export key financial metrics: Revenue vs Budget, Opex Breakdown, Cash Runway"""
+    global _report
+    with _report_lock:
+        if _report is None or _report.tools is not tools:
+            _report = SummaryReport(tools)
+        report = _report
+    return report.build()
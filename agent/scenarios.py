@@ -0,0 +1,235 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from agent.ledger import encode_months
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Scenario parameters and their baseline values; any of them can be a grid axis or a distribution
+PARAMETERS = {
+    'revenue_growth': 0.0,   # annual revenue growth (0.1 = +10% a year)
+    'opex_growth': 0.0,      # annual opex growth
+    'hires': 0.0,            # net hires per month
+    'cost_per_hire': 10000.0,  # monthly cost of one hire (USD)
+    'fx_shock': 0.0,         # change in foreign currencies against USD (-0.1 = foreign currencies 10% weaker)
+}
+
+
+@dataclass(frozen=True)
+class Normal:
+    """Normally distributed scenario parameter, drawn once per path"""
+    mean: float
+    sd: float
+
+    def sample(self, rng, size):
+        return rng.normal(self.mean, self.sd, size)
+
+
+@dataclass(frozen=True)
+class Uniform:
+    """Uniformly distributed scenario parameter, drawn once per path"""
+    low: float
+    high: float
+
+    def sample(self, rng, size):
+        return rng.uniform(self.low, self.high, size)
+
+
+def runway(cash, opening):
+    """Months until cash first goes negative on each row of a (scenarios x months) matrix; inf if it never does
+
+    The crossing is interpolated linearly within the month, from the previous month-end balance
+    (`opening` for the first month).
+    """
+    negative = cash < 0
+    first = negative.argmax(axis=1)
+    rows = np.arange(len(cash))
+    previous = np.where(first > 0, cash[rows, np.maximum(first - 1, 0)], opening)
+    current = cash[rows, first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.clip(np.where(previous > current, previous / (previous - current), 0.0), 0, 1)
+    months = np.where(negative.any(axis=1), first + fraction, np.inf)
+    return np.where(opening < 0, 0.0, months)
+
+
+class ScenarioResult:
+    """Projected month-end cash for every scenario, with the parameters that produced each row"""
+
+    def __init__(self, cash, months, params, opening):
+        self.cash = cash
+        self.opening = opening
+        self.months = months
+        self.params = params
+        self._runway = None
+
+    def __len__(self):
+        return len(self.cash)
+
+    @property
+    def runway(self):
+        if self._runway is None:
+            self._runway = runway(self.cash, self.opening)
+        return self._runway
+
+    def percentiles(self, q=PERCENTILES):
+        """Runway percentiles in months (inf: cash lasts beyond the projection)"""
+        # Nearest-sample percentiles, so paths that never run out stay inf instead of interpolating into nan
+        values = np.percentile(self.runway, q, method='inverted_cdf')
+        return {p: float(v) for p, v in zip(q, values)}
+
+    def probability_out_of_cash(self, month=None):
+        """Share of scenarios that run out of cash within `month` months (the whole projection when None)"""
+        horizon = len(self.months) if month is None else month
+        return float((self.runway <= horizon).mean())
+
+    def fan(self, q=(10, 50, 90)):
+        """Month-end cash percentiles by month, one column per percentile"""
+        bands = np.percentile(self.cash, q, axis=0)
+        return pd.DataFrame({f"p{p}": band for p, band in zip(q, bands)}, index=pd.Index(self.months, name='month'))
+
+    def table(self):
+        """Scenario parameters with the resulting runway, one row per scenario"""
+        return self.params.assign(runway_months=self.runway)
+
+
+class ScenarioEngine:
+    """Month-by-month cash projections for many scenarios at once
+
+    Each scenario is a row of a (scenarios x months) matrix. Revenue, COGS, opex and cash flow
+    are projected with broadcasting and one cumulative sum along the month axis, so 10,000
+    paths cost the same handful of array operations as one.
+    """
+
+    def __init__(self, cash, revenue, cogs, opex, other=0.0, foreign_revenue=0.0, foreign_opex=0.0,
+                 revenue_vol=0.0, opex_vol=0.0, start=None):
+        self.cash = float(cash)
+        self.revenue = float(revenue)
+        self.cogs_ratio = float(cogs / revenue) if revenue else 0.0
+        self.opex = float(opex)
+        self.other = float(other)
+        self.foreign_revenue = float(foreign_revenue)
+        self.foreign_opex = float(foreign_opex)
+        self.revenue_vol = float(revenue_vol)
+        self.opex_vol = float(opex_vol)
+        self.start = start
+
+    @classmethod
+    def from_tools(cls, tools, window=3):
+        """Baseline from the latest cash balance and the trailing `window` months of the consolidated ledger
+
+        Cash flow not explained by EBITDA (capex, working capital, financing) is taken from the
+        cash history as the average of (change in cash - EBITDA), so the baseline path continues
+        the observed cash trend.
+        """
+        kernel = tools.timeseries()
+        cash = tools.cash.groupby('month', observed=True)['cash_usd'].sum().sort_index()
+        ebitda = pd.Series(kernel['ebitda'].values, index=kernel.months)
+        unexplained = (cash.diff() - ebitda).dropna().tail(window)
+
+        revenue, opex = kernel['revenue'], kernel['opex']
+        return cls(
+            cash=cash.iloc[-1],
+            revenue=revenue.trailing_mean(window),
+            cogs=kernel['cogs'].trailing_mean(window),
+            opex=opex.trailing_mean(window),
+            other=unexplained.mean() if len(unexplained) else 0.0,
+            revenue_vol=monthly_volatility(revenue.values),
+            opex_vol=monthly_volatility(opex.values),
+            start=cash.index[-1],
+            **tools.foreign_shares(kernel.months[-window:]),
+        )
+
+    @property
+    def monthly_flow(self):
+        """Baseline net cash flow per month (negative: burn)"""
+        return self.revenue * (1 - self.cogs_ratio) - self.opex + self.other
+
+    def month_labels(self, months):
+        if self.start is None:
+            return np.arange(1, months + 1)
+        return pd.period_range(pd.Period(self.start, 'M') + 1, periods=months, freq='M').strftime('%Y-%m').to_numpy()
+
+    def project(self, months=36, revenue_shocks=None, opex_shocks=None, **params):
+        """(scenarios x months) month-end cash; parameters are scalars or one value per scenario
+
+        revenue_shocks and opex_shocks are optional (scenarios x months) multiplicative noise.
+        """
+        unknown = set(params) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown scenario parameters: {', '.join(sorted(unknown))}")
+        p = {name: np.asarray(params.get(name, default), dtype=np.float64).reshape(-1, 1)
+             for name, default in PARAMETERS.items()}
+        t = np.arange(1, months + 1, dtype=np.float64)
+
+        # Annual growth compounded monthly; an FX move scales the foreign-currency share of each line
+        revenue = self.revenue * (1 + p['revenue_growth']) ** (t / 12) * (1 + self.foreign_revenue * p['fx_shock'])
+        opex = self.opex * (1 + p['opex_growth']) ** (t / 12) * (1 + self.foreign_opex * p['fx_shock'])
+        if revenue_shocks is not None:
+            revenue = revenue * revenue_shocks
+        if opex_shocks is not None:
+            opex = opex * opex_shocks
+        opex = opex + p['hires'] * p['cost_per_hire'] * t
+
+        flow = revenue * (1 - self.cogs_ratio) - opex + self.other
+        return self.cash + np.cumsum(flow, axis=1)
+
+    def grid(self, months=36, **axes):
+        """Every combination of the parameter values given as lists, e.g. revenue_growth=[-0.1, 0, 0.1]"""
+        names = list(axes)
+        mesh = np.meshgrid(*[np.asarray(axes[name], dtype=np.float64) for name in names], indexing='ij')
+        params = pd.DataFrame({name: values.ravel() for name, values in zip(names, mesh)}, index=pd.RangeIndex(mesh[0].size if mesh else 1, name='scenario'))
+        cash = self.project(months, **params.to_dict('series'))
+        return ScenarioResult(cash, self.month_labels(months), params, self.cash)
+
+    def simulate(self, paths=10000, months=36, seed=None, volatility=1.0, **params):
+        """Monte Carlo paths: parameters are fixed values or distributions (Normal, Uniform) drawn per path
+
+        On top of the drawn parameters, monthly revenue and opex get independent multiplicative
+        noise with the volatility observed in their history, scaled by `volatility` (0 turns it off).
+        """
+        rng = np.random.default_rng(seed)
+        drawn = pd.DataFrame({name: value.sample(rng, paths) if hasattr(value, 'sample') else np.full(paths, value, dtype=np.float64)
+                              for name, value in params.items()}, index=pd.RangeIndex(paths, name='path'))
+
+        revenue_shocks = opex_shocks = None
+        if volatility and self.revenue_vol:
+            revenue_shocks = 1 + rng.standard_normal((paths, months)) * (self.revenue_vol * volatility)
+        if volatility and self.opex_vol:
+            opex_shocks = 1 + rng.standard_normal((paths, months)) * (self.opex_vol * volatility)
+
+        cash = self.project(months, revenue_shocks, opex_shocks, **drawn.to_dict('series'))
+        if not len(drawn.columns):
+            cash = np.broadcast_to(cash, (paths, months))
+        return ScenarioResult(cash, self.month_labels(months), drawn, self.cash)
+
+
+def monthly_volatility(values):
+    """Standard deviation of month-over-month relative changes around their mean (0 with too little history)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = np.diff(values) / np.abs(values[:-1])
+    changes = changes[np.isfinite(changes)]
+    return float(changes.std(ddof=1)) if len(changes) > 1 else 0.0
+
+
+def foreign_shares(tools, months):
+    """Share of revenue and of opex booked in a currency other than USD over the given months"""
+    actuals = tools.actuals
+    actuals = actuals[np.isin(actuals['month'], encode_months(list(months)))]
+    if actuals.empty:
+        return {"foreign_revenue": 0.0, "foreign_opex": 0.0}
+
+    cube = tools.actuals_cube
+    amounts, _ = tools.fx_engine.convert(actuals['amount_cents'], actuals['month'], actuals['currency'])
+    foreign = (actuals['currency'] != 'USD').to_numpy()
+    categories = actuals['account_category']
+    shares = {}
+    for name, node in (('foreign_revenue', 'Revenue'), ('foreign_opex', 'Opex')):
+        rows = categories.isin(list(cube.categories[cube.accounts.mask(node)])).to_numpy()
+        total = amounts[rows].sum()
+        shares[name] = float(amounts[rows & foreign].sum() / total) if total else 0.0
+    return shares
@@ -0,0 +1,363 @@
+"""Asyncio HTTP/JSON query service in front of CFOPlanner
+
+Usage: python -m agent.service [--host 127.0.0.1] [--port 8080] [--workers 4] [--max-pending 256]
+       python -m agent.service --backend sqlite [--database ledger.sqlite]
+       python -m agent.service --store results.sqlite    (answers shared by every worker, kept across restarts)
+
+Routes:
+    GET  /health                      service and data status
+    GET  /metrics                     Prometheus metrics (text format)
+    POST /answer   {"question": ...}  one planner answer ("include_chart": true adds the Plotly figure)
+    POST /batch    {"questions": [...]}
+    GET  /metrics/<tool method>?month=2024-03&entity=EMEA
+"""
+import argparse
+import asyncio
+import contextlib
+import inspect
+import io
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from agent.cache import aggregate_cache
+from agent.instrument import instruments
+from agent.planner import CFOPlanner
+from agent.store import open_store
+from agent.tools import FinanceTools
+
+# Tool methods served under /metrics/<name>; every other attribute of FinanceTools stays private
+METRIC_METHODS = {
+    'get_revenue_vs_budget', 'get_gross_margin_trend', 'get_opex_breakdown', 'get_ebitda',
+    'calculate_cash_runway', 'get_entity_metrics', 'get_metric_stats', 'get_account_rollup',
+    'get_data_summary', 'get_variance', 'get_variance_drivers', 'get_anomalies',
+}
+INT_PARAMS = {'months', 'window', 'level', 'n'}
+FLOAT_PARAMS = {'threshold'}
+LIST_PARAMS = {'entities'}
+
+MAX_BODY = 1024 * 1024
+# Longest request or header line, and most header lines, accepted before the request is refused
+MAX_LINE = 8 * 1024
+MAX_HEADERS = 100
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(value):
+    """JSON-ready value: frames become records, numpy scalars plain numbers, non-finite floats null"""
+    if isinstance(value, pd.DataFrame):
+        return to_json(value.reset_index().to_dict('records') if value.index.name else value.to_dict('records'))
+    if isinstance(value, pd.Series):
+        return to_json(value.to_dict())
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, 'to_json') and hasattr(value, 'key'):
+        # A LazyChart: its chart type only; the figure is sent when asked for
+        return value.kind
+    return value
+
+
+def metric_kwargs(query):
+    """Tool keyword arguments from a query string (?month=2024-03&start=...&end=... for a range)"""
+    kwargs = {}
+    for name, value in query.items():
+        if name in INT_PARAMS:
+            try:
+                kwargs[name] = int(value)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+        elif name in FLOAT_PARAMS:
+            try:
+                kwargs[name] = float(value)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a number")
+        elif name in LIST_PARAMS:
+            kwargs[name] = [v for v in value.split(',') if v]
+        elif name not in ('start', 'end'):
+            kwargs[name] = value
+    if 'start' in query or 'end' in query:
+        kwargs['month'] = (query.get('start'), query.get('end'))
+    return kwargs
+
+
+class QueryService:
+    """One shared FinanceTools behind an asyncio HTTP server
+
+    The event loop only parses requests and writes responses; pandas work runs in a bounded
+    thread pool. Identical requests that arrive while one is being computed share its result,
+    and once `max_pending` distinct computations are queued new ones are refused with 503
+    (Retry-After) instead of queueing without bound. Tool method results are cached per data
+    version in `cache` (the process-wide aggregate cache by default).
+    """
+
+    def __init__(self, tools, planner=None, workers=4, max_pending=256, executor=None, cache=aggregate_cache):
+        self.tools = tools
+        self.planner = planner or CFOPlanner(tools)
+        self.cache = cache
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cfo-query')
+        self.max_pending = max_pending
+        self.stats = {'requests': 0, 'coalesced': 0, 'rejected': 0, 'errors': 0}
+        self._inflight = {}
+
+    async def run(self, key, fn, *args):
+        """Result of fn(*args) in the pool, shared with any identical request already in flight"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        if len(self._inflight) >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many requests in flight")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, fn, *args)
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    # ------------------------------------------------------------------ routes
+
+    async def route(self, method, path, query, body):
+        if path == '/health':
+            return {"status": "ok", "data_version": self.tools.data_version, "inflight": len(self._inflight), **self.stats}
+
+        if path == '/metrics':
+            return instruments.prometheus() + self.prometheus()
+
+        if path == '/answer':
+            payload = self.expect_post(method, body)
+            question = payload.get('question')
+            if not isinstance(question, str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must have a 'question' string")
+            include_chart = bool(payload.get('include_chart'))
+            intent = self.planner.parse_intent(question)
+            key = ('answer', self.tools.data_version, intent, include_chart)
+            return await self.run(key, self.answer, question, include_chart)
+
+        if path == '/batch':
+            payload = self.expect_post(method, body)
+            questions = payload.get('questions')
+            if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must have a 'questions' list of strings")
+            key = ('batch', self.tools.data_version, tuple(questions))
+            return await self.run(key, self.answer_batch, questions)
+
+        if path.startswith('/metrics/'):
+            name = path[len('/metrics/'):]
+            if name not in METRIC_METHODS:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown metric '{name}'")
+            kwargs = metric_kwargs(query)
+            snapshot = self.tools.snapshot
+            try:
+                inspect.signature(getattr(snapshot, name)).bind(**kwargs)
+            except TypeError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+            key = (name, tuple(sorted(query.items())))
+            return await self.run(('metric', snapshot.data_version, *key), self.metric, snapshot, name, kwargs, key)
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+    @staticmethod
+    def expect_post(method, body):
+        if method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return payload
+
+    def answer(self, question, include_chart=False):
+        return self.serialize_answer(self.planner.answer_question(question), include_chart)
+
+    def answer_batch(self, questions):
+        return {"answers": [self.serialize_answer(a) for a in self.planner.answer_questions(questions)]}
+
+    @staticmethod
+    def serialize_answer(response, include_chart=False):
+        chart = response.get('chart')
+        answer = {"text": response['text'], "chart": chart.kind if chart is not None else None}
+        if include_chart and chart is not None:
+            answer["figure"] = json.loads(chart.to_json())
+        return answer
+
+    def metric(self, snapshot, name, kwargs, key):
+        if self.cache is not None:
+            result = self.cache.get(snapshot.data_version, key)
+            if result is not None:
+                return result
+        with instruments.trace('metric', name):
+            result = to_json(getattr(snapshot, name)(**kwargs))
+        if self.cache is not None:
+            self.cache.put(snapshot.data_version, key, result)
+        return result
+
+    def prometheus(self):
+        """Service counters in the Prometheus text format"""
+        lines = []
+        for name, value in self.stats.items():
+            lines += [f"# TYPE cfo_service_{name}_total counter", f"cfo_service_{name}_total {value}"]
+        lines += ["# TYPE cfo_service_inflight gauge", f"cfo_service_inflight {len(self._inflight)}"]
+        return '\n'.join(lines) + '\n'
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def handle(self, reader, writer):
+        """One client connection: HTTP/1.1 requests, kept alive until the client closes"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload = await self.dispatch(method, target, body)
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def dispatch(self, method, target, body):
+        self.stats['requests'] += 1
+        url = urlsplit(target)
+        try:
+            return HTTPStatus.OK, await self.route(method, url.path, dict(parse_qsl(url.query)), body)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening; returns the asyncio Server (port 0 picks a free port)"""
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def read_line(reader, status):
+    """One request or header line; a line longer than the stream limit (MAX_LINE) is refused with status"""
+    try:
+        return await reader.readline()
+    except ValueError:
+        # asyncio.LimitOverrunError, re-raised by readline as ValueError
+        raise HTTPError(status, "Request line or header too long")
+
+
+async def read_request(reader):
+    """(method, target, headers, body) of the next request, or None when the client has closed"""
+    line = await read_line(reader, HTTPStatus.REQUEST_URI_TOO_LONG)
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    for count in range(MAX_HEADERS + 1):
+        line = await read_line(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if count == MAX_HEADERS:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+        name, _, value = line.decode('latin1').partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name == 'content-length' and headers.get(name, value) != value:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Conflicting Content-Length headers")
+        headers[name] = value
+
+    # Chunked bodies are not read; ignoring the header would parse the chunks as the next request
+    if 'transfer-encoding' in headers:
+        if 'content-length' not in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Transfer-Encoding is not supported; send Content-Length")
+        raise HTTPError(HTTPStatus.NOT_IMPLEMENTED, "Transfer-Encoding is not supported")
+    length = headers.get('content-length') or '0'
+    if not (length.isascii() and length.isdigit()):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer")
+    length = int(length)
+    if length > MAX_BODY:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    # Text payloads (the Prometheus exposition) go out as-is, everything else as JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        head.append("Retry-After: 1")
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin1') + body)
+    await writer.drain()
+
+
+async def serve(host, port, workers, max_pending, fixtures_dir, backend='pandas', database=None, store=None):
+    if store:
+        open_store(store)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tools = FinanceTools(fixtures_dir=fixtures_dir, backend=backend, database=database)
+    service = QueryService(tools, workers=workers, max_pending=max_pending)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-pending', type=int, default=256)
+    parser.add_argument('--fixtures-dir', default='fixtures')
+    parser.add_argument('--backend', default='pandas', choices=['pandas', 'sqlite'])
+    parser.add_argument('--database', help="SQLite ledger database for --backend sqlite")
+    parser.add_argument('--store', help="on-disk result store shared by the workers on this host (see agent.store)")
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending, args.fixtures_dir, args.backend, args.database,
+                          args.store))
+
+
+if __name__ == '__main__':
+    main()
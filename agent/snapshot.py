@@ -0,0 +1,30 @@
+import threading
+import weakref
+
+
+class SnapshotStore:
+    """The current data snapshot, swapped atomically, plus the older ones readers still hold
+
+    Publishing replaces a single reference, so readers never lock: a reader that picked up
+    `current` before a swap finishes on the old snapshot, later readers get the new one. A
+    replaced snapshot is freed as soon as the last reader drops it; until then it is listed by
+    live(), which is how leaks (e.g. a session holding on to old data) show up.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.published = 0
+        self._live = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot):
+        with self._lock:
+            self.published += 1
+            self._live[self.published] = snapshot
+            self.current = snapshot
+        return snapshot
+
+    def live(self):
+        """Data versions of every published snapshot still referenced somewhere, oldest first"""
+        with self._lock:
+            return [snapshot.data_version for _, snapshot in sorted(self._live.items())]
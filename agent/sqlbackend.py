@@ -0,0 +1,397 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agent.accounts import AccountIndex
+from agent.consolidation import apply_eliminations
+from agent.cube import build_cubes
+from agent.fx import FXEngine
+from agent.instrument import count, stage
+from agent.ledger import COLUMNS, compact_ledger, decode_months, encode_months
+from agent.loader import DTYPES, has_dataset, iter_dataset, source_version
+from agent.tools import Snapshot
+
+LEDGERS = ('actuals', 'budget')
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE {staging}actuals (month INTEGER NOT NULL, entity TEXT NOT NULL, account_category TEXT NOT NULL COLLATE NOCASE,
+                               currency TEXT NOT NULL, amount_cents INTEGER NOT NULL, rows INTEGER NOT NULL);
+CREATE TABLE {staging}budget (month INTEGER NOT NULL, entity TEXT NOT NULL, account_category TEXT NOT NULL COLLATE NOCASE,
+                              currency TEXT NOT NULL, amount_cents INTEGER NOT NULL, rows INTEGER NOT NULL);
+CREATE TABLE fx_rates (month INTEGER NOT NULL, currency TEXT NOT NULL, rate REAL NOT NULL, fallback INTEGER NOT NULL,
+                       PRIMARY KEY (month, currency)) WITHOUT ROWID;
+"""
+
+
+def import_fixtures(fixtures_dir, path, chunksize=1000000):
+    """Build a SQLite ledger database from the fixture CSVs
+
+    Ledgers are read in chunks and stored at (month, entity, account_category, currency) grain
+    with integer cents and month codes, like the compact ledgers. The as-of FX rate of every
+    (month, currency) pair they use is resolved once into `fx_rates`, so queries convert to USD
+    with a plain equality join inside the engine. The database is written to a temporary file
+    and moved into place, so readers never see a half-built one.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(partial):
+        os.remove(partial)
+    con = sqlite3.connect(partial)
+    try:
+        con.executescript(SCHEMA.format(staging='staging_'))
+        for name in LEDGERS:
+            if not has_dataset(fixtures_dir, name):
+                print(f"No {name} data to import")
+                continue
+            rows = 0
+            for chunk in iter_dataset(fixtures_dir, name, chunksize):
+                ledger = compact_ledger(chunk)
+                con.executemany(f"INSERT INTO staging_{name} VALUES (?, ?, ?, ?, ?, ?)", zip(
+                    ledger['month'].to_numpy(dtype=np.int64).tolist(),
+                    *(ledger[col].astype(str).tolist() for col in ('entity', 'account_category', 'currency')),
+                    ledger['amount_cents'].tolist(), ledger['rows'].to_numpy(dtype=np.int64).tolist()))
+                rows += len(chunk)
+            print(f"Imported {name}: {rows} rows")
+
+        # Sum keys repeated across chunks, so every key is one row (and rounded to USD cents once)
+        for name in LEDGERS:
+            con.execute(f"CREATE TABLE {name} AS SELECT * FROM staging_{name} WHERE 0")
+            con.execute(f"INSERT INTO {name} SELECT month, entity, account_category, currency, SUM(amount_cents), SUM(rows) "
+                        f"FROM staging_{name} GROUP BY month, entity, account_category, currency")
+            con.execute(f"DROP TABLE staging_{name}")
+            con.execute(f"CREATE INDEX {name}_month ON {name} (month, account_category, entity)")
+            con.execute(f"CREATE INDEX {name}_account ON {name} (account_category, month)")
+
+        for name in ('cash', 'fx'):
+            if not has_dataset(fixtures_dir, name):
+                print(f"No {name} data to import")
+                continue
+            df = pd.concat(iter_dataset(fixtures_dir, name, chunksize), ignore_index=True)
+            df.astype({col: str for col in df.columns if df[col].dtype == 'category'}).to_sql(name, con, index=False)
+
+        fx = pd.read_sql_query("SELECT * FROM fx", con) if 'fx' in tables(con) else pd.DataFrame()
+        pairs = pd.read_sql_query("SELECT month, currency FROM actuals UNION SELECT month, currency FROM budget", con)
+        engine = FXEngine(fx)
+        if engine.empty:
+            rates, fallback = np.ones(len(pairs)), np.zeros(len(pairs), dtype=bool)
+        else:
+            rates, fallback = engine.lookup(pairs['month'].to_numpy(dtype=np.int64), pairs['currency'])
+        con.executemany("INSERT INTO fx_rates VALUES (?, ?, ?, ?)", zip(
+            pairs['month'].tolist(), pairs['currency'].tolist(), rates.tolist(), fallback.astype(int).tolist()))
+
+        con.execute("INSERT INTO meta VALUES ('source_version', ?)", (source_version(fixtures_dir),))
+        con.commit()
+        con.execute("ANALYZE")
+        con.close()
+        os.replace(partial, path)
+    except BaseException:
+        con.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return path
+
+
+def tables(con):
+    return {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def account_filter(node, column='l.account_category'):
+    """SQL predicate for the categories at or below an account node ('Opex', 'Opex:', 'Opex:Sales')
+
+    The column collates case-insensitively, like AccountIndex, and the children of a node are a
+    key range ('Opex:' <= category < 'Opex;'), so the filter can use the account index.
+    """
+    node = str(node).rstrip(':')
+    return f"({column} = ? OR ({column} >= ? AND {column} < ?))", [node, f"{node}:", f"{node};"]
+
+
+def period_filter(month, column='l.month'):
+    """SQL predicate for a single month, a (start, end) range, or None (all months)"""
+    if isinstance(month, tuple):
+        start, end = month
+        clauses, params = [], []
+        if start:
+            clauses.append(f"{column} >= ?")
+            params.append(int(encode_months([start])[0]))
+        if end:
+            clauses.append(f"{column} <= ?")
+            params.append(int(encode_months([end])[0]))
+        return ' AND '.join(clauses) or '1', params
+    if month:
+        return f"{column} = ?", [int(encode_months([month])[0])]
+    return '1', []
+
+
+def entity_filter(entity, column='l.entity'):
+    """SQL predicate for one entity, a list of entities, or None (all, i.e. consolidated)"""
+    if entity is None:
+        return '1', []
+    if isinstance(entity, str):
+        return f"{column} = ?", [entity]
+    entity = list(entity)
+    return f"{column} IN ({', '.join('?' * len(entity))})", entity
+
+
+class LedgerDatabase:
+    """Read-only connections to a SQLite ledger database, one per thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @classmethod
+    def open(cls, path, fixtures_dir=None, chunksize=1000000):
+        """The database at path, (re)imported from fixtures_dir first when the CSVs changed since its import"""
+        if fixtures_dir and has_dataset(fixtures_dir, 'actuals'):
+            imported = None
+            if os.path.exists(path):
+                existing = cls(path)
+                imported = existing.meta('source_version')
+                existing.close()
+            if imported != source_version(fixtures_dir):
+                with stage('load'):
+                    import_fixtures(fixtures_dir, path, chunksize)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No ledger database at {path}")
+        return cls(path)
+
+    @property
+    def connection(self):
+        con = getattr(self._local, 'connection', None)
+        if con is None:
+            con = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            self._local.connection = con
+        return con
+
+    def close(self):
+        con = getattr(self._local, 'connection', None)
+        if con is not None:
+            con.close()
+            self._local.connection = None
+
+    def query(self, sql, params=()):
+        """Result rows of one statement as a DataFrame"""
+        with stage('aggregate'):
+            cursor = self.connection.execute(sql, list(params))
+            return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+    def meta(self, key):
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def has_table(self, name):
+        return name in tables(self.connection)
+
+    def read(self, name):
+        """A small table (cash, fx) as a typed frame, empty when it was not imported"""
+        if not self.has_table(name):
+            return pd.DataFrame()
+        df = self.query(f"SELECT * FROM {name}")
+        return df.astype({col: dtype for col, dtype in DTYPES[name].items() if col in df})
+
+
+class SQLSnapshot(Snapshot):
+    """Snapshot whose ledgers stay in a SQLite database
+
+    Metric queries (EBITDA, opex breakdown, revenue vs budget, account roll-ups) compile to one
+    aggregate statement each, with the month, entity and account filters and the FX join pushed
+    into the engine; only the aggregated rows come back to Python. Analyses over whole monthly
+    series (time series, scenarios, entity metrics, variance) use month x entity x category cubes
+    that are themselves one GROUP BY in the engine, built the first time they are needed.
+
+    The database is read-only: FinanceTools refuses append/refresh/watch on this backend with a
+    ValueError; re-import the fixtures (or the warehouse export) and restart instead.
+    """
+
+    def __init__(self, data_version, database):
+        self.data_version = data_version
+        self.database = database
+        self.cash = database.read('cash')
+        self.fx = database.read('fx')
+        self.fx_engine = FXEngine(self.fx)
+        self.streaming = False
+        self.eliminations = []
+        self.frozen = False
+        self._memo = {}
+
+    def copy(self, data_version):
+        # Not reached through FinanceTools, which refuses updates on this backend up front
+        raise ValueError("The SQLite backend is read-only; re-import the ledger database to change its data")
+
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    def apply_eliminations(self, rules):
+        self.eliminations = list(rules)
+
+    # Data
+
+    @property
+    def actuals(self):
+        return pd.DataFrame(columns=COLUMNS)
+
+    @property
+    def budget(self):
+        return pd.DataFrame(columns=COLUMNS)
+
+    @property
+    def actuals_cube(self):
+        return self.cubes()[0]
+
+    @property
+    def budget_cube(self):
+        return self.cubes()[1]
+
+    def cubes(self):
+        """Actuals and budget cubes, aggregated to month x entity x category in the engine"""
+        def build():
+            frames = [self.aggregate(dataset, ('month', 'entity', 'account_category')) for dataset in LEDGERS]
+            cubes = build_cubes(*frames, amount_col='amount_usd_cents')
+            for cube in cubes:
+                apply_eliminations(cube, self.eliminations)
+                cube.values.flags.writeable = False
+                cube.counts.flags.writeable = False
+            return cubes
+        return self.memo('cubes', build)
+
+    @property
+    def fx_fallbacks(self):
+        def used():
+            frames = []
+            for dataset in LEDGERS:
+                df = self.database.query(
+                    f"SELECT l.month, l.currency, SUM(l.rows) AS rows FROM {dataset} l "
+                    f"JOIN fx_rates r ON r.month = l.month AND r.currency = l.currency "
+                    f"WHERE r.fallback GROUP BY l.month, l.currency ORDER BY l.month, l.currency")
+                df['month'] = decode_months(df['month'])
+                df.insert(0, 'dataset', dataset)
+                frames.append(df)
+            return pd.concat(frames, ignore_index=True)
+        return self.memo('fx_fallbacks', used)
+
+    def aggregate(self, dataset, keys=(), month=None, entity=None, account=None):
+        """USD cents and row counts of a ledger grouped by keys, for an account node, period and entity"""
+        with stage('filter'):
+            clauses, params = [], []
+            for clause, values in (period_filter(month), entity_filter(entity),
+                                   account_filter(account) if account else ('1', [])):
+                clauses.append(clause)
+                params += values
+        select = ', '.join([f"l.{key} AS {key}" for key in keys] + ['SUM(ROUND(l.amount_cents * r.rate)) AS amount_usd_cents',
+                                                                    'SUM(l.rows) AS rows'])
+        sql = (f"SELECT {select} FROM {dataset} l JOIN fx_rates r ON r.month = l.month AND r.currency = l.currency "
+               f"WHERE {' AND '.join(clauses)}")
+        if keys:
+            group = ', '.join(f"l.{key}" for key in keys)
+            sql += f" GROUP BY {group} ORDER BY {group}"
+        result = self.database.query(sql, params)
+        result['amount_usd_cents'] = result['amount_usd_cents'].fillna(0).astype(np.int64)
+        result['rows'] = result['rows'].fillna(0).astype(np.int64)
+        count('rows_scanned', result['rows'].sum())
+        return result
+
+    def dimensions(self):
+        """Entity names and the latest month, for the question parser"""
+        def read():
+            entities = self.database.query("SELECT entity FROM actuals UNION SELECT entity FROM budget")['entity']
+            latest = self.database.query("SELECT MAX(month) AS month FROM actuals")['month'].iloc[0]
+            return sorted(entities), (decode_months([latest])[0] if latest is not None else None)
+        return self.memo('dimensions', read)
+
+    # Pushed-down queries (consolidation rules only exist on the cubes, so they fall back to them)
+
+    def get_revenue_vs_budget(self, month=None, entity=None):
+        if self.eliminations:
+            return super().get_revenue_vs_budget(month, entity)
+
+        actuals, budget = (self.aggregate(dataset, ('month',), month, entity, 'Revenue') for dataset in LEDGERS)
+        if actuals.empty or budget.empty:
+            return pd.DataFrame()
+
+        comparison = actuals.merge(budget, on='month', suffixes=('_actual', '_budget'))
+        comparison = pd.DataFrame({
+            'month': decode_months(comparison['month']),
+            'amount_usd_actual': comparison['amount_usd_cents_actual'] / 100,
+            'amount_usd_budget': comparison['amount_usd_cents_budget'] / 100,
+        })
+        comparison['variance'] = comparison['amount_usd_actual'] - comparison['amount_usd_budget']
+        comparison['variance_pct'] = (comparison['variance'] / comparison['amount_usd_budget']) * 100
+
+        return comparison
+
+    def get_opex_breakdown(self, month=None, entity=None):
+        if self.eliminations:
+            return super().get_opex_breakdown(month, entity)
+
+        data = self.aggregate('actuals', ('account_category',), month, entity, 'Opex')
+        breakdown = pd.DataFrame({'category': data['account_category'], 'amount_usd': data['amount_usd_cents'] / 100})
+        return breakdown[data['rows'] > 0].sort_values('amount_usd', ascending=False)
+
+    def get_account_rollup(self, level=1, month=None, dataset='actuals'):
+        if self.eliminations:
+            return super().get_account_rollup(level, month, dataset)
+
+        data = self.aggregate(dataset, ('account_category',), month)
+        data = data[data['rows'] > 0]
+        if data.empty:
+            return pd.DataFrame()
+
+        accounts = AccountIndex(data['account_category'])
+        nodes, values = accounts.rollup(data['amount_usd_cents'].to_numpy() / 100, level)
+        return pd.DataFrame({'account': nodes, 'amount_usd': values})
+
+    def get_ebitda(self, month=None, entity=None):
+        if self.eliminations:
+            return super().get_ebitda(month, entity)
+
+        # One statement: each metric is a conditional sum over the rows of its account node
+        totals, params = [], []
+        for node in ('Revenue', 'COGS', 'Opex'):
+            clause, values = account_filter(node)
+            totals.append(f"COALESCE(SUM(CASE WHEN {clause} THEN ROUND(l.amount_cents * r.rate) END), 0) / 100.0")
+            params += values
+        where, where_params = [], []
+        for clause, values in (period_filter(month), entity_filter(entity)):
+            where.append(clause)
+            where_params += values
+        row = self.database.connection.execute(
+            f"SELECT {', '.join(totals)} FROM actuals l JOIN fx_rates r ON r.month = l.month AND r.currency = l.currency "
+            f"WHERE {' AND '.join(where)}", params + where_params).fetchone()
+
+        total_revenue, total_cogs, total_opex = (float(value) for value in row)
+        return {
+            "revenue": total_revenue,
+            "cogs": total_cogs,
+            "opex": total_opex,
+            "ebitda": total_revenue - total_cogs - total_opex
+        }
+
+    def foreign_shares(self, months):
+        shares = {}
+        clause, params = period_filter((min(months), max(months))) if len(months) else ('0', [])
+        for name, node in (('foreign_revenue', 'Revenue'), ('foreign_opex', 'Opex')):
+            account, values = account_filter(node)
+            total, foreign = self.database.connection.execute(
+                f"SELECT SUM(ROUND(l.amount_cents * r.rate)), SUM(CASE WHEN l.currency != 'USD' THEN ROUND(l.amount_cents * r.rate) END) "
+                f"FROM actuals l JOIN fx_rates r ON r.month = l.month AND r.currency = l.currency WHERE {clause} AND {account}",
+                params + values).fetchone()
+            shares[name] = float((foreign or 0) / total) if total else 0.0
+        return shares
+
+    def get_data_summary(self):
+        rows = {dataset: int(self.aggregate(dataset)['rows'].sum()) for dataset in LEDGERS}
+        return {
+            "actuals": {"rows": rows['actuals'], "columns": list(COLUMNS)},
+            "budget": {"rows": rows['budget'], "columns": list(COLUMNS)},
+            "cash": {"rows": len(self.cash), "columns": self.cash.columns.tolist() if not self.cash.empty else []},
+            "fx": {"rows": len(self.fx), "columns": self.fx.columns.tolist() if not self.fx.empty else []},
+        }
@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from agent.cache import aggregate_cache, response_cache
+from agent.charts import LazyChart, chart_cache
+from agent.tools import CHART_BUILDERS, Snapshot
+
+# Bumped when the tables change; files written with an older layout are rebuilt (they only hold cached results)
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key, version)
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS versions (namespace TEXT NOT NULL, version TEXT NOT NULL, PRIMARY KEY (namespace, version));
+"""
+
+
+def persistent(version):
+    """Whether results under a data version can be shared with other processes
+
+    Fixture fingerprints identify the same data everywhere; versions of rows appended in memory
+    ('<fingerprint>+N') exist in one process only.
+    """
+    return version is None or '+' not in str(version)
+
+
+def encode(value):
+    """JSON-ready form of a cached result; containers, arrays, frames and chart specs are tagged
+
+    Anything else raises TypeError, and is then not stored.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, list):
+        return [encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {'__type__': 'tuple', 'items': [encode(v) for v in value]}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) and k != '__type__' for k in value):
+            return {k: encode(v) for k, v in value.items()}
+        return {'__type__': 'dict', 'items': [[encode(k), encode(v)] for k, v in value.items()]}
+    if isinstance(value, np.ndarray):
+        return {'__type__': 'ndarray', 'dtype': str(value.dtype), 'data': encode(value.tolist())}
+    if isinstance(value, pd.Series):
+        return {'__type__': 'series', 'name': encode(value.name), 'dtype': str(value.dtype),
+                'index': encode_index(value.index), 'data': encode(value.tolist())}
+    if isinstance(value, pd.DataFrame):
+        if isinstance(value.columns, pd.MultiIndex):
+            raise TypeError("Frames with MultiIndex columns are not stored")
+        return {'__type__': 'frame', 'columns': encode(list(value.columns)), 'index': encode_index(value.index),
+                'dtypes': [str(dtype) for dtype in value.dtypes],
+                'data': [encode(value.iloc[:, i].tolist()) for i in range(value.shape[1])]}
+    if isinstance(value, LazyChart):
+        # Only the data and chart type are stored; the builder is looked up again on load
+        if value.cache is not chart_cache or value.builder is not getattr(Snapshot, CHART_BUILDERS.get(value.kind, ''), None):
+            raise TypeError(f"Chart '{value.kind}' has no registered builder")
+        return {'__type__': 'chart', 'kind': value.kind, 'key': encode(value.key), 'data': encode(value.data)}
+    raise TypeError(f"{type(value).__name__} results are not stored")
+
+
+def encode_index(index):
+    """None for a default RangeIndex, else its name and values"""
+    if isinstance(index, pd.MultiIndex):
+        raise TypeError("MultiIndex results are not stored")
+    if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1 and index.name is None:
+        return None
+    return {'name': encode(index.name), 'dtype': str(index.dtype), 'data': encode(index.tolist())}
+
+
+def decode(value):
+    """Inverse of encode; only the tagged types it writes are recognized (ValueError otherwise)"""
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get('__type__')
+    if kind is None:
+        return {k: decode(v) for k, v in value.items()}
+    if kind == 'tuple':
+        return tuple(decode(v) for v in value['items'])
+    if kind == 'dict':
+        return {decode(k): decode(v) for k, v in value['items']}
+    if kind == 'ndarray':
+        return np.array(decode(value['data']), dtype=value['dtype'])
+    if kind == 'series':
+        return pd.Series(decode(value['data']), index=decode_index(value['index'], len(value['data'])),
+                         name=decode(value['name'])).astype(value['dtype'])
+    if kind == 'frame':
+        columns = decode(value['columns'])
+        rows = len(value['data'][0]) if value['data'] else 0
+        df = pd.DataFrame({i: pd.Series(decode(data), dtype=object).astype(dtype)
+                           for i, (data, dtype) in enumerate(zip(value['data'], value['dtypes']))},
+                          index=pd.RangeIndex(rows), columns=range(len(columns)))
+        df.columns = columns
+        df.index = decode_index(value['index'], rows)
+        return df
+    if kind == 'chart':
+        chart = LazyChart(value['kind'], getattr(Snapshot, CHART_BUILDERS[value['kind']]), decode(value['data']))
+        chart._key = decode(value['key'])
+        return chart
+    raise ValueError(f"Unknown stored type {kind!r}")
+
+
+def decode_index(index, length):
+    if index is None:
+        return pd.RangeIndex(length)
+    return pd.Index(decode(index['data']), dtype=index['dtype'], name=decode(index['name']))
+
+
+def dumps(value):
+    return json.dumps(encode(value), separators=(',', ':')).encode()
+
+
+def loads(blob):
+    return decode(json.loads(blob))
+
+
+class ResultStore:
+    """Computed results shared by every process on the host, in one SQLite file that survives restarts
+
+    Entries are values under (namespace, key, data version); a read under another version misses.
+    Workers on different versions (during a refresh or a rolling deploy) keep their entries side
+    by side. Older versions go when a version is recorded for the first time (the fixtures
+    changed): that namespace's entries for every version recorded before it are dropped, once,
+    and later writes from workers still on an older version are kept until evicted. Keys are
+    intents and tuples of plain values, whose repr
+    is the same in every process. The file is bounded by `max_bytes` of values, evicting the
+    least recently read entries first. Connections are per thread, in WAL mode, so readers in
+    other processes never wait on a writer.
+
+    Values are stored as tagged JSON (see encode), never pickled, so reading the file cannot run
+    code; an entry that does not decode is dropped and recomputed. The file still holds the
+    answers users are shown: keep it where only the service's own user can write.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        con = self.connection
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                con.execute("DROP TABLE IF EXISTS results")
+                con.execute("DROP TABLE IF EXISTS versions")
+                con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    con.execute(statement)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    @property
+    def connection(self):
+        con = getattr(self._local, 'connection', None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = con
+        return con
+
+    def close(self):
+        con = getattr(self._local, 'connection', None)
+        if con is not None:
+            con.close()
+            self._local.connection = None
+
+    def get(self, namespace, version, key):
+        """Stored value for key under a data version, or None"""
+        if not persistent(version):
+            return None
+        con = self.connection
+        row = con.execute("SELECT rowid, value FROM results WHERE namespace = ? AND key = ? AND version = ?",
+                          (namespace, repr(key), str(version))).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        try:
+            value = loads(row[1])
+        except Exception:
+            # Corrupted, or written by an incompatible version of the code: drop it and recompute
+            con.execute("DELETE FROM results WHERE rowid = ?", (row[0],))
+            self.misses += 1
+            return None
+        con.execute("UPDATE results SET accessed = ? WHERE rowid = ?", (self.clock(), row[0]))
+        self.hits += 1
+        return value
+
+    def put(self, namespace, version, key, value):
+        """Store value for key under a data version; False if not stored
+
+        The first write under a version no worker has recorded drops the namespace's entries for
+        the versions recorded before it. Writes under a version already recorded delete nothing.
+        """
+        if not persistent(version):
+            return False
+        try:
+            blob = dumps(value)
+        except (TypeError, ValueError):
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+
+        con = self.connection
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            known = con.execute("SELECT 1 FROM versions WHERE namespace = ? AND version = ?",
+                                (namespace, str(version))).fetchone()
+            if known is None:
+                # Newer than every version recorded so far
+                con.execute("DELETE FROM results WHERE namespace = ? AND version != ?", (namespace, str(version)))
+                con.execute("INSERT INTO versions VALUES (?, ?)", (namespace, str(version)))
+            con.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                        (namespace, repr(key), str(version), blob, len(blob), self.clock()))
+            self._evict(con)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        return True
+
+    def _evict(self, con):
+        """Drop least recently read entries until the values fit in max_bytes"""
+        excess = con.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for rowid, size in con.execute("SELECT rowid, size FROM results ORDER BY accessed"):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        con.executemany("DELETE FROM results WHERE rowid = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self, namespace=None):
+        con = self.connection
+        if namespace is None:
+            con.execute("DELETE FROM results")
+            con.execute("DELETE FROM versions")
+        else:
+            con.execute("DELETE FROM results WHERE namespace = ?", (namespace,))
+            con.execute("DELETE FROM versions WHERE namespace = ?", (namespace,))
+
+    def stats(self):
+        """Hit/miss counters of this process, and the entries and bytes stored by all of them"""
+        entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def open_store(path, max_bytes=256 * 1024 * 1024):
+    """Back this process's answer, chart and aggregate caches with the result store at path"""
+    store = ResultStore(path, max_bytes)
+    for cache, namespace in ((response_cache, 'answers'), (chart_cache, 'charts'), (aggregate_cache, 'aggregates')):
+        cache.attach(store, namespace)
+    return store
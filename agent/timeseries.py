@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+LAGS = {'mom': 1, 'yoy': 12}
+
+
+def shift_month(month, months):
+    """'YYYY-MM' moved by a number of months"""
+    year, number = int(month[:4]), int(month[5:7]) - 1 + months
+    return f"{year + number // 12}-{number % 12 + 1:02d}"
+
+
+class MetricSeries:
+    """One metric by month, with prefix sums so every window query is O(1)"""
+
+    def __init__(self, months, values):
+        self.months = pd.Index(months, dtype=object, name='month')
+        self.values = np.asarray(values, dtype=np.float64)
+        self.prefix = np.concatenate([[0.0], np.cumsum(self.values)])
+        self.positions = {month: i for i, month in enumerate(self.months)}
+
+        # Position where each month's year and quarter start (months are sorted)
+        labels = np.asarray(self.months, dtype=str)
+        years = np.array([m[:4] for m in labels])
+        quarters = np.array([f"{m[:4]}Q{(int(m[5:7]) - 1) // 3}" for m in labels])
+        self.year_start = self._group_start(years)
+        self.quarter_start = self._group_start(quarters)
+
+    @staticmethod
+    def _group_start(keys):
+        starts = np.zeros(len(keys), dtype=np.int64)
+        if len(keys):
+            boundary = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            starts = boundary[np.searchsorted(boundary, np.arange(len(keys)), side='right') - 1]
+        return starts
+
+    def __len__(self):
+        return len(self.values)
+
+    def position(self, month=None):
+        """Position of month (the latest month when None), or None if the series has no such month"""
+        if month is None:
+            return len(self.values) - 1 if len(self.values) else None
+        return self.positions.get(month)
+
+    def sum_between(self, start, end):
+        """Sum of positions start..end inclusive"""
+        return float(self.prefix[end + 1] - self.prefix[start])
+
+    def trailing_sum(self, n, month=None):
+        """Sum of the n months ending at month (fewer if the history is shorter)"""
+        end = self.position(month)
+        if end is None:
+            return np.nan
+        return self.sum_between(max(0, end + 1 - n), end)
+
+    def trailing_mean(self, n, month=None):
+        end = self.position(month)
+        if end is None:
+            return np.nan
+        start = max(0, end + 1 - n)
+        return self.sum_between(start, end) / (end + 1 - start)
+
+    def rolling_mean(self, n):
+        """n-month rolling mean at every month"""
+        ends = np.arange(1, len(self.values) + 1)
+        starts = np.maximum(ends - n, 0)
+        return pd.Series((self.prefix[ends] - self.prefix[starts]) / (ends - starts), index=self.months, name='rolling_mean')
+
+    def ytd(self, month=None):
+        end = self.position(month)
+        return np.nan if end is None else self.sum_between(self.year_start[end], end)
+
+    def qtd(self, month=None):
+        end = self.position(month)
+        return np.nan if end is None else self.sum_between(self.quarter_start[end], end)
+
+    def change(self, month=None, lag='mom'):
+        """(delta, % delta) against the same metric one month (mom) or twelve months (yoy) earlier"""
+        end = self.position(month)
+        if end is None:
+            return np.nan, np.nan
+        prior = self.positions.get(shift_month(self.months[end], -LAGS[lag]))
+        if prior is None:
+            return np.nan, np.nan
+        delta = self.values[end] - self.values[prior]
+        base = self.values[prior]
+        return float(delta), float(delta / abs(base) * 100) if base else np.nan
+
+    def tail(self, n=None):
+        """Positions of the last n months (all when n is None)"""
+        return slice(-n, None) if n else slice(None)
+
+
+class TimeSeriesKernel:
+    """Month-indexed revenue, COGS, opex, gross margin and EBITDA series for one ledger scope
+
+    Months are those with revenue rows, as in the margin trend and runway; COGS and opex
+    are aligned to them with missing months as zero.
+    """
+
+    METRICS = ('revenue', 'cogs', 'opex', 'gross_margin', 'ebitda')
+
+    def __init__(self, cube, entity=None):
+        revenue = cube.monthly('Revenue', entity)
+        cogs = cube.monthly('COGS', entity).reindex(revenue.index, fill_value=0)
+        opex = cube.monthly('Opex:', entity).reindex(revenue.index, fill_value=0)
+
+        self.months = revenue.index
+        self.series = {
+            'revenue': MetricSeries(self.months, revenue.to_numpy()),
+            'cogs': MetricSeries(self.months, cogs.to_numpy()),
+            'opex': MetricSeries(self.months, opex.to_numpy()),
+            'gross_margin': MetricSeries(self.months, (revenue - cogs).to_numpy()),
+            'ebitda': MetricSeries(self.months, (revenue - cogs - opex).to_numpy()),
+        }
+
+    def __getitem__(self, metric):
+        return self.series[metric]
+
+    @property
+    def empty(self):
+        return len(self.months) == 0
+
+    def trailing_period(self, n, month=None):
+        """(start, end) month range covering the n months ending at month (the latest when None)"""
+        series = self.series['revenue']
+        end = series.position(month)
+        if end is None:
+            return None
+        return (self.months[max(0, end + 1 - n)], self.months[end])
+
+    def stats(self, metric, month=None, window=3):
+        """Every window variant of one metric at one month, each from the prefix sums"""
+        series = self.series[metric]
+        mom, mom_pct = series.change(month, 'mom')
+        yoy, yoy_pct = series.change(month, 'yoy')
+        end = series.position(month)
+        return {
+            "month": self.months[end] if end is not None else month,
+            "value": float(series.values[end]) if end is not None else np.nan,
+            "window": window,
+            "trailing_sum": series.trailing_sum(window, month),
+            "rolling_mean": series.trailing_mean(window, month),
+            "ytd": series.ytd(month),
+            "qtd": series.qtd(month),
+            "mom": mom,
+            "mom_pct": mom_pct,
+            "yoy": yoy,
+            "yoy_pct": yoy_pct,
+        }
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from agent.instrument import count, stage
+
+# Dimensions a variance can be broken down by, in cube axis order
+DIMENSIONS = ('month', 'entity', 'account')
+COLUMNS = ['actual', 'budget', 'variance', 'variance_pct']
+
+
+def variance_pct(variance, budget):
+    """Variance as a percentage of the budget magnitude (nan where nothing was budgeted)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(budget != 0, variance / np.abs(budget) * 100, np.nan)
+
+
+class VarianceEngine:
+    """Actual vs budget over the aligned actuals and budget cubes
+
+    Both cubes share their month x entity x category axes, so every (month, entity, account)
+    key sits at the same position in each: a variance for any account node, hierarchy level,
+    entity set and period is one subtraction of two equally shaped slices, with no merges.
+    """
+
+    def __init__(self, actuals, budget):
+        if actuals.shape != budget.shape or not (actuals.months.equals(budget.months)
+                                                 and actuals.entities.equals(budget.entities)
+                                                 and actuals.categories.equals(budget.categories)):
+            raise ValueError("Actuals and budget cubes must share their axes (see align_cubes)")
+        self.actuals = actuals
+        self.budget = budget
+
+    def select(self, account=None, month=None, entity=None):
+        """Actual and budget values, row counts and axis labels of the selected block"""
+        cube = self.actuals
+        with stage('filter'):
+            rows, entities = cube.month_rows(month), cube.entity_cols(entity)
+            accounts = slice(None) if not account else cube.accounts.select(account)
+
+        def block(array):
+            return array[rows][:, entities][:, :, accounts]
+
+        with stage('aggregate'):
+            actual, budget = block(self.actuals.values), block(self.budget.values)
+            counts = block(self.actuals.counts) + block(self.budget.counts)
+        count('rows_scanned', counts.sum())
+        labels = {'month': cube.months[rows], 'entity': cube.entities[entities], 'account': cube.categories[accounts]}
+        return actual, budget, counts, labels
+
+    def table(self, account=None, month=None, entity=None, by='account', level=None):
+        """Actual, budget, variance and variance % per `by` key ('month', 'entity' or 'account')
+
+        With by='account', `level` rolls the accounts up to that depth of the hierarchy
+        (1 = Revenue/COGS/Opex, 2 = Opex:Sales, ...).
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        # Reduced arrays keep the cube's axis order, so the account axis stays last for the rollup
+        by = tuple(dim for dim in DIMENSIONS if dim in by)
+        actual, budget, counts, labels = self.select(account, month, entity)
+        with stage('aggregate'):
+            keep = tuple(DIMENSIONS.index(dim) for dim in by)
+            axes = tuple(axis for axis in range(3) if axis not in keep)
+            actual, budget, counts = (a.sum(axis=axes) for a in (actual, budget, counts))
+            if level and 'account' in by:
+                actual, budget, counts, labels['account'] = self.rollup(actual, budget, counts, labels['account'], level)
+        return self.frame(actual, budget, counts, [labels[dim] for dim in by], by)
+
+    def total(self, account=None, month=None, entity=None):
+        """Overall actual, budget, variance and variance % of the selected block"""
+        actual, budget, _, _ = self.select(account, month, entity)
+        actual, budget = float(actual.sum()), float(budget.sum())
+        return {"actual": actual, "budget": budget, "variance": actual - budget,
+                "variance_pct": float(variance_pct(actual - budget, budget))}
+
+    def drivers(self, account=None, month=None, entity=None, n=5, by=('entity', 'account'), level=None):
+        """The n keys that contributed most to the total variance, largest first
+
+        Keys are combinations of the `by` dimensions. Only keys moving in the direction of the
+        total variance are drivers; `share_pct` is each one's part of that total (offsets elsewhere
+        can make the shares add up to more than 100).
+        """
+        table = self.table(account, month, entity, by=by, level=level)
+        total = table['variance'].sum()
+        contribution = table['variance'].to_numpy() * np.sign(total)
+        candidates = np.flatnonzero(contribution > 0)
+        n = min(n, len(candidates))
+        if n == 0:
+            return table.iloc[:0].assign(share_pct=np.array([], dtype=np.float64))
+        # Top n without sorting every key
+        top = candidates[np.argpartition(-contribution[candidates], n - 1)[:n]]
+        top = top[np.argsort(-contribution[top], kind='stable')]
+        drivers = table.iloc[top].reset_index(drop=True)
+        drivers['share_pct'] = drivers['variance'].to_numpy() / total * 100
+        return drivers
+
+    def rollup(self, actual, budget, counts, categories, level):
+        """Roll the account axis (last) of already reduced arrays up to a hierarchy depth"""
+        index = self.actuals.accounts
+        if len(categories) != len(self.actuals.categories):
+            # Expand a selected subset back onto the full category axis before rolling up
+            positions = self.actuals.categories.get_indexer(categories)
+            full = [np.zeros(a.shape[:-1] + (len(self.actuals.categories),), dtype=a.dtype) for a in (actual, budget, counts)]
+            for target, source in zip(full, (actual, budget, counts)):
+                target[..., positions] = source
+            actual, budget, counts = full
+        nodes, actual = index.rollup(actual, level)
+        _, budget = index.rollup(budget, level)
+        _, counts = index.rollup(counts, level)
+        return actual, budget, counts, pd.Index(nodes, dtype=object, name='account')
+
+    @staticmethod
+    def frame(actual, budget, counts, labels, by):
+        """Long frame of the reduced arrays, keeping keys with rows or a non-zero amount"""
+        present = (counts > 0) | (actual != 0) | (budget != 0)
+        positions = np.nonzero(present)
+        data = {dim: np.asarray(axis_labels, dtype=object)[pos] for dim, axis_labels, pos in zip(by, labels, positions)}
+        actual, budget = actual[positions], budget[positions]
+        variance = actual - budget
+        data.update(actual=actual, budget=budget, variance=variance, variance_pct=variance_pct(variance, budget))
+        return pd.DataFrame(data, columns=list(by) + COLUMNS)
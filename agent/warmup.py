@@ -0,0 +1,75 @@
+import threading
+
+from agent.instrument import instruments
+
+# Sidebar questions of the app; their answers and charts are computed before anyone asks
+SAMPLE_QUESTIONS = [
+    "What was February 2024 revenue vs budget in USD?",
+    "Show gross margin % trend for last 3 months",
+    "Break down Opex by category for February 2024",
+    "What is our EBITDA for February 2024?",
+    "What is our cash runway right now?",
+]
+
+
+class Warmup:
+    """Loads the data and answers the common questions on a background thread
+
+    `factory` builds (tools, planner); it runs on the warm-up thread, so pandas, the ledgers and
+    the cubes load while the UI is already painted. Each of `questions` is then answered into the
+    planner's answer cache and its chart serialized into the shared chart cache, which also pays
+    for the first Plotly figure. Start-up milestones are recorded on `instruments`: data_loaded,
+    first_answer and warm (every question answered).
+    """
+
+    def __init__(self, factory, questions=SAMPLE_QUESTIONS):
+        self.factory = factory
+        self.questions = list(questions)
+        self.tools = None
+        self.planner = None
+        self.error = None
+        self.loaded = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start warming up in a daemon thread; returns self"""
+        self.thread = threading.Thread(target=self.run, name='cfo-warmup', daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.tools, self.planner = self.factory()
+        except Exception as e:
+            self.error = e
+            self.loaded.set()
+            self.done.set()
+            return
+        instruments.milestone('data_loaded')
+        self.loaded.set()
+
+        try:
+            for question in self.questions:
+                answer = self.planner.answer_question(question)
+                if answer.get("chart") is not None:
+                    answer["chart"].to_json()
+                instruments.milestone('first_answer')
+        except Exception as e:
+            # The app works without a warm cache; the questions are answered when asked
+            print(f"Warm-up stopped: {e}")
+        finally:
+            instruments.milestone('warm')
+            self.done.set()
+
+    def wait(self, timeout=None):
+        """(tools, planner) once the data is loaded, re-raising a load error; (None, None) on timeout"""
+        if not self.loaded.wait(timeout):
+            return None, None
+        if self.error is not None:
+            raise self.error
+        return self.tools, self.planner
+
+    def timings(self):
+        """Start-up milestones reached so far, in seconds"""
+        return dict(instruments.milestones)
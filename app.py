@@ -1,9 +1,7 @@
-import streamlit as st
-from agent.tools import FinanceTools
-from agent.planner import CFOPlanner
-from datetime import datetime
 import os
-import tempfile
+import streamlit as st
+from agent.instrument import instruments
+from agent.warmup import SAMPLE_QUESTIONS, Warmup
 
 # ----------------------
 # Page config
@@ -23,124 +21,72 @@ if "messages" not in st.session_state:
 # ----------------------
 # Initialize tools and planner
 # ----------------------
-@st.cache_resource
 def init_agent():
-    tools = FinanceTools()
+    # Imported here, on the warm-up thread: pandas and the data load stay off the first paint
+    from agent.planner import CFOPlanner
+    from agent.store import open_store
+    from agent.tools import FinanceTools
+
+    # CFO_RESULT_STORE=path keeps answers and chart specs on disk, shared by the workers on this host
+    # and kept across restarts, so after a deploy the warm-up finds its answers already computed
+    if os.environ.get('CFO_RESULT_STORE'):
+        open_store(os.environ['CFO_RESULT_STORE'])
+    # CFO_BACKEND=sqlite queries the ledgers in a SQLite database (CFO_DATABASE) instead of loading them
+    tools = FinanceTools(backend=os.environ.get('CFO_BACKEND', 'pandas'), database=os.environ.get('CFO_DATABASE'))
+    if tools.backend == 'pandas':
+        # Rows appended to the fixture CSVs are folded in without a restart
+        tools.watch(interval=10.0)
     planner = CFOPlanner(tools)
     return tools, planner
 
-try:
-    tools, planner = init_agent()
-    data_loaded = True
-except Exception as e:
-    st.error(f"Error loading data: {e}")
-    data_loaded = False
-    tools = None
-    planner = None
+@st.cache_resource
+def start_agent():
+    # One warm-up per process: the data loads and the sample questions are answered in the
+    # background while the page renders (CFO_WARMUP=0 loads the data only)
+    questions = SAMPLE_QUESTIONS if os.environ.get('CFO_WARMUP', '1') != '0' else ()
+    return Warmup(init_agent, questions).start()
+
+warmup = start_agent()
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def runway_scenarios(_tools, data_version, growth, growth_sd, hires, fx_shock):
+    # Simulated and drawn once per data version and slider setting, not on every rerun (each chat
+    # message reruns the script); the figure is shared by every session asking for the same setting
+    from agent.scenarios import Normal  # already imported with the tools, off the first paint
+    simulation = _tools.simulate_cash_runway(
+        seed=0,
+        revenue_growth=Normal(growth / 100, growth_sd / 100),
+        hires=hires,
+        fx_shock=fx_shock / 100,
+    )
+    figure = simulation['chart'].figure() if "error" not in simulation else None
+    return simulation, figure
 
 # ----------------------
 # Export Summary PDF Function
 # ----------------------
 def export_summary_pdf():
     """Export key financial metrics: Revenue vs Budget, Opex Breakdown, Cash Runway"""
-    from fpdf import FPDF
-    
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 20)
-    pdf.cell(0, 15, "CFO Financial Summary Report", ln=True, align='C')
-    pdf.set_font("Arial", '', 10)
-    pdf.cell(0, 10, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", ln=True, align='C')
-    pdf.ln(10)
-    
-    # 1. Revenue vs Budget
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Revenue vs Budget", ln=True)
-    pdf.set_font("Arial", '', 11)
-    
-    rev_data = tools.get_revenue_vs_budget()
-    if not rev_data.empty:
-        total_actual = rev_data['amount_usd_actual'].sum()
-        total_budget = rev_data['amount_usd_budget'].sum()
-        variance = total_actual - total_budget
-        variance_pct = (variance / total_budget) * 100
-        
-        pdf.cell(0, 8, f"Total Actual: ${total_actual:,.0f}", ln=True)
-        pdf.cell(0, 8, f"Total Budget: ${total_budget:,.0f}", ln=True)
-        pdf.cell(0, 8, f"Variance: ${variance:,.0f} ({variance_pct:.1f}%)", ln=True)
-        pdf.ln(5)
-        
-        # Add chart
-        chart = tools.create_revenue_chart(rev_data)
-        if chart:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-                img_bytes = chart.to_image(format="png", width=800, height=400)
-                tmpfile.write(img_bytes)
-                tmpfile_path = tmpfile.name
-            pdf.image(tmpfile_path, x=10, w=190)
-            os.remove(tmpfile_path)
-    else:
-        pdf.cell(0, 8, "No revenue data available", ln=True)
-    
-    pdf.ln(10)
-    
-    # 2. Opex Breakdown
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Operating Expenses Breakdown", ln=True)
-    pdf.set_font("Arial", '', 11)
-    
-    opex_data = tools.get_opex_breakdown()
-    if not opex_data.empty:
-        total_opex = opex_data['amount_usd'].sum()
-        pdf.cell(0, 8, f"Total OpEx: ${total_opex:,.0f}", ln=True)
-        pdf.ln(5)
-        
-        for _, row in opex_data.iterrows():
-            pct = (row['amount_usd'] / total_opex) * 100
-            pdf.cell(0, 8, f"{row['category']}: ${row['amount_usd']:,.0f} ({pct:.1f}%)", ln=True)
-        
-        pdf.ln(5)
-        
-        # Add chart
-        chart = tools.create_opex_chart(opex_data)
-        if chart:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-                img_bytes = chart.to_image(format="png", width=800, height=400)
-                tmpfile.write(img_bytes)
-                tmpfile_path = tmpfile.name
-            pdf.image(tmpfile_path, x=10, w=190)
-            os.remove(tmpfile_path)
-    else:
-        pdf.cell(0, 8, "No OpEx data available", ln=True)
-    
-    pdf.ln(10)
-    
-    # 3. Cash Runway
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Cash Runway Analysis", ln=True)
-    pdf.set_font("Arial", '', 11)
-    
-    runway_data = tools.calculate_cash_runway()
-    if "error" not in runway_data:
-        pdf.cell(0, 8, f"Current Cash: ${runway_data['current_cash']:,.0f}", ln=True)
-        pdf.cell(0, 8, f"Avg Monthly Burn: ${runway_data['avg_monthly_burn']:,.0f}", ln=True)
-        
-        if runway_data['runway_months'] == float('inf'):
-            pdf.cell(0, 8, "Runway: Cash positive (no burn)", ln=True)
-        else:
-            pdf.cell(0, 8, f"Runway: {runway_data['runway_months']:.1f} months", ln=True)
-    else:
-        pdf.cell(0, 8, runway_data["error"], ln=True)
-    
-    return pdf.output(dest='S').encode('latin1')
+    # fpdf is imported on the first export
+    from agent import report
+    return report.export_summary_pdf(tools)
 
 # ----------------------
 # Header
 # ----------------------
 st.title("💰 CFO Copilot")
 st.markdown("Ask me anything about your financials!")
+instruments.milestone('first_paint')
+
+try:
+    with st.spinner("Loading data..."):
+        tools, planner = warmup.wait()
+    data_loaded = True
+except Exception as e:
+    st.error(f"Error loading data: {e}")
+    data_loaded = False
+    tools = None
+    planner = None
 
 # ----------------------
 # Sidebar
@@ -152,20 +98,18 @@ if data_loaded:
     for dataset, info in data_summary.items():
         st.sidebar.write(f"**{dataset.title()}**: {info['rows']} rows")
 
+    cache_stats = planner.cache.stats()
+    st.sidebar.caption(f"Answer cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, {cache_stats['bytes'] / 1024:.0f} KB")
+    timings = warmup.timings()
+    st.sidebar.caption("Startup: " + ", ".join(f"{name.replace('_', ' ')} {seconds:.2f}s" for name, seconds in timings.items()))
+
     st.sidebar.header("Sample Questions")
-    sample_questions = [
-        "What was February 2024 revenue vs budget in USD?",
-        "Show gross margin % trend for last 3 months",
-        "Break down Opex by category for February 2024",
-        "What is our EBITDA for February 2024?",
-        "What is our cash runway right now?"
-    ]
-
-    for question in sample_questions:
+    for question in SAMPLE_QUESTIONS:
         if st.sidebar.button(question, key=f"sample_{hash(question)}"):
             st.session_state.messages.append({"role": "user", "content": question})
             
             response = planner.answer_question(question)
+            instruments.milestone('first_answer')
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": response["text"],
@@ -190,17 +134,39 @@ if data_loaded:
         except Exception as e:
             st.sidebar.error(f"Error: {str(e)}")
 
+    # Runway scenarios: 10,000 Monte Carlo paths are re-simulated when a slider moves to a new setting
+    st.sidebar.markdown("---")
+    st.sidebar.header("Runway Scenarios")
+    growth = st.sidebar.slider("Revenue growth (annual %)", -50, 50, 0, 5)
+    growth_sd = st.sidebar.slider("Growth uncertainty (sd, %)", 0, 30, 10, 5)
+    hires = st.sidebar.slider("Net hires per month", 0, 10, 0)
+    fx_shock = st.sidebar.slider("FX move vs USD (%)", -30, 30, 0, 5)
+    simulation, figure = runway_scenarios(tools, tools.data_version, growth, growth_sd, hires, fx_shock)
+    if "error" in simulation:
+        st.sidebar.error(simulation["error"])
+    else:
+        for p in (10, 50, 90):
+            runway = simulation['percentiles'][p]
+            st.sidebar.write(f"**Runway P{p}**: " + ("beyond 36 months" if runway == float('inf') else f"{runway:.1f} months"))
+        st.sidebar.caption(f"Out of cash within 36 months: {simulation['prob_out_of_cash'] * 100:.1f}% of paths")
+        st.sidebar.caption(f"Simple runway (cash / average EBITDA as burn): {simulation['simple_runway']:.1f} months; "
+                           f"the scenarios follow the cash trend (${simulation['baseline_monthly_flow']:,.0f}/month)")
+        st.sidebar.plotly_chart(figure, use_container_width=True)
+
 else:
     st.sidebar.error("Data not loaded")
 
 # ----------------------
 # Chat messages
 # ----------------------
-for message in st.session_state.messages:
+# Messages hold lazy chart specs, not figures. Only the latest chart is drawn on every rerun;
+# earlier ones are drawn (from the shared JSON cache) when their toggle is switched on.
+last = len(st.session_state.messages) - 1
+for i, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
-        if message.get("chart"):
-            st.plotly_chart(message["chart"], use_container_width=True)
+        if message.get("chart") and (i == last or st.toggle("Show chart", key=f"chart_{i}")):
+            st.plotly_chart(message["chart"].figure(), use_container_width=True)
 
 # ----------------------
 # Chat input
@@ -216,10 +182,11 @@ if prompt := st.chat_input("Ask about your financials..."):
         with st.chat_message("assistant"):
             with st.spinner("Analyzing..."):
                 response = planner.answer_question(prompt)
+                instruments.milestone('first_answer')
                 st.markdown(response["text"])
                 
                 if response.get("chart"):
-                    st.plotly_chart(response["chart"], use_container_width=True)
+                    st.plotly_chart(response["chart"].figure(), use_container_width=True)
                 
                 st.session_state.messages.append({
                     "role": "assistant",
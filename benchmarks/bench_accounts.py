@@ -0,0 +1,55 @@
+"""Metric filters on a large chart of accounts: str.contains scans vs the account hierarchy index
+
+Usage: python -m benchmarks.bench_accounts [--accounts 400] [--repeat 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from agent.accounts import AccountIndex
+from benchmarks.synthetic import account_names
+
+PATTERNS = ['Revenue', 'COGS', 'Opex:']
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=400)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    categories = pd.Index(account_names(args.accounts), dtype=object)
+    values = np.random.default_rng(0).random((args.months, 4, len(categories)))
+
+    def scans():
+        # One question's worth of filters, as the tools ran them before the index
+        for pattern in PATTERNS:
+            mask = np.asarray(categories.str.contains(pattern, case=False, regex=False, na=False), dtype=bool)
+            values[:, :, mask].sum()
+
+    start = time.perf_counter()
+    index = AccountIndex(categories)
+    build_s = time.perf_counter() - start
+
+    def lookups():
+        for pattern in PATTERNS:
+            values[:, :, index.select(pattern)].sum()
+
+    scan_s, index_s = per_call(scans, args.repeat), per_call(lookups, args.repeat)
+    print(f"{len(categories)} accounts, index built in {build_s * 1000:.2f} ms ({len(index)} nodes)")
+    print(f"str.contains filters {scan_s * 1e6:9.1f} us/question")
+    print(f"hierarchy index      {index_s * 1e6:9.1f} us/question  ({scan_s / index_s:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
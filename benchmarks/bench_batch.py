@@ -0,0 +1,48 @@
+"""Total cost of answering N questions: one answer_question call each vs a single answer_questions batch
+
+Usage: python -m benchmarks.bench_batch [--sizes 1 10 100 1000 10000] [--rows 1000000] [--loop-limit 1000]
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from benchmarks.bench_intent import questions
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--loop-limit', type=int, default=1000, help='skip the one-at-a-time loop above this batch size')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, generate_rows(args.rows, entities=4, accounts=12, currencies=3))
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory, use_cache=False)
+    # No answer cache, so the loop pays for every question the way the nightly job does
+    planner = CFOPlanner(tools, cache=None)
+
+    print(f"{'questions':>10}{'loop s':>10}{'batch s':>10}{'batch us/q':>12}")
+    for size in args.sizes:
+        log = questions(size)
+        loop = '-'
+        if size <= args.loop_limit:
+            start = time.perf_counter()
+            for question in log:
+                planner.answer_question(question)
+            loop = f"{time.perf_counter() - start:.3f}"
+
+        start = time.perf_counter()
+        planner.answer_questions(log)
+        batch_s = time.perf_counter() - start
+        print(f"{size:>10,}{loop:>10}{batch_s:>10.3f}{batch_s / size * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Per-entity metrics for many legal entities: one filtered call per entity vs the single grouped pass
+
+Usage: python -m benchmarks.bench_consolidation [--entities 60] [--accounts 40] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from agent.consolidation import entity_metrics
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate, write_fixtures
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entities', type=int, default=60)
+    parser.add_argument('--accounts', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, generate(entities=args.entities, accounts=args.accounts, currencies=4))
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory, use_cache=False)
+    month = tools.actuals_cube.months[-1]
+    entities = list(tools.actuals_cube.entities)
+
+    one_at_a_time = best_of(lambda: [tools.get_ebitda(month, entity=e) for e in entities], args.repeat)
+    grouped = best_of(lambda: entity_metrics(tools.actuals_cube, month), args.repeat)
+    tools.get_entity_metrics(month)
+    cached = best_of(lambda: tools.get_entity_metrics(month), args.repeat)
+
+    print(f"{len(entities)} entities x {len(tools.actuals_cube.categories)} accounts")
+    print(f"get_ebitda per entity   {one_at_a_time * 1000:8.2f} ms")
+    print(f"grouped pass            {grouped * 1000:8.2f} ms  ({one_at_a_time / grouped:.1f}x)")
+    print(f"cached                  {cached * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
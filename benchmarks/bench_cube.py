@@ -0,0 +1,68 @@
+"""Per-question latency of the FinanceTools metrics: per-call scans vs the USD ledger cube
+
+Usage: python -m benchmarks.bench_cube [--rows 10000 1000000 10000000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from types import SimpleNamespace
+
+from agent.tools import FinanceTools
+from benchmarks import legacy
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+
+def questions(month):
+    """(label, before, after) callables for one question per metric"""
+    return [
+        ('revenue_vs_budget', lambda t: legacy.revenue_vs_budget(t, month), lambda t: t.get_revenue_vs_budget(month)),
+        ('gross_margin_trend', lambda t: legacy.gross_margin_trend(t, 3), lambda t: t.get_gross_margin_trend(3)),
+        ('opex_breakdown', lambda t: legacy.opex_breakdown(t, month), lambda t: t.get_opex_breakdown(month)),
+        ('ebitda', lambda t: legacy.ebitda(t, month), lambda t: t.get_ebitda(month)),
+        ('cash_runway', legacy.cash_runway, lambda t: t.calculate_cash_runway()),
+    ]
+
+
+def best_of(fn, tools, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(tools)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        frames = generate_rows(rows, entities=4, accounts=12, currencies=3)
+        write_fixtures(directory, frames)
+        month = frames['actuals']['month'].iloc[-1]
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory)
+        load_s = time.perf_counter() - start
+
+    # The per-call scans run on the raw CSV rows, as they did before the compact ledgers
+    raw = SimpleNamespace(**frames)
+    print(f"\n{len(frames['actuals']):,} actuals rows (load + cube build {load_s:.2f}s)")
+    print(f"{'question':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for label, before, after in questions(month):
+        b = best_of(before, raw, repeat) * 1000
+        a = best_of(after, tools, repeat) * 1000
+        print(f"{label:<22}{b:>12.2f}{a:>12.3f}{b / a:>9.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
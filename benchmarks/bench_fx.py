@@ -0,0 +1,45 @@
+"""USD conversion cost: DataFrame merge against the fx table vs FXEngine indexed gathers
+
+Usage: python -m benchmarks.bench_fx [--rows 1000000 10000000]
+"""
+import argparse
+import time
+
+from agent.fx import FXEngine
+from benchmarks.synthetic import generate_rows
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def merge_to_usd(df, fx):
+    merged = df.merge(fx, on=['month', 'currency'], how='left')
+    return merged['amount'] * merged['rate_to_usd'].fillna(1.0)
+
+
+def run(rows):
+    frames = generate_rows(rows, entities=8, accounts=12, currencies=5)
+    actuals, fx = frames['actuals'], frames['fx']
+    engine = FXEngine(fx)
+
+    merge_s = best_of(lambda: merge_to_usd(actuals, fx))
+    engine_s = best_of(lambda: engine.convert(actuals['amount'], actuals['month'], actuals['currency']))
+    print(f"{len(actuals):>12,} rows  merge {merge_s * 1000:9.1f} ms  engine {engine_s * 1000:9.1f} ms  ({merge_s / engine_s:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000])
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Intent parsing throughput over a synthetic log of user questions
+
+Usage: python -m benchmarks.bench_intent [--questions 100000]
+"""
+import argparse
+import random
+import time
+
+from agent.intent import IntentParser
+
+TEMPLATES = [
+    "What was {month} revenue vs budget in USD?",
+    "Show gross margin % trend for last {n} months",
+    "Break down Opex by category for {month}",
+    "What is our EBITDA for {month}?",
+    "What is our cash runway right now?",
+    "{entity} EBITDA for Q{q} {year}",
+    "Opex YTD {year}",
+    "revenue year over year for {year}-0{q}",
+    "How did {entity} do against budget in {short}?",
+]
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+
+
+def questions(count, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        month = rng.randrange(12)
+        year = rng.choice([2023, 2024, 2025])
+        out.append(rng.choice(TEMPLATES).format(
+            month=f"{MONTH_NAMES[month]} {year}",
+            short=f"{MONTH_NAMES[month][:3]} {year % 100}",
+            n=rng.randint(2, 12), q=rng.randint(1, 4), year=year,
+            entity=rng.choice(['ParentCo', 'EMEA']),
+        ))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    args = parser.parse_args()
+
+    log = questions(args.questions)
+    intent_parser = IntentParser(entities=['ParentCo', 'EMEA'], latest_month='2025-12')
+    start = time.perf_counter()
+    for question in log:
+        intent_parser.parse(question)
+    elapsed = time.perf_counter() - start
+    print(f"{len(log):,} questions in {elapsed:.2f}s: {len(log) / elapsed:,.0f} questions/sec")
+
+
+if __name__ == '__main__':
+    main()
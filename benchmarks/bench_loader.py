@@ -0,0 +1,40 @@
+"""Cold start of the fixture loaders: raw CSV parse vs building and reusing the Feather cache
+
+Usage: python -m benchmarks.bench_loader [--rows 1000000 10000000]
+"""
+import argparse
+import tempfile
+import time
+
+from agent.loader import load_dataset
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, generate_rows(rows, entities=4, accounts=12, currencies=3))
+        cache_dir = f'{directory}/.cache'
+
+        csv_s = timed(lambda: load_dataset(directory, 'actuals'))
+        build_s = timed(lambda: load_dataset(directory, 'actuals', cache_dir))
+        warm_s = timed(lambda: load_dataset(directory, 'actuals', cache_dir))
+
+    print(f"{rows:>12,} rows  csv {csv_s:7.2f}s  cache build {build_s:7.2f}s  cache hit {warm_s:7.3f}s  ({csv_s / warm_s:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000])
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Resident size of the loaded data: ledgers as typed CSV rows vs the compact key-grain ledgers FinanceTools holds
+
+Usage: python -m benchmarks.bench_memory [--rows 1000000 10000000] [--lines-per-key 1 10]
+
+Sizes are the deep memory usage of the frames and the nbytes of the cube arrays, i.e. what
+every worker process keeps resident for the data itself.
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+
+from agent.loader import load_dataset
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate, write_fixtures
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def cube_bytes(cube):
+    return cube.values.nbytes + cube.counts.nbytes
+
+
+def run(rows, lines_per_key):
+    # Enough accounts that each (month, entity, account) key carries `lines_per_key` ledger lines
+    entities, years = 20, 3
+    accounts = max(rows // (12 * years * entities * lines_per_key), 3)
+    frames = generate(entities, accounts, currencies=4, years=years, rows_per_cell=lines_per_key)
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, frames)
+        typed = sum(frame_bytes(load_dataset(directory, name)) for name in ('actuals', 'budget'))
+        objects = sum(frame_bytes(frames[name]) for name in ('actuals', 'budget'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory, use_cache=False)
+    compact = frame_bytes(tools.actuals) + frame_bytes(tools.budget)
+    cubes = cube_bytes(tools.actuals_cube) + cube_bytes(tools.budget_cube)
+
+    print(f"{len(frames['actuals']):>12,} rows, {lines_per_key:>3} lines/key  "
+          f"object strings {objects / 1e6:8.1f} MB  categorical rows {typed / 1e6:8.1f} MB  "
+          f"compact {compact / 1e6:7.1f} MB  (+ cubes {cubes / 1e6:5.1f} MB)  "
+          f"{objects / compact:5.1f}x / {typed / compact:4.1f}x smaller")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--lines-per-key', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+    for rows in args.rows:
+        for lines_per_key in args.lines_per_key:
+            run(rows, lines_per_key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Cold load of partitioned ledger directories on 1..N workers, and a single-month question with partition pruning
+
+Usage: python -m benchmarks.bench_partitions [--rows 1000000] [--workers 1 2 4 8] [--processes]
+
+Actuals and budget are written as <name>/entity=X/month=YYYY-MM.csv; the baseline is the same
+data as one CSV per dataset (without the columnar cache). The lazy case answers one question
+about the latest month, reading only that month's partitions.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from agent.instrument import instruments
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate_rows, write_fixtures, write_partitioned
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(rows, workers, processes):
+    frames = generate_rows(rows, entities=10, accounts=40, currencies=4)
+    month = sorted(frames['actuals']['month'].unique())[-1]
+    label = f"{month} EBITDA"
+    with tempfile.TemporaryDirectory() as single, tempfile.TemporaryDirectory() as partitioned:
+        write_fixtures(single, frames)
+        write_partitioned(partitioned, frames)
+        files = sum(len(files) for _, _, files in os.walk(os.path.join(partitioned, 'actuals')))
+        print(f"{len(frames['actuals']):>12,} rows, {files} actuals partitions  ({os.cpu_count()} CPUs)")
+
+        _, baseline = timed(lambda: FinanceTools(fixtures_dir=single, use_cache=False))
+        print(f"{'':4s}{'single CSV':24s} {baseline * 1000:9.1f} ms")
+        for n in workers:
+            _, elapsed = timed(lambda: FinanceTools(fixtures_dir=partitioned, workers=n, processes=processes))
+            print(f"{'':4s}{f'partitions, {n} workers':24s} {elapsed * 1000:9.1f} ms  {baseline / elapsed:5.2f}x")
+
+        instruments.reset()
+        tools, opened = timed(lambda: FinanceTools(fixtures_dir=partitioned, workers=max(workers), processes=processes, lazy=True))
+        _, answered = timed(lambda: CFOPlanner(tools, cache=None).answer_question(label))
+        read = sum(n for (_, name), n in instruments.counters.items() if name == 'partitions_read')
+        pruned = sum(n for (_, name), n in instruments.counters.items() if name == 'partitions_pruned')
+        print(f"{'':4s}{'lazy: one-month question':24s} {(opened + answered) * 1000:9.1f} ms  "
+              f"{read} of {read + pruned} partitions read")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--processes', action='store_true', help="process pool instead of threads")
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.workers, args.processes)
+
+
+if __name__ == '__main__':
+    main()
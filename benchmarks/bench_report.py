@@ -0,0 +1,61 @@
+"""Summary PDF export: serial Kaleido renders through tempfiles vs the parallel, cached report pipeline
+
+Usage: python -m benchmarks.bench_report [--exports 5]
+
+Needs Kaleido (and the Chrome it drives) installed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from fpdf import FPDF
+
+from agent import report
+from agent.tools import FinanceTools
+
+
+def serial_export(tools):
+    """The original pipeline: one chart at a time, each PNG written to disk and read back"""
+    pdf = FPDF()
+    pdf.add_page()
+    for data, chart in ((tools.get_revenue_vs_budget(), tools.create_revenue_chart),
+                        (tools.get_opex_breakdown(), tools.create_opex_chart)):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
+            tmpfile.write(chart(data).to_image(format="png", width=800, height=400))
+            path = tmpfile.name
+        pdf.image(path, x=10, w=190)
+        os.remove(path)
+    return bytes(pdf.output())
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--exports', type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tools = FinanceTools()
+
+    serial = [timed(lambda: serial_export(tools)) for _ in range(args.exports)]
+    summary = report.SummaryReport(tools)
+    # Start the worker processes outside the timings, as a long-running app would have
+    report.render_pool().submit(int).result()
+    cold = timed(summary.build)
+    warm = [timed(summary.build) for _ in range(args.exports)]
+
+    print(f"serial export       {min(serial) * 1000:9.1f} ms")
+    print(f"parallel, cold      {cold * 1000:9.1f} ms")
+    print(f"parallel, cached    {min(warm) * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
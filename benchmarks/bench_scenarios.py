@@ -0,0 +1,69 @@
+"""Monte Carlo cash runway: one Python loop per path vs the vectorized scenario engine
+
+Usage: python -m benchmarks.bench_scenarios [--paths 1000 10000 100000] [--months 36] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from agent.scenarios import Normal, Uniform
+from agent.tools import FinanceTools
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def looped(engine, paths, months, seed=0):
+    # The same model stepped month by month, one path at a time
+    rng = np.random.default_rng(seed)
+    runways = []
+    for _ in range(paths):
+        growth, shock = rng.normal(0, 0.1), rng.uniform(-0.1, 0.1)
+        cash, months_left = engine.cash, float('inf')
+        for t in range(1, months + 1):
+            revenue = engine.revenue * (1 + growth) ** (t / 12) * (1 + engine.foreign_revenue * shock)
+            revenue *= 1 + rng.standard_normal() * engine.revenue_vol
+            opex = engine.opex * (1 + engine.foreign_opex * shock) * (1 + rng.standard_normal() * engine.opex_vol)
+            cash += revenue * (1 - engine.cogs_ratio) - opex + engine.other
+            if cash < 0:
+                months_left = t
+                break
+        runways.append(months_left)
+    return np.percentile(runways, [10, 50, 90], method='inverted_cdf')
+
+
+def vectorized(engine, paths, months, seed=0):
+    result = engine.simulate(paths, months, seed=seed, revenue_growth=Normal(0, 0.1), fx_shock=Uniform(-0.1, 0.1))
+    return result.percentiles((10, 50, 90))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paths', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tools = FinanceTools(use_cache=False)
+    engine = tools.scenarios()
+
+    print(f"{'paths':>8} {'loop':>12} {'vectorized':>12} {'speedup':>8}")
+    for paths in args.paths:
+        # The loop is only timed where it finishes in reasonable time
+        loop = best_of(lambda: looped(engine, paths, args.months), 1) if paths <= 10000 else float('nan')
+        fast = best_of(lambda: vectorized(engine, paths, args.months), args.repeat)
+        print(f"{paths:>8} {loop * 1000:>10.1f}ms {fast * 1000:>10.1f}ms {loop / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Load test for the HTTP query service: many concurrent keep-alive clients, p50/p99 latency
+
+Usage: python -m benchmarks.bench_service [--clients 100 200] [--requests 50] [--workers 4] [--port PORT]
+
+Without --port the service is started in-process on a background thread (its own event loop,
+so client and server do not share a loop); with --port an already running service is used.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from agent.service import QueryService
+from agent.tools import FinanceTools
+
+# A dashboard-like mix: repeated planner questions, per-entity metrics and a few batches
+QUESTIONS = [
+    "What was February 2024 revenue vs budget in USD?",
+    "Show gross margin % trend for last 3 months",
+    "Break down Opex by category for February 2024",
+    "What is our EBITDA for February 2024?",
+    "What is our cash runway right now?",
+    "EMEA EBITDA for March 2024",
+    "EBITDA by entity for Q1 2024",
+    "Revenue month over month in March 2025",
+]
+METRICS = [
+    "/metrics/get_ebitda?month={month}",
+    "/metrics/get_opex_breakdown?month={month}&entity=EMEA",
+    "/metrics/get_entity_metrics?month={month}",
+    "/metrics/get_metric_stats?metric=revenue&month={month}&window=6",
+]
+
+
+def workload(i, months):
+    """(method, path, body) of the i-th request"""
+    kind = i % 10
+    if kind < 6:
+        return 'POST', '/answer', {"question": QUESTIONS[i % len(QUESTIONS)]}
+    if kind < 9:
+        return 'GET', METRICS[i % len(METRICS)].format(month=months[i % len(months)]), None
+    return 'POST', '/batch', {"questions": QUESTIONS[:4]}
+
+
+async def client(port, requests, offset, months, latencies, statuses):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for i in range(requests):
+            method, path, body = workload(offset + i, months)
+            data = json.dumps(body).encode() if body is not None else b''
+            start = time.perf_counter()
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def load(port, clients, requests, months):
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, requests, c * requests, months, latencies, statuses) for c in range(clients)])
+    return np.array(latencies), statuses, time.perf_counter() - start
+
+
+def start_service(workers, max_pending):
+    """Service on a free port in a daemon thread; returns (service, port)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tools = FinanceTools()
+    service = QueryService(tools, workers=workers, max_pending=max_pending)
+    ready = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(service.start(port=0))
+        state['port'] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return service, state['port']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-pending', type=int, default=256)
+    parser.add_argument('--port', type=int)
+    args = parser.parse_args()
+
+    service = None
+    port = args.port
+    if port is None:
+        service, port = start_service(args.workers, args.max_pending)
+    months = [f"2024-{m:02d}" for m in range(1, 13)]
+
+    print(f"{'clients':>8} {'requests':>9} {'req/s':>9} {'p50':>9} {'p90':>9} {'p99':>9}  status")
+    for clients in args.clients:
+        latencies, statuses, elapsed = asyncio.run(load(port, clients, args.requests, months))
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        codes = ' '.join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+        print(f"{clients:>8} {len(latencies):>9} {len(latencies) / elapsed:>9.0f} {p50:>7.1f}ms {p90:>7.1f}ms {p99:>7.1f}ms  {codes}")
+    if service is not None:
+        print(f"coalesced {service.stats['coalesced']}, rejected {service.stats['rejected']}, errors {service.stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Worker start-up and per-question latency: pandas backend vs the SQLite backend with pushed-down queries
+
+Usage: python -m benchmarks.bench_sql [--rows 1000000 10000000] [--repeat 5]
+
+The SQLite database is imported once (timed separately); `open` is what every further worker
+pays to start on it, against loading the ledgers into pandas and building the cubes.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def best_of(fn, repeat):
+    return min(timed(fn)[1] for _ in range(repeat))
+
+
+def run(rows, repeat):
+    frames = generate_rows(rows, entities=10, accounts=40, currencies=4)
+    month = sorted(frames['actuals']['month'].unique())[-1]
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, frames)
+        database = os.path.join(directory, 'ledger.sqlite')
+        with contextlib.redirect_stdout(io.StringIO()):
+            pandas_tools, load = timed(lambda: FinanceTools(fixtures_dir=directory, use_cache=False))
+            _, imported = timed(lambda: FinanceTools(fixtures_dir=directory, backend='sqlite', database=database))
+            sql_tools, opened = timed(lambda: FinanceTools(fixtures_dir=directory, backend='sqlite', database=database))
+
+        print(f"{len(frames['actuals']):>12,} rows  pandas load {load * 1000:9.1f} ms   "
+              f"sqlite import {imported * 1000:9.1f} ms, open {opened * 1000:7.1f} ms")
+        for name, fn in (('get_ebitda', lambda t: t.get_ebitda(month)),
+                         ('get_opex_breakdown', lambda t: t.get_opex_breakdown(month)),
+                         ('get_revenue_vs_budget', lambda t: t.get_revenue_vs_budget(month)),
+                         ('get_revenue_vs_budget[all]', lambda t: t.get_revenue_vs_budget())):
+            before, after = (best_of(lambda: fn(t), repeat) for t in (pandas_tools, sql_tools))
+            print(f"{'':14s}{name:28s} pandas {before * 1000:8.2f} ms   sqlite {after * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Replica start-up: time to first paint and to first answer, eager start vs background warm-up
+
+Usage: python -m benchmarks.bench_startup [--rows 100000 1000000] [--repeat 3]
+
+Each start runs in a fresh interpreter, as a newly spawned replica would. "eager" is the old app
+start: import the tools (pandas, plotly), load the data, then paint, and answer the first sample
+question when it is asked. "warmup" paints right after importing agent.warmup, loads and answers
+the sample questions on the background thread; its first answer is the cached one a user gets
+for a sample question once the warm-up is done.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+EAGER = """
+import contextlib, io, json, time
+from agent.instrument import STARTED
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+import plotly.graph_objects, fpdf
+from agent.warmup import SAMPLE_QUESTIONS
+with contextlib.redirect_stdout(io.StringIO()):
+    planner = CFOPlanner(FinanceTools(fixtures_dir={fixtures!r}, use_cache=False), cache=None)
+    paint = time.perf_counter() - STARTED
+    planner.answer_question(SAMPLE_QUESTIONS[0])["chart"].to_json()
+print(json.dumps({{"first_paint": paint, "first_answer": time.perf_counter() - STARTED}}))
+"""
+
+WARMUP = """
+import contextlib, io, json, time
+from agent.instrument import STARTED, instruments
+from agent.warmup import SAMPLE_QUESTIONS, Warmup
+
+def factory():
+    from agent.planner import CFOPlanner
+    from agent.tools import FinanceTools
+    tools = FinanceTools(fixtures_dir={fixtures!r}, use_cache=False)
+    return tools, CFOPlanner(tools)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    warmup = Warmup(factory).start()
+    instruments.milestone('first_paint')
+    warmup.done.wait()
+    _, planner = warmup.wait()
+    planner.answer_question(SAMPLE_QUESTIONS[0])["chart"].to_json()
+    answered = time.perf_counter() - STARTED
+print(json.dumps({{**warmup.timings(), "answered_warm": answered}}))
+"""
+
+
+def start(code, fixtures):
+    result = subprocess.run([sys.executable, '-c', code.format(fixtures=fixtures)], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run(rows, repeat):
+    frames = generate_rows(rows, entities=10, accounts=40, currencies=4)
+    with tempfile.TemporaryDirectory() as fixtures:
+        write_fixtures(fixtures, frames)
+        print(f"{len(frames['actuals']):>12,} rows")
+        for mode, code in (('eager', EAGER), ('warmup', WARMUP)):
+            runs = [start(code, fixtures) for _ in range(repeat)]
+            medians = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+            print(f"{'':4s}{mode:8s}" + "  ".join(f"{name} {seconds * 1000:8.1f} ms" for name, seconds in medians.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Answer and chart latency after a restart: computed from the data vs read from the on-disk result store
+
+Usage: python -m benchmarks.bench_store [--rows 100000 1000000] [--repeat 5]
+
+Each case answers a question and serializes its chart, as the app does to display it.
+"computed" starts from empty caches; "store" is a restarted worker (new memory caches on the
+same store file) that finds the answer and the chart spec there; "memory" is the next ask.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from agent.cache import ResponseCache
+from agent.charts import chart_cache
+from agent.planner import CFOPlanner
+from agent.store import ResultStore
+from agent.tools import FinanceTools
+from agent.warmup import SAMPLE_QUESTIONS
+from benchmarks.synthetic import generate_rows, write_fixtures
+
+QUESTIONS = SAMPLE_QUESTIONS + ["EBITDA by entity for Q1 2024", "What drove the Opex variance in March 2024?"]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def ask(planner, question):
+    answer = planner.answer_question(question)
+    if answer["chart"] is not None:
+        answer["chart"].to_json()
+
+
+def restart(tools, store):
+    """Planner of a freshly started worker: empty memory caches backed by store (or by nothing)"""
+    chart_cache.clear()
+    chart_cache.attach(store, 'charts')
+    return CFOPlanner(tools, cache=ResponseCache(store=store, namespace='answers'))
+
+
+def run(rows, repeat):
+    frames = generate_rows(rows, entities=10, accounts=40, currencies=4)
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, frames)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory, use_cache=False)
+        path = os.path.join(directory, 'results.sqlite')
+        print(f"{len(frames['actuals']):>12,} rows")
+        for question in QUESTIONS:
+            computed = []
+            for _ in range(repeat):
+                planner = restart(tools, None)
+                computed.append(timed(lambda: ask(planner, question)))
+            ask(restart(tools, ResultStore(path)), question)
+            restarts = []
+            for _ in range(repeat):
+                planner = restart(tools, ResultStore(path))
+                restarts.append((timed(lambda: ask(planner, question)), timed(lambda: ask(planner, question))))
+            computed = statistics.median(computed)
+            store = statistics.median(first for first, _ in restarts)
+            memory = statistics.median(second for _, second in restarts)
+            print(f"{'':4s}{question[:48]:48s} computed {computed * 1000:8.2f} ms  store {store * 1000:6.2f} ms  "
+                  f"memory {memory * 1000:6.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Peak RSS of FinanceTools loading a large ledger eagerly vs with chunked streaming ingestion
+
+Usage: python -m benchmarks.bench_streaming [--gb 6] [--chunksize 1000000] [--modes streaming eager]
+
+The default ledger size is chosen to exceed the container's memory limit; use
+--modes streaming only in that case, since the eager load is expected to be killed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def memory_limit():
+    """cgroup memory limit in bytes, or None when unlimited/unknown"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def peak_rss_mb():
+    """High-water RSS of this process (VmHWM; ru_maxrss would include the parent's peak across exec)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(directory, mode, chunksize):
+    """Child process: load the ledger and print peak RSS in MB"""
+    from agent.tools import FinanceTools
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tools = FinanceTools(fixtures_dir=directory, use_cache=False, streaming=(mode == 'streaming'), chunksize=chunksize)
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    rows = tools.get_data_summary()['actuals']['rows']
+    print(f"{mode:<10} rows {rows:>14,}  load {elapsed:8.1f}s  peak RSS {peak_mb:9.0f} MB  ebitda {tools.get_ebitda()['ebitda']:,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gb', type=float, default=None, help='actuals.csv size (default: 1.5x memory limit, else 2 GB)')
+    parser.add_argument('--chunksize', type=int, default=1000000)
+    parser.add_argument('--modes', nargs='+', default=['streaming'], choices=['streaming', 'eager'])
+    parser.add_argument('--measure', nargs=2, metavar=('DIR', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure[0], args.measure[1], args.chunksize)
+        return
+
+    from benchmarks.synthetic import write_large_fixtures
+
+    limit = memory_limit()
+    target = int(args.gb * 1e9) if args.gb else int(limit * 1.5) if limit else int(2e9)
+    print(f"memory limit: {limit / 1e9:.1f} GB" if limit else "memory limit: none")
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_large_fixtures(directory, target)
+        print(f"actuals.csv: {os.path.getsize(os.path.join(directory, 'actuals.csv')) / 1e9:.2f} GB")
+        for mode in args.modes:
+            cmd = [sys.executable, '-m', 'benchmarks.bench_streaming', '--measure', directory, mode, '--chunksize', str(args.chunksize)]
+            result = subprocess.run(cmd)
+            if result.returncode:
+                print(f"{mode:<10} failed with exit code {result.returncode}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Many window variants per page load: recomputing the monthly history for each vs the prefix-sum kernel
+
+Usage: python -m benchmarks.bench_timeseries [--entities 10] [--years 5] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate, write_fixtures
+
+WINDOWS = (1, 3, 6, 12, 24)
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def recompute(tools, months):
+    # What every call did before the kernel: rebuild the series, then window it
+    results = []
+    for month in months:
+        for window in WINDOWS:
+            revenue = tools.actuals_cube.monthly('Revenue')
+            cogs = tools.actuals_cube.monthly('COGS').reindex(revenue.index, fill_value=0)
+            opex = tools.actuals_cube.monthly('Opex:').reindex(revenue.index, fill_value=0)
+            ebitda = (revenue - cogs - opex)[:month]
+            results.append((ebitda.tail(window).mean(), ebitda[ebitda.index.str.startswith(month[:4])].sum()))
+    return results
+
+
+def kernel(tools, months):
+    series = tools.timeseries()['ebitda']
+    return [(series.trailing_mean(window, month), series.ytd(month)) for month in months for window in WINDOWS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entities', type=int, default=10)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, generate(entities=args.entities, years=args.years))
+        with contextlib.redirect_stdout(io.StringIO()):
+            tools = FinanceTools(fixtures_dir=directory, use_cache=False)
+    months = list(tools.timeseries().months)
+
+    rebuilt = best_of(lambda: recompute(tools, months), max(1, args.repeat // 10))
+    tools.timeseries()
+    served = best_of(lambda: kernel(tools, months), args.repeat)
+
+    print(f"{len(months)} months x {len(WINDOWS)} windows = {len(months) * len(WINDOWS)} queries")
+    print(f"recompute per query     {rebuilt * 1000:8.2f} ms")
+    print(f"prefix-sum kernel       {served * 1000:8.2f} ms  ({rebuilt / served:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Per-call scan implementations of the FinanceTools metrics, kept as the "before" baseline"""
+
+
+def convert_to_usd(tools, df, amount_col='amount'):
+    df_with_fx = df.merge(tools.fx, on=['month', 'currency'], how='left')
+    df_with_fx['rate_to_usd'] = df_with_fx['rate_to_usd'].fillna(1.0)
+    df_with_fx[f'{amount_col}_usd'] = df_with_fx[amount_col] * df_with_fx['rate_to_usd']
+    return df_with_fx
+
+
+def _usd(tools, pattern):
+    rows = tools.actuals[tools.actuals['account_category'].str.contains(pattern, case=False, na=False)].copy()
+    return convert_to_usd(tools, rows)
+
+
+def revenue_vs_budget(tools, month=None):
+    actuals_usd = _usd(tools, 'Revenue')
+    budget_rev = tools.budget[tools.budget['account_category'].str.contains('Revenue', case=False, na=False)].copy()
+    budget_usd = convert_to_usd(tools, budget_rev)
+    if month:
+        actuals_usd = actuals_usd[actuals_usd['month'] == month]
+        budget_usd = budget_usd[budget_usd['month'] == month]
+    actuals_agg = actuals_usd.groupby('month')['amount_usd'].sum().reset_index()
+    budget_agg = budget_usd.groupby('month')['amount_usd'].sum().reset_index()
+    comparison = actuals_agg.merge(budget_agg, on='month', suffixes=('_actual', '_budget'))
+    comparison['variance'] = comparison['amount_usd_actual'] - comparison['amount_usd_budget']
+    return comparison
+
+
+def gross_margin_trend(tools, months=None):
+    revenue = _usd(tools, 'Revenue').groupby('month')['amount_usd'].sum().rename('revenue')
+    cogs = _usd(tools, 'COGS').groupby('month')['amount_usd'].sum().rename('cogs')
+    margin = revenue.reset_index().merge(cogs.reset_index(), on='month', how='left')
+    margin['gross_margin_pct'] = (margin['revenue'] - margin['cogs'].fillna(0)) / margin['revenue'] * 100
+    return margin.tail(months) if months else margin
+
+
+def opex_breakdown(tools, month=None):
+    opex_usd = _usd(tools, 'Opex:')
+    if month:
+        opex_usd = opex_usd[opex_usd['month'] == month]
+    return opex_usd.groupby('account_category')['amount_usd'].sum().sort_values(ascending=False)
+
+
+def ebitda(tools, month=None):
+    parts = {}
+    for key, pattern in (('revenue', 'Revenue'), ('cogs', 'COGS'), ('opex', 'Opex:')):
+        usd = _usd(tools, pattern)
+        if month:
+            usd = usd[usd['month'] == month]
+        parts[key] = usd['amount_usd'].sum()
+    parts['ebitda'] = parts['revenue'] - parts['cogs'] - parts['opex']
+    return parts
+
+
+def cash_runway(tools):
+    current_cash = tools.cash.sort_values('month', ascending=False).iloc[0]['cash_usd']
+    actuals_usd = convert_to_usd(tools, tools.actuals)
+    by_month = {}
+    for key, pattern in (('revenue', 'Revenue'), ('cogs', 'COGS'), ('opex', 'Opex:')):
+        rows = actuals_usd[actuals_usd['account_category'].str.contains(pattern, case=False, na=False)]
+        by_month[key] = rows.groupby('month')['amount_usd'].sum()
+    revenue = by_month['revenue']
+    net_income = revenue - by_month['cogs'].reindex(revenue.index, fill_value=0) - by_month['opex'].reindex(revenue.index, fill_value=0)
+    burn = abs(net_income.tail(3).mean())
+    return current_cash / burn if burn else float('inf')
@@ -0,0 +1,258 @@
+"""Benchmark suite: every FinanceTools query, the planner and the PDF export over synthetic ledgers of several sizes
+
+Usage: python -m benchmarks.suite [--sizes small medium] [--repeat 5] [--output results.json] [--baseline old.json]
+       python -m benchmarks.suite --entities 20 --accounts 80 --currencies 4 --years 5
+       python -m benchmarks.suite --compare old.json new.json [--threshold 0.25]
+
+Each case is timed `repeat` times after one warm-up call and reported as its best and median
+run. Results are written as JSON (with the commit they were measured at), and two result files
+are compared case by case on the median: a case more than `threshold` slower than the baseline
+(and slower by more than --min-delta-ms, so timer noise on tiny cases does not count) is a
+regression, and the command exits with status 1.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from agent import report
+from agent.charts import chart_cache
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from benchmarks.synthetic import generate, write_fixtures
+
+# Ledger shapes: entities x accounts x currencies x years (x rows per month/entity/account cell)
+SIZES = {
+    'small': dict(entities=2, accounts=6, currencies=2, years=2),
+    'medium': dict(entities=10, accounts=40, currencies=4, years=5, rows_per_cell=2),
+    'large': dict(entities=40, accounts=150, currencies=8, years=10, rows_per_cell=2),
+}
+
+
+class Case:
+    """One benchmarked call; `setup` runs untimed before every run (e.g. to drop memoised results)"""
+
+    def __init__(self, name, fn, setup=None):
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+
+    def run(self, repeat):
+        if self.setup:
+            self.setup()
+        self.fn()
+        times = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            start = time.perf_counter()
+            self.fn()
+            times.append(time.perf_counter() - start)
+        return {"best": min(times), "median": statistics.median(times), "runs": len(times)}
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def questions(month, entity):
+    """Questions covering each planner route, about months present in the generated ledger"""
+    label = pd.Period(month, 'M').strftime('%B %Y')
+    return {
+        'revenue': f"What was {label} revenue vs budget in USD?",
+        'gross_margin': "Show gross margin % trend for last 3 months",
+        'opex': f"Break down Opex by category for {label}",
+        'ebitda': f"What is our EBITDA for {label}?",
+        'entity': f"{entity} EBITDA for {label}",
+        'by_entity': f"EBITDA by entity for {label}",
+        'change': f"Revenue month over month in {label}",
+        'cash_runway': "What is our cash runway right now?",
+        'scenarios': "Run a Monte Carlo simulation of cash runway",
+        'variance': f"What drove the opex overrun in {label}?",
+        'anomalies': f"Anything unusual in {label}?",
+    }
+
+
+def cases(directory, tools, frames):
+    """Every public query of FinanceTools, the planner and the PDF export"""
+    months = sorted(frames['actuals']['month'].unique())
+    month, entity = months[-1], frames['actuals']['entity'].iloc[-1]
+    quarter = (months[-3], months[-1])
+    planner = CFOPlanner(tools, cache=None)
+    asked = questions(month, entity)
+
+    def cold():
+        # Drop what the current snapshot memoised (kernels, entity metrics, scenario baselines)
+        tools.snapshot._memo.clear()
+
+    def no_charts():
+        chart_cache.clear()
+
+    # One month of rows for append/refresh, re-dated to a month after the ledger
+    new_month = (pd.Period(month, 'M') + 1).strftime('%Y-%m')
+    appended = frames['actuals'][frames['actuals']['month'] == month].assign(month=new_month)
+
+    def grow_csv():
+        appended.to_csv(os.path.join(directory, 'actuals.csv'), mode='a', header=False, index=False)
+
+    found = [
+        Case('load', lambda: quiet(FinanceTools, fixtures_dir=directory, use_cache=False)),
+        Case('load_cached', lambda: quiet(FinanceTools, fixtures_dir=directory)),
+        Case('load_streaming', lambda: quiet(FinanceTools, fixtures_dir=directory, use_cache=False, streaming=True)),
+        Case('get_revenue_vs_budget', lambda: tools.get_revenue_vs_budget()),
+        Case('get_revenue_vs_budget[month]', lambda: tools.get_revenue_vs_budget(month)),
+        Case('get_gross_margin_trend', lambda: tools.get_gross_margin_trend(3)),
+        Case('get_opex_breakdown', lambda: tools.get_opex_breakdown(month)),
+        Case('get_opex_breakdown[quarter]', lambda: tools.get_opex_breakdown(quarter)),
+        Case('get_ebitda', lambda: tools.get_ebitda(month)),
+        Case('get_ebitda[entity]', lambda: tools.get_ebitda(month, entity=entity)),
+        Case('get_account_rollup', lambda: tools.get_account_rollup(1, month)),
+        Case('get_entity_metrics', lambda: tools.get_entity_metrics(month), setup=cold),
+        Case('get_variance', lambda: tools.get_variance(month=quarter, level=1)),
+        Case('get_variance[month]', lambda: tools.get_variance('Opex:', by='month')),
+        Case('get_variance_drivers', lambda: tools.get_variance_drivers('Opex:', quarter)),
+        Case('get_anomalies', lambda: tools.get_anomalies(month), setup=cold),
+        Case('get_anomalies[quarter]', lambda: tools.get_anomalies(quarter)),
+        Case('get_metric_stats', lambda: tools.get_metric_stats('ebitda', month, window=6), setup=cold),
+        Case('timeseries', lambda: tools.timeseries(), setup=cold),
+        Case('calculate_cash_runway', lambda: tools.calculate_cash_runway()),
+        Case('scenarios.grid', lambda: tools.scenarios().grid(revenue_growth=np.linspace(-0.3, 0.3, 13), hires=range(11)), setup=cold),
+        Case('simulate_cash_runway', lambda: tools.simulate_cash_runway(seed=0), setup=cold),
+        Case('get_data_summary', lambda: tools.get_data_summary()),
+        Case('create_revenue_chart', lambda: tools.chart('revenue', tools.get_revenue_vs_budget()).to_json(), setup=no_charts),
+        Case('create_opex_chart', lambda: tools.chart('opex', tools.get_opex_breakdown(month)).to_json(), setup=no_charts),
+        Case('append', lambda: quiet(tools.append, actuals=appended)),
+        Case('refresh', lambda: quiet(tools.refresh), setup=grow_csv),
+    ]
+    found += [Case(f'answer_question[{name}]', lambda q=question: planner.answer_question(q))
+              for name, question in asked.items()]
+    found.append(Case('answer_questions', lambda: planner.answer_questions(list(asked.values()))))
+    if importlib.util.find_spec('kaleido') is not None:
+        # A fresh report without the image cache, so every run renders its charts
+        found.append(Case('export_summary_pdf', lambda: report.SummaryReport(tools, cache=None).build(), setup=no_charts))
+    return found
+
+
+def run_size(name, shape, repeat, only=None):
+    """Generate one ledger shape and time every case on it"""
+    frames = generate(**shape)
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory, frames)
+        tools = quiet(FinanceTools, fixtures_dir=directory)
+        results = {}
+        for case in cases(directory, tools, frames):
+            if only and not any(pattern in case.name for pattern in only):
+                continue
+            results[case.name] = case.run(repeat)
+            print(f"{name:8s} {case.name:34s} {results[case.name]['median'] * 1000:10.2f} ms")
+        if 'export_summary_pdf' not in results and (not only or any('export' in p for p in only)):
+            print(f"{name:8s} {'export_summary_pdf':34s}    skipped (Kaleido not installed)")
+    return {"shape": shape, "rows": len(frames['actuals']), "cases": results}
+
+
+def metadata():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True,
+                                  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        "commit": git('rev-parse', 'HEAD'),
+        "dirty": bool(git('status', '--porcelain', '--untracked-files=no')),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold=0.25, min_delta=0.0005):
+    """(rows, regressions) comparing the median of every case present in both result sets"""
+    rows, regressions = [], []
+    for size, result in current['sizes'].items():
+        before = baseline['sizes'].get(size, {}).get('cases', {})
+        for case, timing in result['cases'].items():
+            if case not in before:
+                continue
+            old, new = before[case]['median'], timing['median']
+            ratio = new / old if old else float('inf')
+            regressed = ratio > 1 + threshold and new - old > min_delta
+            rows.append((size, case, old, new, ratio, regressed))
+            if regressed:
+                regressions.append((size, case))
+    return rows, regressions
+
+
+def report_comparison(baseline, current, threshold, min_delta):
+    rows, regressions = compare(baseline, current, threshold, min_delta)
+    print(f"baseline {(baseline['meta'].get('commit') or '?')[:10]}  vs  current {(current['meta'].get('commit') or '?')[:10]}")
+    for size, case, old, new, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{size:8s} {case:34s} {old * 1000:10.2f} ms -> {new * 1000:10.2f} ms  {ratio:6.2f}x{flag}")
+    if regressions:
+        print(f"{len(regressions)} case(s) more than {threshold:.0%} slower than the baseline")
+    else:
+        print(f"No regressions past {threshold:.0%} in {len(rows)} cases")
+    return 1 if regressions else 0
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SIZES))
+    parser.add_argument('--entities', type=int, help="custom shape instead of --sizes")
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--currencies', type=int, default=3)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--rows-per-cell', type=int, default=1)
+    parser.add_argument('--cases', nargs='+', help="only cases whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help="results file to compare this run against")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="compare two results files and exit")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown of the median (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    min_delta = args.min_delta_ms / 1000
+
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+        sys.exit(report_comparison(baseline, current, args.threshold, min_delta))
+
+    if args.entities:
+        shapes = {'custom': dict(entities=args.entities, accounts=args.accounts, currencies=args.currencies,
+                                 years=args.years, rows_per_cell=args.rows_per_cell)}
+    else:
+        shapes = {name: SIZES[name] for name in args.sizes}
+
+    results = {"meta": metadata(), "repeat": args.repeat,
+               "sizes": {name: run_size(name, shape, args.repeat, args.cases) for name, shape in shapes.items()}}
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        sys.exit(report_comparison(load_results(args.baseline), results, args.threshold, min_delta))
+
+
+if __name__ == '__main__':
+    main()
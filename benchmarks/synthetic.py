@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'SEK']
+BASE_RATES = {'USD': 1.0, 'EUR': 1.09, 'GBP': 1.27, 'JPY': 0.0068, 'CAD': 0.74, 'AUD': 0.66, 'CHF': 1.12, 'SEK': 0.095}
+
+
+def account_names(accounts):
+    """Revenue and COGS plus enough Opex:* accounts to reach the requested count"""
+    names = ['Revenue', 'COGS']
+    names += [f'Opex:Dept{i:03d}' for i in range(max(accounts - 2, 1))]
+    return names[:max(accounts, 3)]
+
+
+def generate(entities=2, accounts=6, currencies=2, years=3, rows_per_cell=1, seed=0, start='2023-01'):
+    """Generate actuals/budget/cash/fx frames in the fixture schemas"""
+    rng = np.random.default_rng(seed)
+    months = pd.period_range(start=start, periods=12 * years, freq='M').strftime('%Y-%m').to_numpy()
+    entity_names = np.array(['ParentCo'] + [f'Entity{i:03d}' for i in range(1, entities)])
+    currency_names = (CURRENCIES * (currencies // len(CURRENCIES) + 1))[:currencies]
+    entity_currency = np.array([currency_names[i % currencies] for i in range(entities)])
+    categories = np.array(account_names(accounts))
+
+    # Cell-level base amounts: revenue large, COGS ~15%, each Opex account a slice of the rest
+    base = np.where(categories == 'Revenue', 400000.0, np.where(categories == 'COGS', 60000.0, 250000.0 / max(len(categories) - 2, 1)))
+
+    n_m, n_e, n_c = len(months), len(entity_names), len(categories)
+    m, e, c, _ = np.meshgrid(np.arange(n_m), np.arange(n_e), np.arange(n_c), np.arange(rows_per_cell), indexing='ij')
+    m, e, c = m.ravel(), e.ravel(), c.ravel()
+
+    growth = 1.0 + 0.01 * m
+    fx_scale = np.array([1.0 / BASE_RATES.get(cur, 1.0) for cur in entity_currency])[e]
+
+    def ledger(noise):
+        amount = base[c] * growth * fx_scale * rng.normal(1.0, noise, size=len(m)) / rows_per_cell
+        return pd.DataFrame({
+            'month': months[m],
+            'entity': entity_names[e],
+            'account_category': categories[c],
+            'amount': np.round(amount, 2),
+            'currency': entity_currency[e],
+        })
+
+    actuals = ledger(0.08)
+    budget = ledger(0.02)
+
+    cash = pd.DataFrame({
+        'month': months,
+        'entity': 'Consolidated',
+        'cash_usd': np.round(6000000.0 * entities - 50000.0 * entities * np.arange(n_m), 2),
+    })
+
+    fx_rows = []
+    for currency in currency_names:
+        drift = np.cumsum(rng.normal(0.0, 0.005, size=n_m)) if currency != 'USD' else np.zeros(n_m)
+        fx_rows.append(pd.DataFrame({
+            'month': months,
+            'currency': currency,
+            'rate_to_usd': np.round(BASE_RATES.get(currency, 1.0) * (1.0 + drift), 6),
+        }))
+    fx = pd.concat(fx_rows, ignore_index=True)
+
+    return {'actuals': actuals, 'budget': budget, 'cash': cash, 'fx': fx}
+
+
+def generate_rows(rows, entities=2, accounts=6, currencies=2, years=3, seed=0):
+    """Generate a dataset whose actuals/budget have roughly the requested number of rows"""
+    cells = 12 * years * entities * max(accounts, 3)
+    return generate(entities, accounts, currencies, years, rows_per_cell=max(rows // cells, 1), seed=seed)
+
+
+def write_fixtures(directory, frames):
+    """Write generated frames as <name>.csv into directory"""
+    os.makedirs(directory, exist_ok=True)
+    for name, df in frames.items():
+        df.to_csv(os.path.join(directory, f'{name}.csv'), index=False)
+    return directory
+
+
+def write_large_fixtures(directory, target_bytes, entities=4, accounts=12, currencies=3, years=3, block_rows=1000000):
+    """Write fixtures whose actuals/budget CSVs reach target_bytes, appending one block at a time"""
+    os.makedirs(directory, exist_ok=True)
+    cells = 12 * years * entities * max(accounts, 3)
+    rows_per_cell = max(block_rows // cells, 1)
+
+    seed = 0
+    while True:
+        frames = generate(entities, accounts, currencies, years, rows_per_cell=rows_per_cell, seed=seed)
+        for name in ('actuals', 'budget'):
+            path = os.path.join(directory, f'{name}.csv')
+            frames[name].to_csv(path, mode='a' if seed else 'w', header=not seed, index=False)
+        if seed == 0:
+            for name in ('cash', 'fx'):
+                frames[name].to_csv(os.path.join(directory, f'{name}.csv'), index=False)
+        seed += 1
+        if os.path.getsize(os.path.join(directory, 'actuals.csv')) >= target_bytes:
+            return directory
+
+
+def write_partitioned(directory, frames, keys=('entity', 'month')):
+    """Write generated frames with actuals/budget split into <name>/entity=X/month=YYYY-MM.csv partitions
+
+    Partition key columns are left out of the files, as ERP exports named by their keys do.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, df in frames.items():
+        if name not in ('actuals', 'budget'):
+            df.to_csv(os.path.join(directory, f'{name}.csv'), index=False)
+            continue
+        for values, part in df.groupby(list(keys), sort=True):
+            *dirs, file = [f'{key}={value}' for key, value in zip(keys, values)]
+            path = os.path.join(directory, name, *dirs)
+            os.makedirs(path, exist_ok=True)
+            part.drop(columns=list(keys)).to_csv(os.path.join(path, f'{file}.csv'), index=False)
+    return directory
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+from agent.accounts import AccountIndex
+from agent.cube import LedgerCube
+from agent.tools import FinanceTools
+
+CATEGORIES = ['COGS', 'Deferred Revenue Adj', 'Opex:Admin', 'Opex:R&D', 'Opex:R&D:Cloud', 'Revenue', 'Revenue:Services']
+
+def test_nodes_cover_every_prefix():
+    index = AccountIndex(CATEGORIES)
+    assert 'Opex' in index.nodes and 'Opex:R&D' in index.nodes
+    assert index.nodes[index.parents[index.code('Opex:R&D:Cloud')]] == 'Opex:R&D'
+    # Case-insensitive, and the old 'Opex:' pattern still names the Opex node
+    assert index.code('opex:') == index.code('Opex')
+    assert list(index.positions('Opex')) == [2, 3, 4]
+    assert index.select('Opex') == slice(2, 5)
+    assert index.code('Marketing') == -1
+
+def test_name_containing_a_metric_is_not_that_metric():
+    # The substring filter counted 'Deferred Revenue Adj' as revenue
+    index = AccountIndex(CATEGORIES)
+    assert [CATEGORIES[i] for i in index.positions('Revenue')] == ['Revenue', 'Revenue:Services']
+
+def test_rollup_at_each_level():
+    df = pd.DataFrame({
+        'month': ['2024-01'] * len(CATEGORIES),
+        'entity': ['ParentCo'] * len(CATEGORIES),
+        'account_category': CATEGORIES,
+        'amount_usd': [1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0],
+    })
+    cube = LedgerCube.from_frame(df)
+    assert cube.rollup(1).to_dict() == {'COGS': 1.0, 'Deferred Revenue Adj': 2.0, 'Opex': 28.0, 'Revenue': 96.0}
+    assert cube.rollup(2)['Opex:R&D'] == 24.0
+    assert cube.total('Revenue') == 96.0
+
+def test_tools_rollup_matches_metrics():
+    tools = FinanceTools(fixtures_dir='fixtures')
+    rollup = tools.get_account_rollup(1, month='2024-02').set_index('account')['amount_usd']
+    ebitda = tools.get_ebitda('2024-02')
+    assert rollup['Opex'] == pytest.approx(ebitda['opex'])
+    assert rollup['Revenue'] == pytest.approx(ebitda['revenue'])
@@ -0,0 +1,82 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from agent.anomalies import MAD_SCALE, AnomalyDetector, trailing_median
+from agent.intent import IntentParser
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+@pytest.fixture
+def spiked(tmp_path):
+    # EMEA marketing spend five times its usual level in June 2024
+    shutil.copytree('fixtures', tmp_path / 'fixtures')
+    path = tmp_path / 'fixtures' / 'actuals.csv'
+    actuals = pd.read_csv(path)
+    row = (actuals['month'] == '2024-06') & (actuals['entity'] == 'EMEA') & (actuals['account_category'] == 'Opex:Marketing')
+    actuals.loc[row, 'amount'] *= 5
+    actuals.to_csv(path, index=False)
+    return FinanceTools(fixtures_dir=str(tmp_path / 'fixtures'))
+
+def test_trailing_median_matches_series_loop():
+    rng = np.random.default_rng(0)
+    series = rng.normal(100, 10, (30, 4))
+    series[:8, 1] = np.nan  # a series that starts later
+    rows = np.arange(30)
+    center, scale = trailing_median(series, rows, window=12, min_history=6)
+    for col in range(series.shape[1]):
+        for row in rows:
+            window = series[max(0, row - 12):row, col]
+            window = window[~np.isnan(window)]
+            if len(window) < 6:
+                assert np.isnan(center[row, col]) and np.isnan(scale[row, col])
+                continue
+            median = np.median(window)
+            assert center[row, col] == pytest.approx(median)
+            assert scale[row, col] == pytest.approx(np.median(np.abs(window - median)) * MAD_SCALE)
+
+def test_fixtures_have_no_outliers(tools):
+    assert tools.get_anomalies().empty
+    assert tools.get_anomalies(month=('2023-01', '2025-12')).empty
+    # Every series and month is scored; the first months have no history to compare with
+    rows, columns, expected, z_history, z_budget = tools.anomalies().scores(('2023-01', '2025-12'))
+    assert z_history.shape == (36, len(tools.actuals_cube.entities) * len(tools.actuals_cube.categories))
+    posted = tools.actuals_cube.counts.reshape(36, -1).any(axis=0)
+    assert np.isnan(z_history[:6]).all()
+    assert (np.isfinite(z_history[6:]).all(axis=0) == posted).all()
+
+def test_spike_is_ranked_first(spiked):
+    data = spiked.get_anomalies(month='2024-06')
+    top = data.iloc[0]
+    assert (top['month'], top['entity'], top['account']) == ('2024-06', 'EMEA', 'Opex:Marketing')
+    assert top['z_history'] > 3.5 and top['z_budget'] > 3.5
+    assert top['actual'] > 4 * top['expected']
+    # Scoped to another entity or account it is not there
+    assert spiked.get_anomalies(month='2024-06', entity='ParentCo').empty
+    assert spiked.get_anomalies(month='2024-06', account='Revenue').empty
+    # Over the whole history it is still the top cell
+    assert spiked.get_anomalies(month=('2023-01', '2025-12'), n=1)['month'].tolist() == ['2024-06']
+
+def test_planner_routes_anomaly_questions(spiked):
+    intent = IntentParser(*spiked.dimensions()).parse("Anything unusual in June 2024?")
+    assert (intent.metric, intent.month, intent.anomaly, intent.scope) == ('anomalies', '2024-06', True, None)
+
+    answer = CFOPlanner(spiked, cache=None).answer_question("Anything unusual in June 2024?")
+    assert answer["text"].startswith("**Unusual Amounts for 2024-06:**")
+    assert "1. EMEA Opex:Marketing (2024-06)" in answer["text"]
+    assert answer["chart"].kind == 'anomalies'
+
+    answer = CFOPlanner(spiked, cache=None).answer_question("Any revenue anomalies in June 2024?")
+    assert answer["text"].startswith("No unusual amounts found for 2024-06")
+    assert answer["chart"] is None
+
+def test_cubes_must_be_aligned(tools):
+    budget = tools.budget_cube.copy()
+    budget.extend(months=['2026-01'])
+    with pytest.raises(ValueError):
+        AnomalyDetector(tools.actuals_cube, budget)
@@ -0,0 +1,103 @@
+import os
+import shutil
+import pytest
+import pandas as pd
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def fixtures_dir(tmp_path):
+    path = tmp_path / 'fixtures'
+    shutil.copytree('fixtures', path, ignore=shutil.ignore_patterns('.cache'))
+    return str(path)
+
+NEW_ACTUALS = pd.DataFrame({
+    'month': ['2026-01', '2026-01', '2026-01', '2025-12'],
+    'entity': ['ParentCo', 'ParentCo', 'EMEA', 'ParentCo'],
+    'account_category': ['Revenue', 'COGS', 'Opex:Sales', 'Revenue'],
+    'amount': [400000.0, 60000.0, 25000.0, 1000.0],
+    'currency': ['USD', 'USD', 'EUR', 'USD'],
+})
+
+def append_csv(path, df):
+    # Complete lines only: a line without its newline may still be being written
+    with open(path, 'a') as f:
+        f.write('\n' + df.to_csv(index=False, header=False).strip() + '\n')
+
+def assert_same_metrics(tools, fresh):
+    pd.testing.assert_frame_equal(tools.get_revenue_vs_budget(), fresh.get_revenue_vs_budget())
+    pd.testing.assert_frame_equal(tools.get_gross_margin_trend(), fresh.get_gross_margin_trend())
+    pd.testing.assert_frame_equal(tools.get_opex_breakdown().reset_index(drop=True), fresh.get_opex_breakdown().reset_index(drop=True))
+    assert tools.get_ebitda('2026-01') == pytest.approx(fresh.get_ebitda('2026-01'))
+    assert tools.calculate_cash_runway() == fresh.calculate_cash_runway()
+
+def test_append_updates_only_new_months(fixtures_dir):
+    tools = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    version = tools.data_version
+
+    touched = tools.append(actuals=NEW_ACTUALS)
+    assert touched == ['2025-12', '2026-01']
+    assert tools.data_version != version
+    assert tools.get_ebitda('2026-01')['revenue'] == 400000
+
+    append_csv(f'{fixtures_dir}/actuals.csv', NEW_ACTUALS)
+    assert_same_metrics(tools, FinanceTools(fixtures_dir=fixtures_dir, use_cache=False))
+
+def test_new_fx_rates_reaggregate_affected_months(fixtures_dir):
+    tools = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    fx = pd.DataFrame({'month': ['2025-12'], 'currency': ['EUR'], 'rate_to_usd': [1.2]})
+
+    # Later rows win, so this replaces the December EUR rate
+    assert tools.append(fx=fx) == ['2025-12']
+    append_csv(f'{fixtures_dir}/fx.csv', fx)
+    assert_same_metrics(tools, FinanceTools(fixtures_dir=fixtures_dir, use_cache=False))
+
+def test_refresh_picks_up_appended_rows(fixtures_dir):
+    tools = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    append_csv(f'{fixtures_dir}/actuals.csv', NEW_ACTUALS)
+    append_csv(f'{fixtures_dir}/cash.csv', pd.DataFrame({'month': ['2026-01'], 'entity': ['Consolidated'], 'cash_usd': [1.0]}))
+
+    assert tools.refresh() == ['2025-12', '2026-01']
+    assert tools.refresh() == []
+    fresh = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    assert tools.data_version == fresh.data_version
+    assert_same_metrics(tools, fresh)
+
+def test_initial_offsets_are_the_bytes_parsed(fixtures_dir):
+    # CSV, Feather cache build, Feather cache hit, streaming
+    for kwargs in ({'use_cache': False}, {}, {}, {'use_cache': False, 'streaming': True}):
+        tools = FinanceTools(fixtures_dir=fixtures_dir, **kwargs)
+        for name in ('actuals', 'budget', 'cash', 'fx'):
+            assert tools.offsets[name] == os.path.getsize(f'{fixtures_dir}/{name}.csv')
+
+def test_refresh_waits_for_complete_lines(fixtures_dir):
+    tools = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    path = f'{fixtures_dir}/actuals.csv'
+    offset = tools.offsets['actuals']
+    with open(path, 'a') as f:
+        f.write('\n2026-02,ParentCo,Reve')
+    assert tools.refresh() == []
+    # The partial line is not consumed; the blank line before it is
+    assert tools.offsets['actuals'] == offset + 1
+
+    with open(path, 'a') as f:
+        f.write('nue,1000.0,USD\n')
+    assert tools.refresh() == ['2026-02']
+    assert tools.get_ebitda('2026-02')['revenue'] == 1000
+    assert tools.offsets['actuals'] == os.path.getsize(path)
+
+def test_failed_refresh_keeps_offsets(fixtures_dir, monkeypatch):
+    tools = FinanceTools(fixtures_dir=fixtures_dir, use_cache=False)
+    offsets = dict(tools.offsets)
+    append_csv(f'{fixtures_dir}/actuals.csv', NEW_ACTUALS)
+
+    def fail(**kwargs):
+        raise RuntimeError('append failed')
+    monkeypatch.setattr(tools, 'append', fail)
+    with pytest.raises(RuntimeError):
+        tools.refresh()
+    assert tools.offsets == offsets
+
+    # Nothing was lost: the next refresh ingests the same rows
+    monkeypatch.undo()
+    assert tools.refresh() == ['2025-12', '2026-01']
+    assert tools.get_ebitda('2026-01')['revenue'] == 400000
@@ -0,0 +1,36 @@
+import json
+import pytest
+from agent.charts import LazyChart
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+QUESTIONS = [
+    "What was February 2024 revenue vs budget in USD?",
+    "Show gross margin % trend for last 3 months",
+    "Break down Opex by category for February 2024",
+    "What is our EBITDA for Q1 2024?",
+    "What is our cash runway right now?",
+    "Opex YTD 2024",
+    "ebitda february 2024",
+    "What was February 2024 revenue vs budget in USD?",
+]
+
+def test_batch_matches_individual_answers(tools):
+    planner = CFOPlanner(tools, cache=None)
+    batch = planner.answer_questions(QUESTIONS)
+
+    assert len(batch) == len(QUESTIONS)
+    for question, answer in zip(QUESTIONS, batch):
+        single = planner.answer_question(question)
+        assert answer['text'] == single['text']
+        # Charts are deferred until asked for
+        if single['chart'] is None:
+            assert answer['chart'] is None
+        else:
+            assert isinstance(answer['chart'], LazyChart)
+            assert answer['chart'].key == single['chart'].key
+            assert json.loads(answer['chart'].figure().to_json()) == json.loads(single['chart'].to_json())
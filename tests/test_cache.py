@@ -0,0 +1,59 @@
+import pytest
+from agent.cache import ResponseCache
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_repeated_question_is_served_from_cache(tools):
+    cache = ResponseCache()
+    planner = CFOPlanner(tools, cache=cache)
+
+    first = planner.answer_question("What is our EBITDA for February 2024?")
+    # Same intent, different wording
+    second = planner.answer_question("ebitda february 2024")
+
+    assert first == second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_new_data_version_invalidates_entries(tools):
+    cache = ResponseCache()
+    planner = CFOPlanner(tools, cache=cache)
+    planner.answer_question("What is our cash runway right now?")
+
+    tools.publish(tools.snapshot.copy('reloaded'))
+    planner.answer_question("What is our cash runway right now?")
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['entries'] == 1
+
+def test_readers_on_an_older_version_keep_newer_entries():
+    cache = ResponseCache()
+    cache.put('v1', 'a', 1)
+    cache.put('v2', 'a', 2)
+    assert cache.get('v1', 'a') is None
+    # A reader still pinned to v1 interleaves with readers of v2
+    cache.put('v1', 'b', 3)
+    cache.put('v2', 'c', 4)
+    cache.put('v1', 'd', 5)
+    assert [cache.get('v2', 'a'), cache.get('v2', 'c'), cache.get('v1', 'b'), cache.get('v1', 'd')] == [2, 4, 3, 5]
+    # A version seen for the first time drops both
+    cache.put('v3', 'e', 6)
+    assert cache.stats()['entries'] == 1
+
+def test_evicts_least_recently_used_by_size_and_expires_by_ttl():
+    now = [0.0]
+    cache = ResponseCache(max_bytes=400, ttl=10, clock=lambda: now[0])
+    cache.put('v1', 'a', 'x' * 100)
+    cache.put('v1', 'b', 'y' * 100)
+    cache.get('v1', 'a')
+    cache.put('v1', 'c', 'z' * 100)
+
+    assert cache.get('v1', 'b') is None
+    assert cache.get('v1', 'a') is not None
+    assert cache.stats()['evictions'] == 1
+
+    now[0] = 11.0
+    assert cache.get('v1', 'a') is None
@@ -0,0 +1,36 @@
+import json
+import pytest
+from agent.cache import ResponseCache
+from agent.charts import LazyChart
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_chart_is_built_once_per_type_and_data(tools):
+    cache = ResponseCache()
+    builds = []
+    def builder(data):
+        builds.append(1)
+        return tools.create_revenue_chart(data)
+
+    data = tools.get_revenue_vs_budget()
+    first = LazyChart('revenue', builder, data, cache=cache)
+    # Nothing is built until the chart is displayed
+    assert builds == []
+
+    spec = first.to_json()
+    again = LazyChart('revenue', builder, data.copy(), cache=cache)
+    assert again.to_json() == spec
+    assert json.loads(again.figure().to_json()) == json.loads(spec)
+    assert len(builds) == 1
+
+    # Same data under a different chart type is a different entry
+    LazyChart('margin', builder, data, cache=cache).to_json()
+    assert len(builds) == 2
+
+def test_tools_return_lazy_specs(tools):
+    chart = tools.chart('opex', tools.get_opex_breakdown('2024-02'))
+    assert chart.key[0] == 'opex'
+    assert chart.figure().data[0].type == 'pie'
@@ -0,0 +1,38 @@
+import pytest
+from agent.consolidation import CONSOLIDATED, ELIMINATIONS, EliminationRule
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_entities_add_up_to_consolidated(tools):
+    metrics = tools.get_entity_metrics('2024-03')
+    assert set(metrics.index) == {'ParentCo', 'EMEA', CONSOLIDATED}
+    entities = metrics.drop(index=CONSOLIDATED)
+    assert entities['ebitda'].sum() == pytest.approx(metrics.loc[CONSOLIDATED, 'ebitda'])
+    assert metrics.loc[CONSOLIDATED, 'ebitda'] == pytest.approx(tools.get_ebitda('2024-03')['ebitda'])
+    # Same numbers as filtering the per-metric tools by entity
+    assert metrics.loc['EMEA', 'ebitda'] == pytest.approx(tools.get_ebitda('2024-03', entity='EMEA')['ebitda'])
+
+def test_eliminations_only_affect_the_consolidated_total(tools):
+    eliminated = FinanceTools(fixtures_dir='fixtures', eliminations=[EliminationRule('Opex:Admin', ('EMEA',))])
+    emea_admin = tools.get_opex_breakdown('2024-03', entity='EMEA').set_index('category')['amount_usd']['Opex:Admin']
+
+    assert eliminated.get_ebitda('2024-03', entity='EMEA') == tools.get_ebitda('2024-03', entity='EMEA')
+    assert eliminated.get_ebitda('2024-03')['opex'] == pytest.approx(tools.get_ebitda('2024-03')['opex'] - emea_admin)
+    assert eliminated.get_entity_metrics('2024-03').loc[ELIMINATIONS, 'opex'] == pytest.approx(-emea_admin)
+    # Eliminations add no rows
+    assert eliminated.get_data_summary()['actuals']['rows'] == tools.get_data_summary()['actuals']['rows']
+
+def test_planner_answers_for_an_entity(tools):
+    planner = CFOPlanner(tools, cache=None)
+    answer = planner.answer_question("EMEA EBITDA for March 2024")
+    ebitda = tools.get_ebitda('2024-03', entity='EMEA')['ebitda']
+    assert answer['text'].startswith("**EBITDA Analysis for EMEA 2024-03:**")
+    assert f"EBITDA: ${ebitda:,.0f}" in answer['text']
+
+    drill_down = planner.answer_question("EBITDA by entity for March 2024")
+    assert "EMEA:" in drill_down['text'] and "Consolidated:" in drill_down['text']
+    assert drill_down['chart'].key[0] == 'entity'
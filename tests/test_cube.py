@@ -0,0 +1,59 @@
+import pytest
+import pandas as pd
+from agent.cube import LedgerCube
+from agent.ledger import month_code
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_cubes_share_axes_with_categorical_frame(tools):
+    # Actuals and budget cubes are aligned on the same month/entity/category axes
+    assert tools.actuals_cube.shape == tools.budget_cube.shape
+    assert list(tools.actuals_cube.months) == list(tools.budget_cube.months)
+
+    frame = tools.actuals_cube.to_frame()
+    for col in ['month', 'entity', 'account_category']:
+        assert isinstance(frame[col].dtype, pd.CategoricalDtype)
+    assert frame['rows'].sum() == tools.actuals['rows'].sum()
+
+def test_ebitda_matches_row_level_conversion(tools):
+    # Cube totals agree with converting and summing the raw rows
+    usd = tools.convert_to_usd(pd.read_csv('fixtures/actuals.csv'))
+    usd = usd[usd['month'] == month_code('2024-02')]
+    revenue = usd[usd['account_category'].str.contains('Revenue')]['amount_usd_cents'].sum() / 100
+    opex = usd[usd['account_category'].str.contains('Opex:')]['amount_usd_cents'].sum() / 100
+
+    ebitda = tools.get_ebitda('2024-02')
+    assert abs(ebitda['revenue'] - revenue) < 0.01
+    assert abs(ebitda['opex'] - opex) < 0.01
+
+def test_unknown_month_returns_zero_totals(tools):
+    ebitda = tools.get_ebitda('1999-01')
+    assert ebitda['revenue'] == 0
+    assert tools.get_opex_breakdown('1999-01').empty
+
+def test_streaming_matches_eager_load(tools):
+    # Chunked ingestion folds into the same aggregates as loading every row
+    streamed = FinanceTools(fixtures_dir='fixtures', streaming=True, chunksize=50)
+    assert streamed.actuals.empty
+    assert streamed.get_data_summary()['actuals']['rows'] == tools.actuals['rows'].sum()
+
+    pd.testing.assert_frame_equal(streamed.get_revenue_vs_budget(), tools.get_revenue_vs_budget())
+    pd.testing.assert_frame_equal(streamed.get_gross_margin_trend(3), tools.get_gross_margin_trend(3))
+    pd.testing.assert_frame_equal(streamed.get_opex_breakdown('2024-02'), tools.get_opex_breakdown('2024-02'))
+    assert streamed.calculate_cash_runway() == pytest.approx(tools.calculate_cash_runway())
+
+def test_blank_amounts_are_skipped():
+    # A NaN amount must not turn its whole cell (and every total over it) into NaN
+    rows = pd.DataFrame({
+        'month': ['2024-01', '2024-01', '2024-02'],
+        'entity': ['EMEA', 'EMEA', 'EMEA'],
+        'account_category': ['Opex:Admin'] * 3,
+        'amount_usd': [100.0, float('nan'), 50.0],
+    })
+    cube = LedgerCube.from_frame(rows)
+    assert cube.total('Opex:', '2024-01') == 100.0
+    assert cube.total('Opex:') == 150.0
+    assert cube.counts.sum() == 3
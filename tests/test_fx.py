@@ -0,0 +1,38 @@
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+from agent.fx import FXEngine
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def fx():
+    return pd.read_csv('fixtures/fx.csv')
+
+def test_exact_rates_match_fx_table(fx):
+    engine = FXEngine(fx)
+    rates, fallback = engine.lookup(fx['month'], fx['currency'])
+    assert np.allclose(rates, fx['rate_to_usd'])
+    assert not fallback.any()
+
+def test_missing_month_uses_last_known_rate(fx):
+    # EUR rows for a month whose rate has not been posted yet
+    engine = FXEngine(fx[~((fx['currency'] == 'EUR') & (fx['month'] == '2025-12'))])
+    nov = fx[(fx['currency'] == 'EUR') & (fx['month'] == '2025-11')]['rate_to_usd'].iloc[0]
+
+    usd, fallback = engine.convert([100.0, 100.0, 100.0], ['2025-12', '2026-02', '2025-12'], ['EUR', 'EUR', 'USD'])
+    assert usd[0] == pytest.approx(100 * nov)
+    assert usd[1] == pytest.approx(100 * nov)
+    assert usd[2] == 100.0
+    assert list(fallback) == [True, True, False]
+
+def test_tools_report_fx_fallbacks(tmp_path):
+    shutil.copytree('fixtures', tmp_path / 'fixtures', ignore=shutil.ignore_patterns('.cache'))
+    fx_path = tmp_path / 'fixtures' / 'fx.csv'
+    fx = pd.read_csv(fx_path)
+    fx[~((fx['currency'] == 'EUR') & (fx['month'] == '2024-02'))].to_csv(fx_path, index=False)
+
+    tools = FinanceTools(fixtures_dir=str(tmp_path / 'fixtures'))
+    used = tools.fx_fallbacks.set_index(['dataset', 'month', 'currency'])['rows']
+    assert used[('actuals', '2024-02', 'EUR')] == 5
+    assert tools.get_ebitda('2024-02')['revenue'] > 0
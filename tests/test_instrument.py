@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+from agent.instrument import Instruments, count, instruments, stage, tracing
+from agent.ledger import month_code
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_stages_and_counters_are_no_ops_outside_a_trace():
+    with stage('aggregate'):
+        count('rows_scanned', 10)
+    assert not tracing()
+
+def test_question_trace(tools):
+    planner = CFOPlanner(tools, cache=None)
+    planner.answer_question("Break down Opex by category for February 2024")
+    record = instruments.recent[-1]
+
+    assert record['kind'] == 'question' and record['metric'] == 'opex'
+    assert {'parse', 'filter', 'aggregate'} <= set(record['stages'])
+    assert sum(record['stages'].values()) <= record['seconds']
+    # Rows behind the February opex cells
+    february = tools.actuals[(tools.actuals['month'] == month_code('2024-02')) & tools.actuals['account_category'].str.startswith('Opex')]
+    assert record['rows_scanned'] == february['rows'].sum()
+
+def test_nested_traces_fold_into_the_outer_one():
+    registry = Instruments()
+    with registry.trace('batch') as outer:
+        with registry.trace('question') as inner:
+            count('rows_scanned', 5)
+    assert inner is outer
+    assert registry.traces == {'batch': 1}
+    assert 'question' in outer.stages and outer.counters['rows_scanned'] == 5
+
+def test_prometheus_text():
+    registry = Instruments()
+    with registry.trace('question') as trace:
+        trace.fields['metric'] = 'ebitda'
+        with stage('aggregate'):
+            count('rows_scanned', 3)
+    text = registry.prometheus()
+    assert 'cfo_traces_total{kind="question"} 1' in text
+    assert 'cfo_trace_seconds_count{kind="question"} 1' in text
+    assert 'cfo_rows_scanned_total{kind="question"} 3' in text
+    assert 'cfo_questions_total{metric="ebitda"} 1' in text
+    assert '# TYPE cfo_trace_seconds histogram' in text
+
+def test_allocations_are_tracked():
+    registry = Instruments(track_allocations=True)
+    try:
+        with registry.trace('question') as trace:
+            data = np.ones(1_000_000)
+        assert trace.bytes_allocated >= data.nbytes
+    finally:
+        tracemalloc.stop()
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_slow_traces_dump_folded_stacks(tmp_path):
+    registry = Instruments(slow_ms=20, profile_dir=str(tmp_path))
+    with registry.trace('question') as fast:
+        pass
+    with registry.trace('question') as slow:
+        busy(0.1)
+
+    assert fast.profile is None
+    lines = open(slow.profile).read().splitlines()
+    stack, samples = lines[0].rsplit(' ', 1)
+    assert 'busy (test_instrument.py' in stack and int(samples) > 0
+    assert registry.slow['question'] == 1
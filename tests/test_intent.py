@@ -0,0 +1,60 @@
+import pytest
+from agent.intent import Intent, IntentParser
+
+@pytest.fixture
+def parser():
+    return IntentParser(entities=['ParentCo', 'EMEA'], latest_month='2025-06')
+
+@pytest.mark.parametrize("question, expected", [
+    ("What was February 2024 revenue vs budget in USD?", Intent('revenue', month='2024-02', comparison='budget')),
+    ("Show gross margin % trend for last 3 months", Intent('margin', last_n=3)),
+    ("Break down Opex by category for Feb 24", Intent('opex', month='2024-02')),
+    ("EMEA EBITDA for March 2024", Intent('ebitda', month='2024-03', entity='EMEA')),
+    ("What is our cash runway right now?", Intent('runway')),
+    ("EBITDA Q1 2024", Intent('ebitda', start='2024-01', end='2024-03', label='Q1 2024')),
+    ("Opex YTD", Intent('opex', start='2025-01', end='2025-06', label='YTD 2025')),
+    ("revenue year-over-year for 2024-03", Intent('revenue', month='2024-03', comparison='yoy')),
+    ("hello there", Intent('help')),
+    ("What drove the opex overrun in Q2 2024?", Intent('opex', start='2024-04', end='2024-06', label='Q2 2024', variance=True)),
+    ("Budget variance drivers", Intent('revenue', variance=True)),
+    ("What drove the variance?", Intent('variance', variance=True)),
+    ("Anything unusual this month?", Intent('anomalies', anomaly=True)),
+    ("Show opex outliers for March 2024", Intent('opex', month='2024-03', anomaly=True)),
+])
+def test_parse(parser, question, expected):
+    assert parser.parse(question) == expected
+
+@pytest.mark.parametrize("question, expected", [
+    ("EBITDA in 2023", Intent('ebitda', start='2023-01', end='2023-12', label='2023')),
+    ("Revenue variance for 2023", Intent('revenue', start='2023-01', end='2023-12', label='2023', variance=True)),
+    ("Opex from 2023 to 2024", Intent('opex', start='2023-01', end='2024-12', label='2023 to 2024')),
+    ("Revenue for Q2 of 2024", Intent('revenue', start='2024-04', end='2024-06', label='Q2 2024')),
+    # Years that belong to a month are not ranges of their own
+    ("EBITDA for March 2024", Intent('ebitda', month='2024-03')),
+])
+def test_bare_years_become_ranges(parser, question, expected):
+    assert parser.parse(question) == expected
+
+def test_ranges_become_periods(parser):
+    intent = parser.parse("EBITDA from Jan 2024 to Mar 2024")
+    assert intent.period == ('2024-01', '2024-03')
+    assert parser.parse("EBITDA for March 2024").period == '2024-03'
+
+def test_by_entity_drill_down(parser):
+    assert parser.parse("EBITDA by entity for March 2024") == Intent('ebitda', month='2024-03', by_entity=True)
+
+@pytest.mark.parametrize("question, assumption", [
+    ("What if revenue drops 50%?", (('revenue_growth', -0.5),)),
+    ("What if revenue grows 50%?", (('revenue_growth', 0.5),)),
+    ("What if opex rises 12.5% and the dollar strengthens 10%?", (('opex_growth', 0.125), ('fx_shock', -0.1))),
+    ("What if we hire 5 people a month?", (('hires', 5.0),)),
+    ("What if we lay off 3 engineers?", (('hires', -3.0),)),
+    # No direction, no amount or no driver: not understood
+    ("What if revenue changes 10%?", None),
+    ("What if costs drop?", None),
+    ("What if it rains?", None),
+])
+def test_what_if_assumptions(parser, question, assumption):
+    intent = parser.parse(question)
+    assert intent.scenario and intent.what_if
+    assert intent.assumption == assumption
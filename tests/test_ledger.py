@@ -0,0 +1,62 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from agent.cube import LedgerCube
+from agent.ledger import compact_ledger, decode_months, encode_months, month_code, readable
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def lines(n, amount=0.1, month='2024-02', account='Opex:Admin'):
+    return pd.DataFrame({'month': [month] * n, 'entity': ['US'] * n, 'account_category': [account] * n,
+                         'amount': [amount] * n, 'currency': ['USD'] * n})
+
+def test_month_codes_round_trip():
+    codes = encode_months(pd.Series(['2024-02', '1970-01', None, '2024-02']))
+    assert codes.dtype == np.int16
+    assert list(codes[:2]) == [month_code('2024-02'), 0]
+    assert list(decode_months(codes[:2])) == ['2024-02', '1970-01']
+
+def test_lines_collapse_to_exact_cents():
+    ledger = compact_ledger(pd.concat([lines(10), lines(3, 2.5, account='Revenue'), lines(1, month=None)]))
+    assert len(ledger) == 2 and ledger['rows'].tolist() == [10, 3]
+    assert ledger['amount_cents'].tolist() == [100, 750]
+    assert readable(ledger)['month'].tolist() == ['2024-02', '2024-02']
+
+    # Ten lines of 0.10 sum to exactly 1.00
+    cube = LedgerCube.from_frame(ledger, amount_col='amount_cents')
+    assert cube.total('Opex') == 1.0 and cube.counts.sum() == 13
+
+def test_tools_hold_compact_ledgers(tools):
+    raw = pd.read_csv('fixtures/actuals.csv')
+    actuals = tools.actuals
+    assert actuals['month'].dtype == np.int16 and actuals['amount_cents'].dtype == np.int64
+    assert all(isinstance(actuals[col].dtype, pd.CategoricalDtype) for col in ('entity', 'account_category', 'currency'))
+    assert actuals['rows'].sum() == len(raw)
+    assert actuals['amount_cents'].sum() == np.rint(raw['amount'] * 100).sum()
+
+def test_appended_keys_stay_dictionary_encoded(tools):
+    tools.append(actuals=lines(2, 50.0, month='2026-01', account='Opex:Travel'))
+    actuals = tools.actuals
+    assert isinstance(actuals['account_category'].dtype, pd.CategoricalDtype)
+    assert 'Opex:Travel' in actuals['account_category'].cat.categories
+    assert tools.get_opex_breakdown('2026-01').set_index('category')['amount_usd']['Opex:Travel'] == 100.0
+
+def test_blank_amounts_count_as_zero(tmp_path):
+    ledger = compact_ledger(pd.concat([lines(2), lines(1, float('nan'))]))
+    assert ledger['amount_cents'].tolist() == [20] and ledger['rows'].tolist() == [3]
+
+    # A blank amount cell in the CSV drops out of the totals instead of overflowing them
+    path = tmp_path / 'fixtures'
+    shutil.copytree('fixtures', path, ignore=shutil.ignore_patterns('.cache'))
+    opex = FinanceTools(fixtures_dir=str(path), use_cache=False).get_ebitda('2023-01')['opex']
+    actuals = pd.read_csv(path / 'actuals.csv')
+    row = (actuals['month'] == '2023-01') & (actuals['entity'] == 'ParentCo') & (actuals['account_category'] == 'Opex:Marketing')
+    assert actuals.loc[row, 'amount'].tolist() == [76000]
+    actuals.loc[row, 'amount'] = None
+    actuals.to_csv(path / 'actuals.csv', index=False)
+    assert FinanceTools(fixtures_dir=str(path), use_cache=False).get_ebitda('2023-01')['opex'] == pytest.approx(opex - 76000)
@@ -0,0 +1,39 @@
+import os
+import shutil
+import pytest
+import pandas as pd
+from agent import loader
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def fixtures_dir(tmp_path):
+    # Private copy of the fixtures so the cache and sources can be modified
+    path = tmp_path / 'fixtures'
+    shutil.copytree('fixtures', path, ignore=shutil.ignore_patterns('.cache'))
+    return str(path)
+
+def test_cache_is_typed_and_reused(fixtures_dir, monkeypatch):
+    cold = FinanceTools(fixtures_dir=fixtures_dir)
+    assert os.path.exists(os.path.join(fixtures_dir, '.cache', 'actuals.feather'))
+    assert isinstance(cold.actuals['account_category'].dtype, pd.CategoricalDtype)
+
+    # A warm start must not parse any CSV
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV parsed despite fresh cache")
+    monkeypatch.setattr(loader, 'read_csv', fail)
+    warm = FinanceTools(fixtures_dir=fixtures_dir)
+    pd.testing.assert_frame_equal(cold.actuals, warm.actuals)
+
+def test_cache_rebuilds_when_source_changes(fixtures_dir):
+    FinanceTools(fixtures_dir=fixtures_dir)
+    source = os.path.join(fixtures_dir, 'cash.csv')
+
+    # Touching without changing the content keeps the cache
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert loader.FixtureCache(os.path.join(fixtures_dir, '.cache')).is_fresh(source, 'cash')
+
+    with open(source, 'a') as f:
+        f.write("\n2026-01,Consolidated,1\n")
+    tools = FinanceTools(fixtures_dir=fixtures_dir)
+    assert tools.cash['cash_usd'].iloc[-1] == 1
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+from agent.intent import IntentParser
+from agent.ledger import month_labels
+from agent.loader import partition_keys, source_version
+from agent.partitions import PartitionIndex
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from benchmarks.synthetic import write_partitioned
+
+QUESTIONS = ["What is our EBITDA for February 2024?", "Break down Opex by category for February 2024",
+             "What was February 2024 revenue vs budget in USD?", "EBITDA by entity for Q1 2024",
+             "What drove the Opex variance in March 2024?"]
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+@pytest.fixture
+def partitioned(tmp_path):
+    frames = {name: pd.read_csv(os.path.join('fixtures', f'{name}.csv')) for name in ('actuals', 'budget', 'cash', 'fx')}
+    return str(write_partitioned(tmp_path / 'fixtures', frames))
+
+def test_partition_keys_and_pruning(partitioned):
+    assert partition_keys(os.path.join('entity=EMEA', 'month=2024-02.csv')) == {'entity': 'EMEA', 'month': '2024-02'}
+    index = PartitionIndex(partitioned, 'actuals')
+    entities, months = index.values('entity'), index.values('month')
+    assert len(index) == len(entities) * len(months)
+    assert len(index.select(month='2024-02')) == len(entities)
+    assert len(index.select(month=('2024-01', '2024-03'), entity='EMEA')) == 3
+    assert len(index.select(entity=['EMEA', 'Nope'])) == len(months)
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_partitioned_load_matches_single_files(tools, partitioned, workers):
+    loaded = FinanceTools(fixtures_dir=partitioned, workers=workers)
+    for name in ('actuals', 'budget'):
+        pd.testing.assert_frame_equal(getattr(loaded, name), getattr(tools, name))
+    assert (loaded.actuals_cube.values == tools.actuals_cube.values).all()
+    assert loaded.get_ebitda('2024-03') == tools.get_ebitda('2024-03')
+
+def test_lazy_answers_only_read_the_partitions_they_need(tools, partitioned):
+    lazy = FinanceTools(fixtures_dir=partitioned, lazy=True)
+    assert lazy.store.current is None
+    assert lazy.dimensions() == tools.dimensions()
+    assert lazy.data_version == source_version(partitioned)
+
+    expected = [answer["text"] for answer in CFOPlanner(tools, cache=None).answer_questions(QUESTIONS)]
+    planner = CFOPlanner(lazy, cache=None)
+    assert [planner.answer_question(question)["text"] for question in QUESTIONS] == expected
+    # Every question named its period, so nothing was loaded in full
+    assert lazy.store.current is None
+    assert month_labels(lazy.snapshot_for(IntentParser(*tools.dimensions()).parse(QUESTIONS[0])).actuals) == ['2024-02']
+
+    # A trend needs every month: the full load happens then, and is used from there on
+    question = "Show me the gross margin trend for the last 3 months"
+    assert planner.answer_question(question)["text"] == CFOPlanner(tools, cache=None).answer_question(question)["text"]
+    assert lazy.store.current is not None
+
+@pytest.mark.parametrize("question, scope", [
+    ("What is our EBITDA for February 2024?", ('2024-02', None)),
+    ("EBITDA by entity for Q1 2024", (('2024-01', '2024-03'), None)),
+    ("Revenue vs budget for EMEA in Q2 2024", (('2024-04', '2024-06'), 'EMEA')),
+    ("What is our cash runway right now?", None),
+    ("Opex MoM change in March 2024", None),
+    ("Revenue for the last 3 months", None),
+    ("What if revenue drops 20% in Q2 2024?", None),
+])
+def test_intent_scope(tools, question, scope):
+    assert IntentParser(*tools.dimensions()).parse(question).scope == scope
@@ -0,0 +1,47 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from agent.cache import ResponseCache
+from agent.report import SummaryReport
+from agent.tools import FinanceTools
+
+def jpeg(width=1):
+    # A tiny JPEG; Pillow comes with fpdf2
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, 1)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_images_are_rendered_once_per_data_version(tools):
+    rendered = []
+    def renderer(spec, width, height):
+        rendered.append(spec)
+        # Distinct images, as fpdf2 embeds identical ones once
+        return jpeg(len(rendered))
+
+    report = SummaryReport(tools, executor=ThreadPoolExecutor(2), renderer=renderer, cache=ResponseCache())
+    pdf = report.build()
+    assert pdf.startswith(b'%PDF')
+    # Revenue and opex charts, each embedded as a JPEG image
+    assert len(rendered) == 2
+    assert pdf.count(b'/DCTDecode') == 2
+
+    report.build()
+    assert len(rendered) == 2
+
+    tools.publish(tools.snapshot.copy('reloaded'))
+    report.build()
+    assert len(rendered) == 4
+
+def test_sections_are_pluggable(tools):
+    def ebitda_section(tools):
+        ebitda = tools.get_ebitda()
+        return {"title": "EBITDA", "lines": [f"EBITDA: ${ebitda['ebitda']:,.0f}"], "chart": None}
+
+    report = SummaryReport(tools, sections=[ebitda_section], executor=ThreadPoolExecutor(1), cache=None)
+    assert report.build().startswith(b'%PDF')
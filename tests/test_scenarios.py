@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from agent.planner import CFOPlanner
+from agent.scenarios import Normal, ScenarioEngine, runway
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+@pytest.fixture
+def engine():
+    # $1.2M of cash, $100k/month burn before any scenario
+    return ScenarioEngine(cash=1_200_000, revenue=500_000, cogs=100_000, opex=500_000)
+
+def test_runway_interpolates_the_crossing_month():
+    cash = np.array([[50.0, -50.0, -150.0], [100.0, 50.0, 10.0], [-10.0, -20.0, -30.0]])
+    assert list(runway(cash, 100.0)) == [1.5, np.inf, pytest.approx(100 / 110)]
+
+def test_baseline_projection(engine):
+    cash = engine.project(24)
+    assert cash.shape == (1, 24)
+    assert cash[0, 0] == pytest.approx(1_100_000)
+    assert engine.grid(24).runway[0] == pytest.approx(12)
+
+def test_grid_covers_every_combination(engine):
+    result = engine.grid(36, revenue_growth=[-0.2, 0, 0.2], hires=[0, 5])
+    table = result.table()
+    assert len(table) == 6
+    # One row per scenario, computed as if projected alone
+    for _, row in table.iterrows():
+        alone = engine.project(36, revenue_growth=row['revenue_growth'], hires=row['hires'])
+        assert row['runway_months'] == pytest.approx(runway(alone, engine.cash)[0])
+    # More hires never lengthens the runway
+    assert (table[table.hires == 5].runway_months.to_numpy() <= table[table.hires == 0].runway_months.to_numpy()).all()
+
+def test_simulation_percentiles(engine):
+    result = engine.simulate(paths=5000, months=36, seed=1, revenue_growth=Normal(0, 0.2))
+    percentiles = result.percentiles()
+    assert len(result) == 5000 and result.cash.shape == (5000, 36)
+    assert percentiles[10] <= percentiles[50] <= percentiles[90]
+    assert percentiles[50] == pytest.approx(12, abs=1)
+    # Same seed, same paths
+    assert np.array_equal(result.cash, engine.simulate(paths=5000, months=36, seed=1, revenue_growth=Normal(0, 0.2)).cash)
+
+def test_unknown_parameter(engine):
+    with pytest.raises(ValueError):
+        engine.project(12, headcount=3)
+
+def test_tools_and_planner(tools):
+    result = tools.simulate_cash_runway(paths=1000, seed=0)
+    assert result['current_cash'] == tools.calculate_cash_runway()['current_cash']
+    assert result['chart'].key[0] == 'cash_fan'
+    assert len(result['fan']) == 36
+
+    answer = CFOPlanner(tools, cache=None).answer_question("Run a Monte Carlo simulation of cash runway")
+    assert answer['text'].startswith("**Cash Runway Scenarios")
+    # The gap to the simple runway answer is explained next to the percentiles
+    assert result['simple_runway'] == tools.calculate_cash_runway()['runway_months']
+    assert f"Simple runway (current cash / average monthly EBITDA of ${result['avg_monthly_burn']:,.0f}" in answer['text']
+
+def test_what_if_questions_route_to_scenarios(tools):
+    # Whatever metric a what-if question names, it is a scenario question
+    answer = CFOPlanner(tools, cache=None).answer_question("What if revenue drops 20% in Q2 2024?")
+    assert answer['text'].startswith("**Cash Runway Scenarios")
+    assert answer['chart'].kind == 'cash_fan'
+
+def test_what_if_assumption_changes_the_answer(tools):
+    planner = CFOPlanner(tools, cache=None)
+    drops = planner.answer_question("What if revenue drops 50%?")
+    grows = planner.answer_question("What if revenue grows 50%?")
+    assert drops['text'] != grows['text']
+    assert "Assumption: revenue -50% a year" in drops['text']
+    # The same paths as simulating the assumption directly
+    result = tools.simulate_cash_runway(seed=0, revenue_growth=-0.5)
+    assert f"Runway P50: {result['percentiles'][50]:.1f} months" in drops['text']
+
+    answer = planner.answer_question("What if it rains?")
+    assert answer['text'].startswith("I couldn't tell which assumption to change")
+    assert answer['chart'] is None
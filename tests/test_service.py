@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+
+import pytest
+from agent.service import QueryService
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+def serve(service, *requests):
+    """Start the service on a free port, send the requests concurrently, return (status, payload) for each"""
+    async def run():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*[request(port, *r) for r in requests])
+        finally:
+            server.close()
+    return asyncio.run(run())
+
+def test_routes(tools):
+    service = QueryService(tools)
+    answer, batch, metric, missing, bad = serve(
+        service,
+        ('POST', '/answer', {"question": "What is our EBITDA for February 2024?"}),
+        ('POST', '/batch', {"questions": ["What is our cash runway?", "Break down Opex by category for February 2024"]}),
+        ('GET', '/metrics/get_ebitda?month=2024-03&entity=EMEA'),
+        ('GET', '/metrics/reaggregate'),
+        ('GET', '/metrics/get_ebitda?months=x'),
+    )
+    assert answer[0] == 200 and answer[1]['text'].startswith("**EBITDA Analysis for 2024-02:**")
+    assert batch[0] == 200 and [a['chart'] for a in batch[1]['answers']] == [None, 'opex']
+    assert metric == (200, tools.get_ebitda('2024-03', entity='EMEA'))
+    # Only the metric methods are exposed
+    assert missing[0] == 404 and bad[0] == 400
+
+async def raw_request(port, data):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    await writer.drain()
+    # A server that kept the connection open would hang here; fail instead
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return int(response.split()[1])
+
+@pytest.mark.parametrize("data, status", [
+    (b"GET /health HTTP/1.1\r\nContent-Length: abc\r\n\r\n", 400),
+    (b"POST /answer HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400),
+    (b"POST /answer HTTP/1.1\r\nContent-Length: 99999999999\r\n\r\n", 413),
+    (b"POST /answer HTTP/1.1\r\nContent-Length: 5\r\nContent-Length: 50\r\n\r\n", 400),
+    (b"POST /answer HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n0\r\n\r\n", 411),
+    (b"POST /answer HTTP/1.1\r\nTransfer-Encoding: chunked\r\nContent-Length: 5\r\n\r\n0\r\n\r\n", 501),
+    (b"GET / HTTP/1.1 extra\r\n\r\n", 400),
+    (b"GET /" + b"a" * 20000 + b" HTTP/1.1\r\n\r\n", 414),
+    (b"GET / HTTP/1.1\r\nX-Big: " + b"a" * 20000 + b"\r\n\r\n", 431),
+    (b"GET / HTTP/1.1\r\n" + b"X-A: 1\r\n" * 200 + b"\r\n", 431),
+])
+def test_malformed_requests_get_4xx(tools, data, status):
+    service = QueryService(tools)
+    async def run():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            refused = await raw_request(port, data)
+            # The server is still serving
+            ok = await request(port, 'POST', '/answer', {"question": "What is our EBITDA for February 2024?"})
+            return refused, ok[0]
+        finally:
+            server.close()
+    assert asyncio.run(run()) == (status, 200)
+
+def test_chunked_body_is_not_read_as_a_request(tools):
+    # The chunk data hides a second request; the connection is closed instead of parsing it
+    smuggled = b"GET /health HTTP/1.1\r\n\r\n"
+    data = (b"POST /answer HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            + f"{len(smuggled):x}\r\n".encode() + smuggled + b"\r\n0\r\n\r\n")
+    service = QueryService(tools)
+    async def run():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(data)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+        finally:
+            server.close()
+    response = asyncio.run(run())
+    assert response.startswith(b"HTTP/1.1 411") and response.count(b"HTTP/1.1") == 1
+    assert service.stats['requests'] == 0
+
+def slow_planner(tools, calls, delay=0.2):
+    service = QueryService(tools, workers=2, max_pending=1)
+    answer_question = service.planner.answer_question
+
+    def counted(question):
+        calls.append(question)
+        time.sleep(delay)
+        return answer_question(question)
+    service.planner.answer_question = counted
+    return service
+
+def test_identical_requests_are_coalesced(tools):
+    calls = []
+    service = slow_planner(tools, calls)
+    question = ('POST', '/answer', {"question": "What is our EBITDA for February 2024?"})
+    responses = serve(service, *[question] * 10)
+    assert len(calls) == 1
+    assert all(r == responses[0] for r in responses) and responses[0][0] == 200
+    assert service.stats['coalesced'] == 9
+
+def test_backpressure_rejects_past_max_pending(tools):
+    calls = []
+    service = slow_planner(tools, calls)
+    responses = serve(service,
+                      ('POST', '/answer', {"question": "What is our EBITDA for February 2024?"}),
+                      ('POST', '/answer', {"question": "What is our cash runway?"}))
+    assert sorted(status for status, _ in responses) == [200, 503]
+
+def test_prometheus_metrics_endpoint(tools):
+    service = QueryService(tools)
+    serve(service, ('POST', '/answer', {"question": "What is our EBITDA for February 2024?"}))
+
+    async def scrape():
+        server = await service.start(port=0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+        writer.write(b"GET /metrics HTTP/1.1\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        return response
+    head, _, body = asyncio.run(scrape()).partition(b'\r\n\r\n')
+    assert b"Content-Type: text/plain" in head
+    assert b'cfo_traces_total{kind="question"}' in body and b"cfo_service_requests_total 2" in body
@@ -0,0 +1,72 @@
+import gc
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools(tmp_path):
+    path = tmp_path / 'fixtures'
+    shutil.copytree('fixtures', path, ignore=shutil.ignore_patterns('.cache'))
+    return FinanceTools(fixtures_dir=str(path), use_cache=False)
+
+def revenue_rows(month, amount):
+    return pd.DataFrame({'month': [month], 'entity': ['ParentCo'], 'account_category': ['Revenue'],
+                         'amount': [amount], 'currency': ['USD']})
+
+def test_published_snapshots_are_read_only(tools):
+    with pytest.raises(ValueError):
+        tools.actuals_cube.values[0, 0, 0] = 1.0
+    assert tools.snapshot.frozen
+
+def test_pinned_snapshot_keeps_its_numbers_across_an_update(tools):
+    pinned = tools.snapshot
+    before = pinned.get_ebitda('2025-12')
+    tools.append(actuals=revenue_rows('2025-12', 1000.0))
+
+    assert tools.snapshot is not pinned
+    assert pinned.get_ebitda('2025-12') == before
+    assert tools.get_ebitda('2025-12')['revenue'] == pytest.approx(before['revenue'] + 1000)
+    assert tools.data_version != pinned.data_version
+
+def test_old_snapshots_are_freed_once_unreferenced(tools):
+    planner = CFOPlanner(tools, cache=None)
+    planner.answer_question("Break down Opex by category for February 2024")
+    first = tools.data_version
+    tools.append(actuals=revenue_rows('2026-01', 1.0))
+    tools.append(actuals=revenue_rows('2026-01', 2.0))
+    gc.collect()
+    assert tools.store.live() == [tools.data_version]
+
+    pinned = tools.snapshot
+    tools.append(actuals=revenue_rows('2026-01', 3.0))
+    gc.collect()
+    assert tools.store.live() == [pinned.data_version, tools.data_version] and first not in tools.store.live()
+
+def test_readers_never_see_a_half_applied_update(tools):
+    stop = threading.Event()
+    mismatches = []
+
+    def read():
+        while not stop.is_set():
+            snapshot = tools.snapshot
+            consolidated = snapshot.get_entity_metrics('2026-01')
+            ebitda = snapshot.get_ebitda('2026-01')
+            if len(consolidated) and not np.isclose(consolidated['revenue'].iloc[-1], ebitda['revenue']):
+                mismatches.append(snapshot.data_version)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(20):
+        tools.append(actuals=revenue_rows('2026-01', 100.0 * (i + 1)))
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert mismatches == []
+    assert tools.get_ebitda('2026-01')['revenue'] == pytest.approx(100.0 * 210)
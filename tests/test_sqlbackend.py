@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from agent.planner import CFOPlanner
+from agent.sqlbackend import account_filter, period_filter
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+@pytest.fixture
+def sql_tools(tmp_path):
+    return FinanceTools(fixtures_dir='fixtures', backend='sqlite', database=str(tmp_path / 'ledger.sqlite'))
+
+@pytest.mark.parametrize("month", [None, '2024-03', ('2024-01', '2024-06')])
+@pytest.mark.parametrize("entity", [None, 'EMEA'])
+def test_pushed_down_queries_match_pandas(tools, sql_tools, month, entity):
+    assert sql_tools.get_ebitda(month, entity) == pytest.approx(tools.get_ebitda(month, entity))
+    expected, result = tools.get_opex_breakdown(month, entity), sql_tools.get_opex_breakdown(month, entity)
+    assert list(result['category']) == list(expected['category'])
+    assert np.allclose(result['amount_usd'], expected['amount_usd'])
+    expected, result = tools.get_revenue_vs_budget(month, entity), sql_tools.get_revenue_vs_budget(month, entity)
+    assert list(result['month']) == list(expected['month'])
+    assert np.allclose(result[['amount_usd_actual', 'amount_usd_budget', 'variance']], expected[['amount_usd_actual', 'amount_usd_budget', 'variance']])
+
+def test_rollups_cubes_and_summary_match_pandas(tools, sql_tools):
+    expected, result = tools.get_account_rollup(2, '2024-03'), sql_tools.get_account_rollup(2, '2024-03')
+    assert list(result['account']) == list(expected['account'])
+    assert np.allclose(result['amount_usd'], expected['amount_usd'])
+    # Whole-series analyses run on cubes aggregated in the engine
+    assert np.allclose(sql_tools.actuals_cube.values, tools.actuals_cube.values)
+    assert sql_tools.get_data_summary() == tools.get_data_summary()
+    assert sql_tools.dimensions() == tools.dimensions()
+
+def test_planner_answers_are_the_same(tools, sql_tools):
+    questions = ["What is our EBITDA for February 2024?", "Break down Opex by category for February 2024",
+                 "What was February 2024 revenue vs budget in USD?", "EBITDA by entity for Q1 2024", "What is our cash runway right now?"]
+    expected = [answer["text"] for answer in CFOPlanner(tools, cache=None).answer_questions(questions)]
+    assert [answer["text"] for answer in CFOPlanner(sql_tools, cache=None).answer_questions(questions)] == expected
+
+def test_filters_use_the_indexes(sql_tools):
+    clause, params = account_filter('Opex')
+    month, month_params = period_filter('2024-03')
+    plan = sql_tools.database.connection.execute(
+        f"EXPLAIN QUERY PLAN SELECT SUM(l.amount_cents) FROM actuals l WHERE {month} AND {clause}", month_params + params).fetchall()
+    assert all('USING INDEX' in row[-1] for row in plan if row[-1].startswith('SEARCH l'))
+    assert not any(row[-1].startswith('SCAN l') for row in plan)
+
+def test_database_is_reused_until_the_fixtures_change(sql_tools, tmp_path, capsys):
+    path = str(tmp_path / 'ledger.sqlite')
+    capsys.readouterr()
+    FinanceTools(fixtures_dir='fixtures', backend='sqlite', database=path)
+    assert "Imported" not in capsys.readouterr().out
+
+def test_updates_are_refused_up_front(sql_tools):
+    # Read-only: new rows go through a re-import, not append/refresh/watch
+    version = sql_tools.data_version
+    with pytest.raises(ValueError, match="backend='sqlite'"):
+        sql_tools.append(actuals=pd.read_csv('fixtures/actuals.csv').head(1))
+    with pytest.raises(ValueError, match="read-only"):
+        sql_tools.refresh()
+    with pytest.raises(ValueError, match="read-only"):
+        sql_tools.watch(interval=0.01)
+    assert sql_tools._stop_watching is None
+    assert sql_tools.data_version == version
@@ -0,0 +1,122 @@
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from agent.cache import ResponseCache
+from agent.planner import CFOPlanner
+from agent.service import QueryService
+from agent.store import ResultStore
+from agent.tools import FinanceTools
+
+QUESTIONS = ["What is our EBITDA for February 2024?", "Break down Opex by category for February 2024",
+             "What drove the Opex variance in March 2024?"]
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'results.sqlite')
+
+def test_answers_survive_a_restart(tools, path):
+    expected = [CFOPlanner(tools, cache=ResponseCache(store=ResultStore(path), namespace='answers')).answer_question(q) for q in QUESTIONS]
+
+    # A new process: empty memory cache, same file
+    store = ResultStore(path)
+    cache = ResponseCache(store=store, namespace='answers')
+    answers = [CFOPlanner(tools, cache=cache).answer_question(q) for q in QUESTIONS]
+    assert [a["text"] for a in answers] == [a["text"] for a in expected]
+    assert answers[1]["chart"].to_json() == expected[1]["chart"].to_json()
+    assert store.stats()['hits'] == len(QUESTIONS)
+    # Promoted into the memory cache: asked again, the file is not read
+    CFOPlanner(tools, cache=cache).answer_question(QUESTIONS[0])
+    assert store.stats()['hits'] == len(QUESTIONS) and cache.stats()['hits'] == 1
+
+def test_shared_with_other_processes(path):
+    code = ("import sys; from agent.store import ResultStore; "
+            f"ResultStore({path!r}).put('answers', 'v1', ('ebitda', '2024-02'), {{'text': 'from another worker'}})")
+    subprocess.run([sys.executable, '-c', code], check=True)
+    assert ResultStore(path).get('answers', 'v1', ('ebitda', '2024-02')) == {'text': 'from another worker'}
+
+def test_new_fingerprint_invalidates_and_appends_stay_local(path):
+    store = ResultStore(path)
+    store.put('answers', 'v1', 'a', 1)
+    store.put('charts', None, 'c', 3)
+    store.put('answers', 'v2', 'b', 2)
+    assert store.get('answers', 'v1', 'a') is None and store.get('answers', 'v2', 'b') == 2
+    # Other namespaces keep their entries
+    assert store.get('charts', None, 'c') == 3
+    # Rows appended in memory make a version no other process has
+    assert not store.put('answers', 'v2+1', 'b', 20)
+    assert store.get('answers', 'v2+1', 'b') is None
+
+def test_workers_on_two_versions_keep_each_others_entries(path):
+    # One worker still on the old fixtures, one on the new (a refresh window or a rolling deploy)
+    old, new = ResultStore(path), ResultStore(path)
+    old.put('answers', 'v1', 'a', 1)
+    new.put('answers', 'v2', 'a', 2)
+    assert old.get('answers', 'v1', 'a') is None
+    for worker, version, key, value in [(old, 'v1', 'a', 1), (new, 'v2', 'b', 3), (old, 'v1', 'b', 4), (new, 'v2', 'c', 5)]:
+        assert worker.put('answers', version, key, value)
+    assert [new.get('answers', 'v2', key) for key in 'abc'] == [2, 3, 5]
+    assert [old.get('answers', 'v1', key) for key in 'ab'] == [1, 4]
+    # A version recorded for the first time drops both
+    new.put('answers', 'v3', 'a', 6)
+    assert new.stats()['entries'] == 1
+
+def test_evicts_least_recently_read_by_size(path):
+    now = [0.0]
+    store = ResultStore(path, max_bytes=400, clock=lambda: now[0])
+    for key in 'abc':
+        now[0] += 1
+        store.put('answers', 'v1', key, 'x' * 100)
+    now[0] += 1
+    store.get('answers', 'v1', 'a')
+    now[0] += 1
+    store.put('answers', 'v1', 'd', 'x' * 100)
+
+    assert store.get('answers', 'v1', 'b') is None
+    assert all(store.get('answers', 'v1', key) is not None for key in 'acd')
+    assert store.stats()['bytes'] <= 400 and store.stats()['evictions'] == 1
+
+def test_service_aggregates_go_through_the_store(tools, path):
+    cache = ResponseCache(store=ResultStore(path), namespace='aggregates')
+    first = QueryService(tools, cache=cache).metric(tools.snapshot, 'get_ebitda', {'month': '2024-03'}, ('get_ebitda', (('month', '2024-03'),)))
+    restarted = ResultStore(path)
+    service = QueryService(tools, cache=ResponseCache(store=restarted, namespace='aggregates'))
+    assert service.metric(tools.snapshot, 'get_ebitda', {'month': '2024-03'}, ('get_ebitda', (('month', '2024-03'),))) == first
+    assert restarted.stats()['hits'] == 1
+
+def test_values_round_trip_as_json(tools, path):
+    store = ResultStore(path)
+    frame = tools.get_opex_breakdown('2024-02').assign(kind=lambda df: df['category'].astype('category'))
+    value = {'frame': frame, 'percentiles': {10: 1.5, 90: float('inf')}, 'key': ('a', 1), 'x': np.float64(2.0)}
+    assert store.put('aggregates', 'v1', 'k', value)
+    loaded = ResultStore(path).get('aggregates', 'v1', 'k')
+    pd.testing.assert_frame_equal(loaded['frame'], frame)
+    assert loaded['percentiles'] == {10: 1.5, 90: float('inf')} and loaded['key'] == ('a', 1) and loaded['x'] == 2.0
+    # Anything else is not stored, rather than pickled
+    assert not store.put('aggregates', 'v1', 'f', {'fn': print})
+    assert store.get('aggregates', 'v1', 'f') is None
+
+class Exploit:
+    # Pickled, it would run code on load; the store must never unpickle it
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (Exploit, 'ran', True))
+
+def test_undecodable_entries_are_dropped(path):
+    store = ResultStore(path)
+    store.put('answers', 'v1', 'a', {'text': 'ok'})
+    payload = pickle.dumps(Exploit())
+    for blob in (payload, b'{"__type__": "object", "module": "os"}', b'\x00garbage'):
+        store.connection.execute("UPDATE results SET value = ? WHERE key = ?", (blob, repr('a')))
+        assert store.get('answers', 'v1', 'a') is None
+        assert store.stats()['entries'] == 0
+        store.put('answers', 'v1', 'a', {'text': 'ok'})
+    assert not Exploit.ran
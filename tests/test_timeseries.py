@@ -0,0 +1,50 @@
+import math
+
+import pytest
+from agent.intent import IntentParser
+from agent.planner import CFOPlanner
+from agent.timeseries import shift_month
+from agent.tools import FinanceTools
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_shift_month():
+    assert shift_month('2024-01', -1) == '2023-12'
+    assert shift_month('2024-06', -12) == '2023-06'
+    assert shift_month('2023-12', 1) == '2024-01'
+
+def test_windows_match_recomputed_history(tools):
+    revenue = tools.actuals_cube.monthly('Revenue')
+    series = tools.timeseries()['revenue']
+
+    assert series.rolling_mean(3).to_numpy() == pytest.approx(revenue.rolling(3, min_periods=1).mean().to_numpy())
+    assert series.trailing_sum(6) == pytest.approx(revenue.tail(6).sum())
+    assert series.ytd('2025-03') == pytest.approx(revenue['2025-01':'2025-03'].sum())
+    assert series.qtd('2025-05') == pytest.approx(revenue['2025-04':'2025-05'].sum())
+
+    stats = tools.get_metric_stats('revenue', '2025-03')
+    assert stats['mom'] == pytest.approx(revenue['2025-03'] - revenue['2025-02'])
+    assert stats['yoy_pct'] == pytest.approx((revenue['2025-03'] / revenue['2024-03'] - 1) * 100)
+    # The first month has no prior month to compare with
+    assert math.isnan(tools.get_metric_stats('revenue', revenue.index[0])['mom'])
+
+def test_runway_window(tools):
+    revenue = tools.actuals_cube.monthly('Revenue')
+    cogs = tools.actuals_cube.monthly('COGS').reindex(revenue.index, fill_value=0)
+    opex = tools.actuals_cube.monthly('Opex:').reindex(revenue.index, fill_value=0)
+    burn = abs((revenue - cogs - opex).tail(6).mean())
+    assert tools.calculate_cash_runway(6)['avg_monthly_burn'] == pytest.approx(burn)
+
+def test_parser_windows():
+    parser = IntentParser()
+    assert parser.parse("Cash runway over the last 6 months").last_n == 6
+    intent = parser.parse("EBITDA quarter to date June 2025")
+    assert (intent.start, intent.end) == ('2025-04', '2025-06')
+
+def test_planner_change_line(tools):
+    planner = CFOPlanner(tools, cache=None)
+    stats = tools.get_metric_stats('revenue', '2025-03')
+    answer = planner.answer_question("What was revenue month over month in March 2025?")
+    assert f"MoM Change (2025-03): ${stats['mom']:,.0f}" in answer['text']
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from agent.variance import VarianceEngine
+
+@pytest.fixture
+def tools():
+    return FinanceTools(fixtures_dir='fixtures')
+
+def test_matches_revenue_vs_budget(tools):
+    # Same actuals and budget as the merge-based comparison, month by month
+    expected = tools.get_revenue_vs_budget().set_index('month')
+    table = tools.get_variance('Revenue', by='month').set_index('month')
+    assert np.allclose(table['actual'], expected['amount_usd_actual'])
+    assert np.allclose(table['budget'], expected['amount_usd_budget'])
+    assert np.allclose(table['variance'], expected['variance'])
+
+def test_levels_and_dimensions_add_up(tools):
+    quarter = ('2024-04', '2024-06')
+    total = tools.variance().total('Opex:', quarter)
+    by_entity = tools.get_variance('Opex:', quarter, by='entity')
+    by_account = tools.get_variance('Opex:', quarter)
+    assert by_entity['variance'].sum() == pytest.approx(total['variance'])
+    assert by_account['variance'].sum() == pytest.approx(total['variance'])
+    assert total['actual'] == pytest.approx(tools.get_opex_breakdown(quarter)['amount_usd'].sum())
+    # Rolled up to the top level, Opex is one line with the same variance
+    top = tools.get_variance(month=quarter, level=1).set_index('account')
+    assert set(top.index) == {'Revenue', 'COGS', 'Opex'}
+    assert top.loc['Opex', 'variance'] == pytest.approx(total['variance'])
+
+def test_drivers_rank_contributions_to_the_variance(tools):
+    quarter = ('2024-04', '2024-06')
+    total = tools.variance().total('Opex:', quarter)['variance']
+    drivers = tools.get_variance_drivers('Opex:', quarter, n=2)
+    assert len(drivers) == 2
+    assert list(drivers.columns[:2]) == ['entity', 'account']
+    # Largest contribution first, all in the direction of the total
+    contributions = drivers['variance'] * np.sign(total)
+    assert (contributions > 0).all() and contributions.is_monotonic_decreasing
+    assert np.allclose(drivers['share_pct'], drivers['variance'] / total * 100)
+    assert tools.get_variance_drivers('Opex:', '2031-01').empty
+
+def test_cubes_must_share_axes(tools):
+    budget = tools.budget_cube.copy()
+    budget.extend(months=['2031-01'])
+    with pytest.raises(ValueError):
+        VarianceEngine(tools.actuals_cube, budget)
+
+def test_planner_answers_what_drove_a_variance(tools):
+    planner = CFOPlanner(tools, cache=None)
+    drivers = tools.get_variance_drivers('Opex:', ('2024-04', '2024-06'))
+    response = planner.answer_question("What drove the opex overrun in Q2 2024?")
+    assert "Opex Variance to Budget for Q2 2024" in response["text"]
+    assert f"1. {drivers['entity'][0]} {drivers['account'][0]}" in response["text"]
+    assert response["chart"].figure() is not None
+    # Batched answers go through the same engine
+    assert planner.answer_questions(["What drove the opex overrun in Q2 2024?"])[0]["text"] == response["text"]
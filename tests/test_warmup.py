@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+from agent.cache import ResponseCache
+from agent.instrument import instruments
+from agent.planner import CFOPlanner
+from agent.tools import FinanceTools
+from agent.warmup import SAMPLE_QUESTIONS, Warmup
+
+def test_heavy_imports_are_deferred():
+    code = ("import sys, agent.warmup, agent.tools, agent.planner, agent.service; "
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'plotly', 'fpdf', 'kaleido'}))")
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip() == '[]'
+    # The warm-up module itself does not even need pandas
+    code = "import sys, agent.warmup; print('pandas' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip() == 'False'
+
+def test_warmup_answers_the_sample_questions_into_the_cache():
+    instruments.reset()
+    cache = ResponseCache()
+    factory = lambda: (tools := FinanceTools(fixtures_dir='fixtures'), CFOPlanner(tools, cache=cache))
+    warmup = Warmup(factory).start()
+    tools, planner = warmup.wait(timeout=60)
+    assert warmup.done.wait(timeout=60)
+
+    assert cache.stats()['misses'] == len(SAMPLE_QUESTIONS)
+    for question in SAMPLE_QUESTIONS:
+        planner.answer_question(question)
+    assert cache.stats()['hits'] == len(SAMPLE_QUESTIONS)
+    timings = warmup.timings()
+    assert timings['data_loaded'] <= timings['first_answer'] <= timings['warm']
+    assert 'cfo_startup_seconds{milestone="warm"}' in instruments.prometheus()
+
+def test_milestones_keep_the_first_time():
+    instruments.reset()
+    first = instruments.milestone('first_paint')
+    assert instruments.milestone('first_paint') == first
+    assert instruments.milestones == {'first_paint': first}
+
+def test_warmup_load_errors_are_raised_on_wait():
+    def factory():
+        raise FileNotFoundError("fixtures/actuals.csv")
+    warmup = Warmup(factory).start()
+    with pytest.raises(FileNotFoundError):
+        warmup.wait(timeout=10)
+    assert warmup.done.is_set()